@@ -1,61 +1,361 @@
 from flask import Flask, jsonify
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
+from extensions import db, jwt
+from utils.database import configure_binds, install_connect_hooks
+from utils.metrics import install_query_hooks, install_request_hooks, metrics, monitoring_token_required
+from utils.profiling import install_profiling
+from utils.strength_estimator import estimator
+from utils.sharding import shard_router
+import click
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = Flask(__name__)
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///password_manager.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
-
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-jwt = JWTManager(app)
-
-# Configure CORS for frontend integration
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["http://localhost:3000", "http://localhost:5000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True
-    }
-})
-
-# Import models after db initialization
-from models import User, Password
-from routes import auth_bp, passwords_bp
-
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(passwords_bp)
-
-# Create tables
-with app.app_context():
-    db.create_all()
-
-# Health check endpoint
-@app.route('/api/health', methods=['GET'])
-def health():
-    return jsonify({'status': 'ok', 'message': 'Password Manager API is running'}), 200
-
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': 'Endpoint not found'}), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({'error': 'Internal server error'}), 500
+from config import config_by_name
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+def create_app(config=None):
+    """
+    Build and configure an application instance
+    
+    Nothing touches the database here: the schema and the strength automaton are
+    built by ``flask init-db``, and the crypto, generator and search utilities set
+    themselves up on first use, so workers and tests start without paying for either.
+    
+    Args:
+        config: Config class, or its name ('development', 'production', 'testing').
+            Defaults to FLASK_CONFIG, then 'development'.
+    
+    Returns:
+        Configured Flask application
+    """
+    if config is None or isinstance(config, str):
+        config = config_by_name[config or os.getenv('FLASK_CONFIG', 'development')]
+    
+    app = Flask(__name__)
+    app.config.from_object(config)
+    
+    # Initialize extensions
+    configure_binds(app)
+    shard_router.init_app(app)
+    db.init_app(app)
+    install_connect_hooks(app, db)
+    install_query_hooks(app, db)
+    install_request_hooks(app)
+    install_profiling(app)
+    estimator.init_app(app)
+    jwt.init_app(app)
+    
+    # Alembic is only needed by the `flask db` commands, so web workers skip importing it
+    if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+    
+    # Configure CORS for frontend integration
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": app.config['CORS_ORIGINS'],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"],
+            "supports_credentials": True
+        }
+    })
+    
+    # Import models and routes once the extensions exist
+    from models import RevokedToken
+    from routes import auth_bp, passwords_bp
+    from utils.hashing import HashPoolSaturated
+    from utils.sharding import VaultMoving
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(passwords_bp)
+    
+    # Logout blocklists both the access and the refresh token, so every request
+    # pays one indexed lookup on the primary
+    @jwt.token_in_blocklist_loader
+    def is_token_revoked(jwt_header, jwt_payload):
+        return RevokedToken.is_revoked(jwt_payload['jti'])
+    
+    # Health check endpoint
+    @app.route('/api/health', methods=['GET'])
+    def health():
+        return jsonify({'status': 'ok', 'message': 'Password Manager API is running'}), 200
+    
+    # Per-process identity cache counters
+    @app.route('/api/cache/stats', methods=['GET'])
+    @monitoring_token_required
+    def cache_stats():
+        from utils.user_cache import user_cache
+        from utils.encryption import encryption
+        
+        return jsonify({
+            'user_cache': user_cache.stats(),
+            'user_key_cache': encryption.user_key_cache.stats(),
+            'shard_cache': shard_router.cache.stats()
+        }), 200
+    
+    # Prometheus scrape target; counters are per worker process
+    @app.route('/api/metrics', methods=['GET'])
+    @monitoring_token_required
+    def prometheus_metrics():
+        return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    
+    for command in (init_db, rotate_keys, upgrade_ciphertexts, backfill_audit, rebalance_shards, profile_report,
+                    prune_revoked_tokens):
+        app.cli.add_command(command)
+    
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({'error': 'Endpoint not found'}), 404
+    
+    @app.errorhandler(HashPoolSaturated)
+    def hash_pool_saturated(error):
+        return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': str(error.retry_after)}
+    
+    @app.errorhandler(VaultMoving)
+    def vault_moving(error):
+        return jsonify({'error': 'Vault is being moved, please retry'}), 503, {'Retry-After': str(error.retry_after)}
+    
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    return app
+
+def _shard_label(shard):
+    return '' if shard is None else f"[shard {shard}] "
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Apply the schema migrations, create the search index and compile the strength automaton (safe to re-run)"""
+    from flask import current_app
+    from flask_migrate import Migrate, upgrade
+    from utils.search import search_index
+    from utils.sharding import shard_bind
+    
+    # Runs on the primary and on every vault shard (see migrations/env.py)
+    if 'migrate' not in current_app.extensions:
+        Migrate(current_app, db, directory=MIGRATIONS_DIR)
+    upgrade()
+    
+    # After the migrations, since rebuilding a table drops the search triggers on it
+    if not shard_router.enabled:
+        search_index.init_app(db)
+    else:
+        for shard in shard_router.shards():
+            search_index.init_app(db, db.engines[shard_bind(shard)])
+    
+    click.echo(f"Schema ready (full-text search {'enabled' if search_index.fts_enabled else 'unavailable'})")
+    
+    # Compiled here rather than by each worker on its first strength check
+    click.echo(f"Strength automaton ready at {estimator.build()}")
+
+@click.command('prune-revoked-tokens')
+@with_appcontext
+def prune_revoked_tokens():
+    """Delete blocklist entries for refresh tokens that have expired"""
+    from models import RevokedToken
+    
+    deleted = RevokedToken.prune()
+    db.session.commit()
+    click.echo(f"Pruned {deleted} expired revoked tokens")
+
+@click.command('rotate-keys')
+@click.option('--batch-size', default=500, show_default=True, help='Rows re-encrypted per transaction')
+@click.option('--throttle', default=0.0, show_default=True, help='Seconds to sleep between batches')
+@click.option('--checkpoint', default='key_rotation.checkpoint', show_default=True, help='Progress file used to resume')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start from the first row')
+@with_appcontext
+def rotate_keys(batch_size, throttle, checkpoint, restart):
+    """Re-encrypt stored passwords under the first key of ENCRYPTION_KEYS"""
+    from models import User
+    from utils.encryption import encryption
+    from utils.key_rotation import KeyRotation
+    from utils.vault_audit import refingerprint_vault
+    
+    for shard in shard_router.shards():
+        label = _shard_label(shard)
+        # Row ids are per shard, so each shard keeps its own checkpoint
+        shard_checkpoint = checkpoint if shard is None else f"{checkpoint}.shard{shard}"
+        
+        if restart and os.path.exists(shard_checkpoint):
+            os.remove(shard_checkpoint)
+        
+        with shard_router.scope(shard):
+            rotation = KeyRotation(db, encryption, shard_checkpoint, batch_size=batch_size, throttle=throttle)
+            state = rotation.run(progress=lambda s: click.echo(
+                f"{label}up to id {s['last_id']}: {s['rotated']} rotated, {s['skipped']} already current"
+            ))
+        
+        click.echo(f"{label}Done: {state['rotated']} rotated, {state['skipped']} already current, {len(state['failed'])} failed")
+        if state['failed']:
+            click.echo(f"{label}Undecryptable ids: {state['failed']}", err=True)
+        elif os.path.exists(shard_checkpoint):
+            os.remove(shard_checkpoint)
+        
+        # Users without a data key use the master fingerprint key, which follows
+        # FINGERPRINT_KEY or the oldest key in the ring
+        legacy = User.query.with_entities(User.id).filter(User.data_key.is_(None))
+        if shard is not None:
+            legacy = legacy.filter(User.shard == shard)
+        with shard_router.scope(shard):
+            refingerprinted = sum(refingerprint_vault(db, encryption, user_id) for user_id, in legacy.all())
+            db.session.commit()
+        click.echo(f"{label}Re-fingerprinted {refingerprinted} entries of users without a data key")
+
+@click.command('upgrade-ciphertexts')
+@click.option('--batch-size', default=500, show_default=True, help='Rows converted per transaction')
+@click.option('--throttle', default=0.0, show_default=True, help='Seconds to sleep between batches')
+@with_appcontext
+def upgrade_ciphertexts(batch_size, throttle):
+    """Convert legacy text tokens to the compact binary ciphertext format"""
+    from utils.encryption import encryption
+    from utils.ciphertext_upgrade import CiphertextUpgrade
+    
+    for shard in shard_router.shards():
+        label = _shard_label(shard)
+        
+        with shard_router.scope(shard):
+            upgrade = CiphertextUpgrade(db, encryption, batch_size=batch_size, throttle=throttle)
+            state = upgrade.run(progress=lambda s: click.echo(f"{label}{s['upgraded']} upgraded, {s['skipped']} skipped"))
+        
+        click.echo(f"{label}Done: {state['upgraded']} upgraded, {state['skipped']} without a data key, {len(state['failed'])} failed")
+        if state['failed']:
+            click.echo(f"{label}Undecryptable ids: {state['failed']}", err=True)
+
+@click.command('backfill-audit')
+@click.option('--batch-size', default=500, show_default=True, help='Rows processed per transaction')
+@click.option('--workers', default=4, show_default=True, help='Threads decrypting each batch')
+@click.option('--throttle', default=0.0, show_default=True, help='Seconds to sleep between batches')
+@with_appcontext
+def backfill_audit(batch_size, workers, throttle):
+    """Compute fingerprints and strength scores for rows written before vault auditing"""
+    from utils.encryption import encryption
+    from utils.vault_audit import AuditBackfill
+    
+    for shard in shard_router.shards():
+        label = _shard_label(shard)
+        
+        with shard_router.scope(shard):
+            backfill = AuditBackfill(db, encryption, batch_size=batch_size, workers=workers, throttle=throttle)
+            state = backfill.run(progress=lambda s: click.echo(f"{label}{s['audited']} audited"))
+        
+        click.echo(f"{label}Done: {state['audited']} audited, {len(state['failed'])} failed")
+        if state['failed']:
+            click.echo(f"{label}Undecryptable ids: {state['failed']}", err=True)
+
+@click.command('rebalance-shards')
+@click.option('--user', 'user_ids', type=int, multiple=True, help='User whose vault to move (repeatable)')
+@click.option('--to', 'target', type=int, help='Destination shard')
+@click.option('--grace', default=2.0, show_default=True, help='Seconds to let in-flight requests finish after fencing')
+@click.option('--resume', is_flag=True, help='Finish moves interrupted while users were fenced')
+@click.option('--rollback', is_flag=True, help='Return users fenced by an interrupted move to their source shard')
+@click.option('--from-primary', 'from_primary', is_flag=True,
+              help='Move vaults created before sharding was enabled off the primary database')
+@click.option('--limit', type=int, default=None, help='With --from-primary, move at most this many users')
+@with_appcontext
+def rebalance_shards(user_ids, target, grace, resume, rollback, from_primary, limit):
+    """Move vaults between shards, or show how users are spread without --user"""
+    from sqlalchemy import func
+    from models import User
+    from utils.sharding import MOVING, VaultMoving, move_from_primary, move_vault, resume_moves
+    
+    if not shard_router.enabled:
+        raise click.ClickException('Sharding is not enabled (set VAULT_SHARD_URLS or VAULT_SHARD_COUNT)')
+    
+    if resume or rollback:
+        if resume and rollback:
+            raise click.ClickException('--resume and --rollback are mutually exclusive')
+        for user_id, shard, moved in resume_moves(db, rollback=rollback):
+            destination = 'the primary' if shard is None else f'shard {shard}'
+            click.echo(f"user {user_id}: {'rolled back' if rollback else f'{moved} entries moved'} to {destination}")
+        return
+    
+    if from_primary:
+        for user_id, shard, moved in move_from_primary(db, limit=limit):
+            click.echo(f"user {user_id}: {moved} entries moved to shard {shard}")
+        return
+    
+    if not user_ids:
+        counts = dict(db.session.query(User.shard, func.count()).group_by(User.shard).all())
+        for shard in shard_router.shards():
+            click.echo(f"shard {shard}: {counts.get(shard, 0)} users")
+        if counts.get(None):
+            click.echo(f"still on the primary: {counts[None]} users (use --from-primary)")
+        if counts.get(MOVING):
+            click.echo(f"fenced by an unfinished move: {counts[MOVING]} users (use --resume or --rollback)")
+        return
+    
+    if target is None or not 0 <= target < shard_router.count:
+        raise click.ClickException(f'--to must be a shard between 0 and {shard_router.count - 1}')
+    
+    for user_id in user_ids:
+        try:
+            moved = move_vault(db, user_id, target, grace=grace)
+        except VaultMoving:
+            raise click.ClickException(f'user {user_id} is being moved or still on the primary; '
+                                       'finish with --resume or --from-primary first')
+        click.echo(f"user {user_id}: {moved} entries moved to shard {target}")
+
+@click.command('profile-report')
+@click.option('--dir', 'directory', default=None, help='Profile directory (defaults to PROFILE_DIR)')
+@click.option('--endpoint', default=None, help='Only endpoints containing this text, e.g. "GET /api/passwords"')
+@click.option('--limit', default=20, show_default=True, help='Functions listed per endpoint')
+@click.option('--sort', default='cumulative', show_default=True, help='pstats sort key for cProfile dumps')
+@click.option('--match', default=None, help='Only list functions matching this regex, e.g. "to_dict|jsonify"')
+@click.option('--flamegraph-dir', default=None, help='Write one merged collapsed-stack file per endpoint here')
+@with_appcontext
+def profile_report(directory, endpoint, limit, sort, match, flamegraph_dir):
+    """Aggregate per-request profiles by endpoint"""
+    import pstats
+    import re
+    from flask import current_app
+    from utils.profiling import group_by_endpoint, load_index, merge_collapsed, self_time, write_collapsed
+    
+    directory = directory or current_app.config['PROFILE_DIR']
+    groups = group_by_endpoint(load_index(directory))
+    if endpoint:
+        groups = {key: entries for key, entries in groups.items() if endpoint in key}
+    if not groups:
+        raise click.ClickException(f'No profiles found in {directory}')
+    
+    if flamegraph_dir:
+        os.makedirs(flamegraph_dir, exist_ok=True)
+    
+    for key, entries in sorted(groups.items(), key=lambda item: -sum(e['duration_ms'] for e in item[1])):
+        durations = sorted(e['duration_ms'] for e in entries)
+        click.echo(f"== {key}: {len(entries)} requests, "
+                   f"median {durations[len(durations) // 2]:.1f} ms, max {durations[-1]:.1f} ms")
+        
+        paths = [os.path.join(directory, e['file']) for e in entries]
+        dumps = [path for path in paths if path.endswith('.prof')]
+        collapsed = [path for path in paths if path.endswith('.collapsed')]
+        
+        if dumps:
+            stats = pstats.Stats(*dumps, stream=click.get_text_stream('stdout'))
+            restrictions = [match, limit] if match else [limit]
+            stats.strip_dirs().sort_stats(sort).print_stats(*restrictions)
+        
+        if collapsed:
+            stacks = merge_collapsed(collapsed)
+            total = sum(stacks.values()) or 1
+            leaves = self_time(stacks).most_common()
+            if match:
+                leaves = [(frame, count) for frame, count in leaves if re.search(match, frame)]
+            for frame, count in leaves[:limit]:
+                click.echo(f"  {100 * count / total:5.1f}%  {frame}")
+            
+            if flamegraph_dir:
+                slug = re.sub(r'[^A-Za-z0-9]+', '_', key).strip('_')
+                path = os.path.join(flamegraph_dir, f"{slug}.collapsed")
+                write_collapsed(stacks, path)
+                click.echo(f"  flamegraph input: {path}")
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
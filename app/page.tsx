@@ -3,32 +3,75 @@
 import { useState, useEffect } from "react"
 import { AuthPage } from "@/components/auth-page"
 import { DashboardPage } from "@/components/dashboard-page"
+import {
+  type AuthTokens,
+  clearTokens,
+  loadTokens,
+  msUntilRefresh,
+  refreshTokens,
+  revokeSession,
+  saveTokens,
+} from "@/lib/auth"
+
+// Retry interval when the server cannot be reached to renew the access token
+const REFRESH_RETRY_MS = 30 * 1000
 
 export default function Home() {
-  const [isAuthenticated, setIsAuthenticated] = useState(false)
-  const [token, setToken] = useState<string | null>(null)
+  const [tokens, setTokens] = useState<AuthTokens | null>(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
-    // Check if user is already authenticated
-    const storedToken = localStorage.getItem("access_token")
-    if (storedToken) {
-      setToken(storedToken)
-      setIsAuthenticated(true)
+    // Check if user is already authenticated, renewing an expired access token first
+    const restoreSession = async () => {
+      const stored = loadTokens()
+      if (stored) {
+        const current = msUntilRefresh(stored.access_token) > 0 ? stored : await refreshTokens(stored)
+        if (current) {
+          setTokens(current)
+        } else {
+          clearTokens()
+        }
+      }
+      setLoading(false)
     }
-    setLoading(false)
+    restoreSession()
   }, [])
 
-  const handleLogin = (accessToken: string) => {
-    setToken(accessToken)
-    setIsAuthenticated(true)
-    localStorage.setItem("access_token", accessToken)
+  useEffect(() => {
+    // Renew the access token shortly before it expires
+    if (!tokens) return
+
+    let timer: ReturnType<typeof setTimeout>
+    const schedule = (delay: number) => {
+      timer = setTimeout(async () => {
+        const renewed = await refreshTokens(tokens)
+        if (!renewed) {
+          // Refresh token revoked or expired: the session is over
+          clearTokens()
+          setTokens(null)
+        } else if (renewed === tokens) {
+          schedule(REFRESH_RETRY_MS)
+        } else {
+          setTokens(renewed)
+        }
+      }, delay)
+    }
+    schedule(msUntilRefresh(tokens.access_token))
+
+    return () => clearTimeout(timer)
+  }, [tokens])
+
+  const handleLogin = (newTokens: AuthTokens) => {
+    setTokens(newTokens)
+    saveTokens(newTokens)
   }
 
   const handleLogout = () => {
-    setToken(null)
-    setIsAuthenticated(false)
-    localStorage.removeItem("access_token")
+    if (tokens) {
+      revokeSession(tokens)
+    }
+    setTokens(null)
+    clearTokens()
   }
 
   if (loading) {
@@ -44,8 +87,8 @@ export default function Home() {
 
   return (
     <main className="min-h-screen bg-background">
-      {isAuthenticated && token ? (
-        <DashboardPage token={token} onLogout={handleLogout} />
+      {tokens ? (
+        <DashboardPage token={tokens.access_token} onLogout={handleLogout} />
       ) : (
         <AuthPage onLogin={handleLogin} />
       )}
@@ -0,0 +1,256 @@
+"""
+Micro- and macro-benchmarks for the password manager hot paths
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10,1000,100000] [--output results.json]
+                                        [--compare baseline.json] [--threshold 0.2]
+
+Micro benchmarks time the crypto, generator and validator functions directly.
+The startup benchmark measures import-to-first-request in fresh interpreters.
+Macro benchmarks drive list/add/reveal through the Flask test client against a
+temporary SQLite database holding one user per vault size. Results are written
+as JSON; with --compare the run fails if any benchmark is slower than the
+baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Run in a fresh interpreter per sample so no module is already imported
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+response = app.test_client().get('/api/health')
+assert response.status_code == 200, response.status_code
+print(time.perf_counter() - start)
+"""
+
+
+def measure(func, iterations: int, repeat: int = 5) -> dict:
+    """
+    Time a callable
+
+    Args:
+        func: Zero-argument callable to benchmark
+        iterations: Calls per timing round
+        repeat: Number of timing rounds
+
+    Returns:
+        Per-call timings in microseconds
+    """
+    func()  # warm up caches and lazy imports
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        rounds.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        'min_us': round(min(rounds), 3),
+        'median_us': round(statistics.median(rounds), 3),
+        'iterations': iterations,
+        'repeat': repeat
+    }
+
+
+def setup_environment():
+    """Point the app at a throwaway database before it is imported"""
+    from cryptography.fernet import Fernet
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+    # Hash inline so registration timing is not skewed by pool start-up
+    os.environ.setdefault('HASH_POOL_WORKERS', '0')
+    return db_path
+
+
+def micro_benchmarks(results: dict):
+    from utils.encryption import PasswordEncryption
+    from utils.password_generator import PasswordGenerator, PasswordValidator, PasswordAnalyzer
+    from utils.metrics import metrics
+
+    encryption = PasswordEncryption()
+    token = encryption.encrypt('correct horse battery staple')
+    sample = 'Tr0ub4dor&3-correct-horse'
+
+    results['encrypt'] = measure(lambda: encryption.encrypt('correct horse battery staple'), 2000)
+    results['decrypt'] = measure(lambda: encryption.decrypt(token), 2000)
+    results['generate_16'] = measure(lambda: PasswordGenerator.generate(16), 2000)
+    results['generate_64'] = measure(lambda: PasswordGenerator.generate(64), 1000)
+    results['check_strength'] = measure(lambda: PasswordGenerator.check_strength(sample), 5000)
+    results['estimate_crack_time'] = measure(lambda: PasswordGenerator.estimate_crack_time(sample), 5000)
+    results['validate'] = measure(lambda: PasswordValidator.validate(sample), 5000)
+    results['analyze'] = measure(lambda: PasswordAnalyzer.analyze(sample), 5000)
+    # Cost added to every request, query and crypto call by instrumentation
+    results['metrics_observe'] = measure(
+        lambda: metrics.observe('http_request_duration_seconds', 0.004, endpoint='/api/passwords', method='GET', status=200),
+        20000
+    )
+
+
+def startup_benchmark(results: dict, repeat: int = 5):
+    """Time from importing the app to the first response, excluding interpreter start-up"""
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]) * 1e6)
+
+    results['startup_first_request'] = {
+        'min_us': round(min(samples), 3),
+        'median_us': round(statistics.median(samples), 3),
+        'iterations': 1,
+        'repeat': repeat
+    }
+
+
+def seed_vault(app, db, user_id: int, size: int):
+    """Insert ``size`` entries for a user in batches"""
+    from models import Password
+    from utils.encryption import encryption
+
+    with app.app_context():
+        batch = []
+        for i in range(size):
+            batch.append({
+                'user_id': user_id,
+                'service_name': f'service-{i}',
+                'username': f'user{i}@example.com',
+                'url': f'https://service-{i}.example.com',
+                'notes': 'seeded by benchmark',
+                **encryption.encrypt_fields(f'password-{i}', user_id)
+            })
+            if len(batch) == 5000:
+                db.session.execute(Password.__table__.insert(), batch)
+                batch.clear()
+        if batch:
+            db.session.execute(Password.__table__.insert(), batch)
+        db.session.commit()
+
+
+def macro_benchmarks(results: dict, sizes: list):
+    from app import create_app
+    from extensions import db
+    from utils.search import search_index
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        search_index.init_app(db)
+    client = app.test_client()
+
+    for size in sizes:
+        name = f'bench{size}'
+        response = client.post('/api/auth/register', json={
+            'username': name, 'email': f'{name}@example.com', 'password': 'Benchmark-Passw0rd!'
+        })
+        body = response.get_json()
+        headers = {'Authorization': f"Bearer {body['access_token']}"}
+        user_id = body['user']['id']
+
+        seed_vault(app, db, user_id, size)
+        with app.app_context():
+            from models import Password
+            first_id = db.session.query(db.func.min(Password.id)).filter_by(user_id=user_id).scalar()
+
+        # Full-list reads scale with vault size, so run fewer of them on big vaults
+        list_iterations = max(3, min(200, 20000 // size))
+
+        results[f'api_list_full_{size}'] = measure(
+            lambda: client.get('/api/passwords', headers=headers), list_iterations, repeat=3
+        )
+        results[f'api_list_page_{size}'] = measure(
+            lambda: client.get('/api/passwords?limit=50&fields=id,service_name,username', headers=headers), 200
+        )
+        results[f'api_reveal_{size}'] = measure(
+            lambda: client.get(f'/api/passwords/{first_id}', headers=headers), 200
+        )
+        results[f'api_add_{size}'] = measure(
+            lambda: client.post('/api/passwords', headers=headers, json={
+                'service_name': 'bench', 'username': 'bench', 'password': 'bench-password'
+            }), 100, repeat=3
+        )
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> list:
+    """
+    Compare median timings with a stored baseline
+
+    Returns:
+        List of (name, baseline_us, current_us) for benchmarks that regressed
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['median_us'], current['median_us']
+        if before and after > before * (1 + threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,1000,100000', help='Comma separated vault sizes for API benchmarks')
+    parser.add_argument('--micro-only', action='store_true', help='Skip the startup and API benchmarks')
+    parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON produced by an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown vs. baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    db_path = setup_environment()
+    results = {}
+
+    try:
+        micro_benchmarks(results)
+        if not args.micro_only:
+            startup_benchmark(results)
+            macro_benchmarks(results, [int(s) for s in args.sizes.split(',') if s])
+    finally:
+        os.remove(db_path)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        },
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for name, before, after in regressions:
+            print(f'REGRESSION {name}: {before:.1f}us -> {after:.1f}us', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,10 @@ import { useState } from "react"
 import { LoginForm } from "./auth/login-form"
 import { RegisterForm } from "./auth/register-form"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
+import type { AuthTokens } from "@/lib/auth"
 
 interface AuthPageProps {
-  onLogin: (token: string) => void
+  onLogin: (tokens: AuthTokens) => void
 }
 
 export function AuthPage({ onLogin }: AuthPageProps) {
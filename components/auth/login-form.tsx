@@ -7,9 +7,10 @@ import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { Label } from "@/components/ui/label"
 import { Alert, AlertDescription } from "@/components/ui/alert"
+import type { AuthTokens } from "@/lib/auth"
 
 interface LoginFormProps {
-  onLogin: (token: string) => void
+  onLogin: (tokens: AuthTokens) => void
 }
 
 export function LoginForm({ onLogin }: LoginFormProps) {
@@ -37,7 +38,7 @@ export function LoginForm({ onLogin }: LoginFormProps) {
         return
       }
 
-      onLogin(data.access_token)
+      onLogin({ access_token: data.access_token, refresh_token: data.refresh_token })
     } catch (err) {
       setError("Failed to connect to server")
     } finally {
@@ -6,7 +6,45 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
-    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    # Short-lived; clients renew them through /api/auth/refresh
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 30)))
+    CORS_ORIGINS = ["http://localhost:3000", "http://localhost:5000"]
+    
+    # Connection pool, also used for the read replica (ignored by in-memory SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+    # Applied to each new SQLite connection (see utils/database.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    }
+    # Optional replica serving read-only routes
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    # Optional vault sharding (see utils/sharding.py): explicit shard URIs, or a
+    # number of local SQLite shard files
+    VAULT_SHARD_URLS = [u.strip() for u in os.getenv('VAULT_SHARD_URLS', '').split(',') if u.strip()]
+    VAULT_SHARD_COUNT = int(os.getenv('VAULT_SHARD_COUNT', 0))
+    # Private directory for the compiled strength automaton (defaults to instance/cache)
+    STRENGTH_CACHE_DIR = os.getenv('STRENGTH_CACHE_DIR')
+    # Bearer token for /api/metrics and /api/cache/stats; both answer 404 while unset
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Opt-in request profiling (see utils/profiling.py): requests carrying
+    # PROFILE_HEADER set to PROFILE_SECRET, plus a random PROFILE_SAMPLE_RATE
+    # fraction, are profiled
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_MODE = os.getenv('PROFILE_MODE', 'cprofile')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile')
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 1))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -22,3 +60,14 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # In-memory SQLite uses a single static connection, which takes no pool options
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    DATABASE_REPLICA_URL = None
+    VAULT_SHARD_URLS = []
+    VAULT_SHARD_COUNT = 0
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig
+}
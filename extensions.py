@@ -0,0 +1,7 @@
+from flask_sqlalchemy import SQLAlchemy
+from flask_jwt_extended import JWTManager
+from utils.database import RoutingSession
+
+# Created unbound and attached to an app in create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+jwt = JWTManager()
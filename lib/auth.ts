@@ -0,0 +1,85 @@
+const AUTH_API = "http://localhost:5000/api/auth"
+
+const ACCESS_TOKEN_KEY = "access_token"
+const REFRESH_TOKEN_KEY = "refresh_token"
+
+// Renew the access token this long before it expires
+const REFRESH_MARGIN_MS = 60 * 1000
+
+export interface AuthTokens {
+  access_token: string
+  refresh_token: string
+}
+
+export function loadTokens(): AuthTokens | null {
+  const access_token = localStorage.getItem(ACCESS_TOKEN_KEY)
+  const refresh_token = localStorage.getItem(REFRESH_TOKEN_KEY)
+  return access_token && refresh_token ? { access_token, refresh_token } : null
+}
+
+export function saveTokens(tokens: AuthTokens) {
+  localStorage.setItem(ACCESS_TOKEN_KEY, tokens.access_token)
+  localStorage.setItem(REFRESH_TOKEN_KEY, tokens.refresh_token)
+}
+
+export function clearTokens() {
+  localStorage.removeItem(ACCESS_TOKEN_KEY)
+  localStorage.removeItem(REFRESH_TOKEN_KEY)
+}
+
+// Milliseconds until the access token should be renewed (0 if it already should be)
+export function msUntilRefresh(accessToken: string): number {
+  try {
+    const payload = JSON.parse(atob(accessToken.split(".")[1].replace(/-/g, "+").replace(/_/g, "/")))
+    return Math.max(payload.exp * 1000 - Date.now() - REFRESH_MARGIN_MS, 0)
+  } catch {
+    return 0
+  }
+}
+
+// Exchange the refresh token for a new pair; refresh tokens are single-use, so the
+// stored pair is replaced. Returns null once the session has ended.
+export async function refreshTokens(tokens: AuthTokens): Promise<AuthTokens | null> {
+  // Another tab may already have rotated the pair we hold
+  const stored = loadTokens()
+  if (stored && stored.refresh_token !== tokens.refresh_token) {
+    return stored
+  }
+
+  try {
+    const response = await fetch(`${AUTH_API}/refresh`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${tokens.refresh_token}` },
+    })
+    if (!response.ok) {
+      return null
+    }
+
+    const data = await response.json()
+    const rotated = { access_token: data.access_token, refresh_token: data.refresh_token }
+    saveTokens(rotated)
+    return rotated
+  } catch {
+    // Offline: keep the current pair and try again later
+    return tokens
+  }
+}
+
+// Revoke the session on the server; the local tokens are cleared either way
+export async function revokeSession(tokens: AuthTokens) {
+  try {
+    const response = await fetch(`${AUTH_API}/logout`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${tokens.access_token}` },
+    })
+    // An expired access token cannot log out; the refresh token still can
+    if (response.status === 401) {
+      await fetch(`${AUTH_API}/logout`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${tokens.refresh_token}` },
+      })
+    }
+  } catch (err) {
+    console.error("Failed to revoke session:", err)
+  }
+}
@@ -0,0 +1,137 @@
+import logging
+from logging.config import fileConfig
+
+from flask import current_app
+
+from alembic import context
+
+# this is the Alembic Config object, which provides
+# access to the values within the .ini file in use.
+config = context.config
+
+# Interpret the config file for Python logging, keeping the app's own loggers
+fileConfig(config.config_file_name, disable_existing_loggers=False)
+logger = logging.getLogger('alembic.env')
+
+# Revision matching the schema of databases created before migrations existed
+BASELINE_REVISION = '7cc3b4c5f1c8'
+
+# Tables that mark a pre-migration database: (directory, vault)
+BASELINE_TABLES = ('users', 'passwords')
+
+
+def get_targets():
+    """
+    Databases to migrate
+
+    Returns:
+        List of (name, engine, directory, vault) tuples; directory and vault tell
+        which group of tables lives in that database
+    """
+    from sqlalchemy import inspect
+    from utils.sharding import shard_bind, shard_router
+
+    db = current_app.extensions['migrate'].db
+    primary = db.engines[None]
+    if not shard_router.enabled:
+        return [('primary', primary, True, True)]
+
+    # Vaults created before sharding was enabled stay on the primary until
+    # `flask rebalance-shards --from-primary` moves them, so keep their tables current
+    legacy_vaults = 'passwords' in inspect(primary).get_table_names()
+    targets = [('primary', primary, True, legacy_vaults)]
+    targets += [(f'shard{i}', db.engines[shard_bind(i)], False, True) for i in shard_router.shards()]
+    return targets
+
+
+def get_metadata():
+    return current_app.extensions['migrate'].db.metadata
+
+
+def include_object_for(directory, vault):
+    from utils.sharding import VAULT_TABLES
+
+    def include_object(obj, name, type_, reflected, compare_to):
+        # Vault tables on a shard cannot reference the users table on the primary
+        if type_ == 'foreign_key_constraint':
+            return directory
+        if type_ != 'table':
+            return True
+        # The full-text index is managed by utils/search.py
+        if name.startswith('passwords_fts'):
+            return False
+        return vault if name in VAULT_TABLES else directory
+    return include_object
+
+
+def adopt_legacy_database(connection, directory, vault):
+    """Stamp a database created by db.create_all() at the baseline revision"""
+    from sqlalchemy import inspect
+
+    migration_context = context.get_context()
+    if migration_context.get_current_revision() is not None:
+        return
+
+    tables = set(inspect(connection).get_table_names())
+    marker = BASELINE_TABLES[0] if directory else BASELINE_TABLES[1]
+    if marker in tables:
+        logger.info('Stamping pre-migration database at the baseline revision')
+        migration_context.stamp(context.script, BASELINE_REVISION)
+
+
+def run_migrations_offline():
+    """Run migrations in 'offline' mode, emitting the SQL for each database in turn"""
+    for name, engine, directory, vault in get_targets():
+        config.attributes.update(directory=directory, vault=vault)
+        context.configure(
+            url=engine.url.render_as_string(hide_password=False),
+            target_metadata=get_metadata(),
+            include_object=include_object_for(directory, vault),
+            render_as_batch=True,
+            literal_binds=True
+        )
+        with context.begin_transaction():
+            context.execute(f'-- {name}')
+            context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations against the primary database and every vault shard"""
+
+    # this callback is used to prevent an auto-migration from being generated
+    # when there are no changes to the schema
+    # reference: http://alembic.zzzcomputing.com/en/latest/cookbook.html
+    def process_revision_directives(context, revision, directives):
+        if getattr(config.cmd_opts, 'autogenerate', False):
+            script = directives[0]
+            if script.upgrade_ops.is_empty():
+                directives[:] = []
+                logger.info('No changes in schema detected.')
+
+    conf_args = dict(current_app.extensions['migrate'].configure_args)
+    if conf_args.get('process_revision_directives') is None:
+        conf_args['process_revision_directives'] = process_revision_directives
+    # SQLite alters tables by copying them
+    conf_args.setdefault('render_as_batch', True)
+
+    for name, engine, directory, vault in get_targets():
+        logger.info(f'Migrating {name}')
+        config.attributes.update(directory=directory, vault=vault)
+
+        with engine.connect() as connection:
+            context.configure(
+                connection=connection,
+                target_metadata=get_metadata(),
+                include_object=include_object_for(directory, vault),
+                **conf_args
+            )
+
+            with context.begin_transaction():
+                adopt_legacy_database(connection, directory, vault)
+                context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,43 @@
+"""token version and refresh-token blocklist
+
+Revision ID: 17887b6fd0ed
+Revises: c59736bd4598
+Create Date: 2026-10-17 04:00:54.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '17887b6fd0ed'
+down_revision = 'c59736bd4598'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('revoked_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jti', sa.String(length=36), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('revoked_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_revoked_tokens_jti'), ['jti'], unique=True)
+
+
+def downgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    op.drop_table('revoked_tokens')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
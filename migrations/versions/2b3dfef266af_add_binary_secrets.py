@@ -0,0 +1,36 @@
+"""binary secret format alongside the legacy text column
+
+Revision ID: 2b3dfef266af
+Revises: 5208b35da1fc
+Create Date: 2026-10-17 04:03:59.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b3dfef266af'
+down_revision = '5208b35da1fc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.config.attributes.get('vault', True):
+        return
+
+    # Rebuilds the table on SQLite; init-db recreates the search triggers afterwards
+    with op.batch_alter_table('passwords', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('encrypted_blob', sa.LargeBinary(), nullable=True))
+        batch_op.alter_column('encrypted_password', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade():
+    if not context.config.attributes.get('vault', True):
+        return
+
+    # Fails while any entry is stored only in the binary format
+    with op.batch_alter_table('passwords', schema=None) as batch_op:
+        batch_op.alter_column('encrypted_password', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('encrypted_blob')
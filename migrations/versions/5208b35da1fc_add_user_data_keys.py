@@ -0,0 +1,32 @@
+"""wrapped per-user data keys
+
+Revision ID: 5208b35da1fc
+Revises: 17887b6fd0ed
+Create Date: 2026-10-17 04:02:47.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5208b35da1fc'
+down_revision = '17887b6fd0ed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_key', sa.Text(), nullable=True))
+
+
+def downgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_key')
@@ -0,0 +1,37 @@
+"""fingerprint and strength score for the vault audit
+
+Revision ID: 7a9765c47e92
+Revises: 2b3dfef266af
+Create Date: 2026-10-17 04:16:16.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a9765c47e92'
+down_revision = '2b3dfef266af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.config.attributes.get('vault', True):
+        return
+
+    # Existing entries are filled in by `flask backfill-audit`
+    with op.batch_alter_table('passwords', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('strength_score', sa.SmallInteger(), nullable=True))
+        batch_op.create_index('idx_user_fingerprint', ['user_id', 'fingerprint'], unique=False)
+
+
+def downgrade():
+    if not context.config.attributes.get('vault', True):
+        return
+
+    with op.batch_alter_table('passwords', schema=None) as batch_op:
+        batch_op.drop_index('idx_user_fingerprint')
+        batch_op.drop_column('strength_score')
+        batch_op.drop_column('fingerprint')
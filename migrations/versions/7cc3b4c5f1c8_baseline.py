@@ -0,0 +1,66 @@
+"""baseline: users and passwords as first released
+
+Revision ID: 7cc3b4c5f1c8
+Revises: 
+Create Date: 2026-10-17 03:52:14.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7cc3b4c5f1c8'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    if directory:
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+            batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    if vault:
+        # A vault shard holds no users table to reference
+        foreign_keys = [sa.ForeignKeyConstraint(['user_id'], ['users.id'])] if directory else []
+        op.create_table('passwords',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('service_name', sa.String(length=120), nullable=False),
+            sa.Column('username', sa.String(length=120), nullable=False),
+            sa.Column('encrypted_password', sa.Text(), nullable=False),
+            sa.Column('url', sa.String(length=255), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            *foreign_keys,
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('passwords', schema=None) as batch_op:
+            batch_op.create_index('idx_user_created', ['user_id', 'created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_passwords_created_at'), ['created_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_passwords_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    if vault:
+        op.drop_table('passwords')
+    if directory:
+        op.drop_table('users')
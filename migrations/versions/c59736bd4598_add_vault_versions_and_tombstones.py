@@ -0,0 +1,59 @@
+"""vault versions and tombstones for delta sync
+
+Revision ID: c59736bd4598
+Revises: 7cc3b4c5f1c8
+Create Date: 2026-10-17 03:58:20.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c59736bd4598'
+down_revision = '7cc3b4c5f1c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    if directory:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('vault_version', sa.Integer(), nullable=False, server_default='0'))
+
+    if vault:
+        foreign_keys = [sa.ForeignKeyConstraint(['user_id'], ['users.id'])] if directory else []
+        op.create_table('password_tombstones',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('password_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+            *foreign_keys,
+            sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('password_tombstones', schema=None) as batch_op:
+            batch_op.create_index('idx_tombstone_user_deleted', ['user_id', 'deleted_at'], unique=False)
+            batch_op.create_index('idx_tombstone_user_version', ['user_id', 'version'], unique=False)
+
+        with op.batch_alter_table('passwords', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.create_index('idx_user_version', ['user_id', 'version'], unique=False)
+
+
+def downgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    if vault:
+        with op.batch_alter_table('passwords', schema=None) as batch_op:
+            batch_op.drop_index('idx_user_version')
+            batch_op.drop_column('version')
+        op.drop_table('password_tombstones')
+
+    if directory:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.drop_column('vault_version')
@@ -0,0 +1,36 @@
+"""shard placement and move fencing
+
+Revision ID: e092d960db50
+Revises: 7a9765c47e92
+Create Date: 2026-10-17 04:24:26.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e092d960db50'
+down_revision = '7a9765c47e92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shard', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('move_source', sa.SmallInteger(), nullable=True))
+        batch_op.add_column(sa.Column('move_target', sa.SmallInteger(), nullable=True))
+
+
+def downgrade():
+    if not context.config.attributes.get('directory', True):
+        return
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('move_target')
+        batch_op.drop_column('move_source')
+        batch_op.drop_column('shard')
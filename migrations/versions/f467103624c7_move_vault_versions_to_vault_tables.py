@@ -0,0 +1,64 @@
+"""move the vault version counter next to the vault rows
+
+Revision ID: f467103624c7
+Revises: e092d960db50
+Create Date: 2026-10-17 04:24:26.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f467103624c7'
+down_revision = 'e092d960db50'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    if vault:
+        foreign_keys = [sa.ForeignKeyConstraint(['user_id'], ['users.id'])] if directory else []
+        op.create_table('vault_versions',
+            sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+            *foreign_keys,
+            sa.PrimaryKeyConstraint('user_id')
+        )
+
+        if directory:
+            op.execute('INSERT INTO vault_versions (user_id, version) '
+                       'SELECT id, vault_version FROM users WHERE vault_version > 0')
+        else:
+            # The users table is on the primary; every write stamps at least one row
+            # or tombstone with its version, and neither is ever pruned
+            op.execute('INSERT INTO vault_versions (user_id, version) '
+                       'SELECT user_id, MAX(version) FROM ('
+                       'SELECT user_id, version FROM passwords '
+                       'UNION ALL SELECT user_id, version FROM password_tombstones'
+                       ') AS stamped GROUP BY user_id HAVING MAX(version) > 0')
+
+    if directory:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.drop_column('vault_version')
+
+
+def downgrade():
+    directory = context.config.attributes.get('directory', True)
+    vault = context.config.attributes.get('vault', True)
+
+    # A sharded primary cannot see the counters, so its users restart at 0 and
+    # delta-sync clients need a full sync after downgrading
+    if directory:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('vault_version', sa.Integer(), nullable=False, server_default='0'))
+
+    if vault:
+        if directory:
+            op.execute('UPDATE users SET vault_version = '
+                       '(SELECT version FROM vault_versions WHERE vault_versions.user_id = users.id) '
+                       'WHERE id IN (SELECT user_id FROM vault_versions)')
+        op.drop_table('vault_versions')
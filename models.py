@@ -1,6 +1,7 @@
-from app import db
+from extensions import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from utils.hashing import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -9,6 +10,15 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
+    # Embedded in refresh tokens; bumped to revoke them all (e.g. on password change)
+    token_version = db.Column(db.Integer, nullable=False, default=0)
+    # Per-user data key, wrapped with the master encryption key
+    data_key = db.Column(db.Text, nullable=True)
+    # Vault shard the user is pinned to (see utils/sharding.py); NULL when the vault is on the primary
+    shard = db.Column(db.SmallInteger, nullable=True)
+    # Source and target shards while the vault is being moved (shard is MOVING)
+    move_source = db.Column(db.SmallInteger, nullable=True)
+    move_target = db.Column(db.SmallInteger, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -17,11 +27,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verify the user's password"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True if the stored hash uses outdated hashing parameters"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -40,23 +54,130 @@ class Password(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     service_name = db.Column(db.String(120), nullable=False)
     username = db.Column(db.String(120), nullable=False)
-    encrypted_password = db.Column(db.Text, nullable=False)
+    # Legacy base64 Fernet token; superseded by encrypted_blob and cleared when upgraded
+    encrypted_password = db.Column(db.Text, nullable=True)
+    # Versioned binary AES-GCM ciphertext (see PasswordEncryption.encrypt_blob)
+    encrypted_blob = db.Column(db.LargeBinary, nullable=True)
+    # Keyed HMAC of the plain text (see PasswordEncryption.fingerprint) for reuse detection
+    fingerprint = db.Column(db.String(32), nullable=True)
+    # Cached 0-4 estimator score of the plain text; NULL until written or backfilled
+    strength_score = db.Column(db.SmallInteger, nullable=True)
     url = db.Column(db.String(255), nullable=True)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Vault version of the write that last changed the row; the delta sync cursor
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     __table_args__ = (
         db.Index('idx_user_created', 'user_id', 'created_at'),
+        db.Index('idx_user_fingerprint', 'user_id', 'fingerprint'),
+        db.Index('idx_user_version', 'user_id', 'version'),
     )
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'service_name': self.service_name,
-            'username': self.username,
-            'url': self.url,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+    # Fields that may be requested through the ``fields=`` projection
+    SERIALIZABLE_FIELDS = ('id', 'service_name', 'username', 'url', 'notes', 'created_at', 'updated_at')
+    
+    @property
+    def ciphertext(self):
+        """Stored secret in whichever format the row currently uses"""
+        return self.encrypted_blob if self.encrypted_blob is not None else self.encrypted_password
+    
+    def to_dict(self, fields=None):
+        data = {}
+        for field in fields or self.SERIALIZABLE_FIELDS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+
+class PasswordTombstone(db.Model):
+    """Records deleted password ids so delta sync clients can drop them"""
+    __tablename__ = 'password_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    password_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Vault version of the deleting write (see Password.version)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        db.Index('idx_tombstone_user_deleted', 'user_id', 'deleted_at'),
+        db.Index('idx_tombstone_user_version', 'user_id', 'version'),
+    )
+
+
+class VaultVersion(db.Model):
+    """
+    Per-user vault version, bumped on every vault write
+    
+    Stored with the vault tables (on the user's shard), so a version commits in
+    the same transaction as the rows stamped with it and a sync token never runs
+    ahead of the rows a client can see.
+    """
+    __tablename__ = 'vault_versions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    @staticmethod
+    def current(user_id):
+        """Latest committed version of a user's vault (0 before its first write)"""
+        return db.session.query(VaultVersion.version).filter_by(user_id=user_id).scalar() or 0
+    
+    @staticmethod
+    def bump(user_id):
+        """
+        Atomically increment a user's vault version inside the current transaction
+        
+        The update locks the counter row until commit, so concurrent writers to one
+        vault get versions in commit order.
+        
+        Returns:
+            The new version, stamped on the rows the transaction writes
+        """
+        updated = VaultVersion.query.filter_by(user_id=user_id).update(
+            {VaultVersion.version: VaultVersion.version + 1},
+            synchronize_session=False
+        )
+        if not updated:
+            # First write to the vault; a concurrent first write fails on the primary key
+            db.session.add(VaultVersion(user_id=user_id, version=1))
+            db.session.flush()
+        return db.session.query(VaultVersion.version).filter_by(user_id=user_id).scalar()
+
+
+class RevokedToken(db.Model):
+    """Access and refresh tokens revoked before their natural expiry (logout, refresh rotation)"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    # Indexed so expired entries can be pruned without a table scan
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    @staticmethod
+    def is_revoked(jti):
+        return db.session.query(RevokedToken.id).filter_by(jti=jti).first() is not None
+    
+    @staticmethod
+    def prune(now=None):
+        """
+        Delete entries whose token has expired anyway, inside the current transaction
+        
+        Returns:
+            Number of entries deleted
+        """
+        return RevokedToken.query.filter(RevokedToken.expires_at < (now or datetime.utcnow())).delete(
+            synchronize_session=False
+        )
+
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_deleted_user(mapper, connection, user):
+    """Stop serving a deleted user from the identity and shard caches"""
+    from utils.sharding import shard_router
+    from utils.user_cache import user_cache
+    user_cache.invalidate(user.id)
+    shard_router.cache.invalidate(user.id)
@@ -1,9 +1,27 @@
-from flask import request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import request, jsonify, current_app
+from flask_jwt_extended import (
+    create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt, get_jwt_identity
+)
 from routes import auth_bp
-from app import db
-from models import User
-from datetime import timedelta
+from extensions import db
+from models import User, RevokedToken
+from utils.user_cache import user_cache
+from utils.encryption import encryption
+from utils.sharding import shard_router
+from utils.vault_audit import refingerprint_vault
+from datetime import datetime
+
+def _issue_tokens(user):
+    """Create a refresh token and a short-lived access token linked to it"""
+    refresh_token = create_refresh_token(identity=user.id, additional_claims={'tv': user.token_version})
+    refresh_jti = decode_token(refresh_token)['jti']
+    access_token = create_access_token(identity=user.id, additional_claims={'rjti': refresh_jti})
+    return access_token, refresh_token
+
+def _revoke_token(jti, expires_at):
+    """Add a token to the blocklist (idempotent)"""
+    if not RevokedToken.is_revoked(jti):
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -24,16 +42,22 @@ def register():
     
     user = User(username=data['username'], email=data['email'])
     user.set_password(data['password'])
+    user.data_key = encryption.create_user_key()
     
     db.session.add(user)
+    # Pin the new vault to its hash shard so later changes to the shard count never move it
+    if shard_router.enabled:
+        db.session.flush()
+        user.shard = shard_router.place(user.id)
     db.session.commit()
     
-    access_token = create_access_token(identity=user.id, expires_delta=timedelta(hours=24))
+    access_token, refresh_token = _issue_tokens(user)
     
     return jsonify({
         'message': 'User registered successfully',
         'user': user.to_dict(),
-        'access_token': access_token
+        'access_token': access_token,
+        'refresh_token': refresh_token
     }), 201
 
 @auth_bp.route('/login', methods=['POST'])
@@ -49,32 +73,89 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid username or password'}), 401
     
-    access_token = create_access_token(identity=user.id, expires_delta=timedelta(hours=24))
+    # Transparently upgrade hashes created with older parameters
+    needs_commit = False
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        needs_commit = True
+    
+    # Accounts created before per-user keys get one while the password is at hand
+    if not user.data_key:
+        user.data_key = encryption.create_user_key()
+        # Existing fingerprints used the master key; switch them to the new key
+        # in the same transaction so reuse detection keeps matching
+        with shard_router.scope(shard_router.shard_for(user.id)):
+            refingerprint_vault(db, encryption, user.id)
+        needs_commit = True
+    
+    if needs_commit:
+        db.session.commit()
+        user_cache.invalidate(user.id)
+    
+    access_token, refresh_token = _issue_tokens(user)
     
     return jsonify({
         'message': 'Login successful',
         'user': user.to_dict(),
-        'access_token': access_token
+        'access_token': access_token,
+        'refresh_token': refresh_token
     }), 200
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Exchange a refresh token for a new access and refresh token pair
+    
+    Refresh tokens are single-use: the presented one is revoked, so a stolen
+    copy stops working as soon as the client rotates it.
+    """
+    user_id = get_jwt_identity()
+    claims = get_jwt()
+    
+    user = db.session.get(User, user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    if claims.get('tv') != user.token_version:
+        return jsonify({'error': 'Refresh token has been revoked'}), 401
+    
+    _revoke_token(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    db.session.commit()
+    
+    access_token, refresh_token = _issue_tokens(user)
+    
+    return jsonify({'access_token': access_token, 'refresh_token': refresh_token}), 200
+
 @auth_bp.route('/me', methods=['GET'])
+@jwt_required()
 def get_current_user():
     """Get current authenticated user"""
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = user_cache.load(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(user), 200
     except Exception as e:
         return jsonify({'error': 'Unauthorized'}), 401
 
 @auth_bp.route('/logout', methods=['POST'])
-@jwt_required()
+@jwt_required(verify_type=False)
 def logout():
-    """Logout user (client-side token removal)"""
+    """Logout user by revoking the presented token and the refresh token behind it"""
+    claims = get_jwt()
+    
+    _revoke_token(claims['jti'], datetime.utcfromtimestamp(claims['exp']))
+    if claims['type'] == 'access' and claims.get('rjti'):
+        # The refresh token's exact expiry is unknown here, so store an upper bound
+        _revoke_token(claims['rjti'], datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+    
+    # Expired tokens fail verification on their own, so their entries are dead weight
+    RevokedToken.prune()
+    db.session.commit()
     return jsonify({'message': 'Logout successful'}), 200
 
 @auth_bp.route('/change-password', methods=['POST'])
@@ -99,6 +180,15 @@ def change_password():
         return jsonify({'error': 'New password must be at least 8 characters long'}), 400
     
     user.set_password(data['new_password'])
+    # Sign out every other session holding a refresh token
+    user.token_version += 1
     db.session.commit()
+    user_cache.invalidate(user_id)
+    
+    access_token, refresh_token = _issue_tokens(user)
     
-    return jsonify({'message': 'Password changed successfully'}), 200
+    return jsonify({
+        'message': 'Password changed successfully',
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }), 200
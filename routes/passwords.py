@@ -1,32 +1,204 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context, after_this_request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, or_, select, update, delete, bindparam
+from sqlalchemy.orm import load_only
 from routes import passwords_bp
-from app import db
-from models import User, Password
+from extensions import db
+from models import User, Password, PasswordTombstone, VaultVersion
 from utils.encryption import encryption, PasswordStorage
-from utils.password_generator import PasswordGenerator, PasswordValidator
+from utils.password_generator import PasswordGenerator, PasswordValidator, PasswordAnalyzer
+from utils.search import search_index
+from utils.strength_estimator import estimator
+from utils.database import use_replica
+from utils.user_cache import user_cache
+from utils.vault_audit import secret_fields, audit_vault
+from utils.vault_io import (
+    detect_format, iter_import_records, iter_export_chunks, FORMAT_MIMETYPES, ExportAborted, ImportFormatError
+)
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import base64
+import hashlib
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_REVEAL_IDS = 500
+REVEAL_WORKERS = 4
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 1000
+EXPORT_BATCH_SIZE = 500
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+MAX_BATCH_OPERATIONS = 500
+MAX_ANALYZE_LENGTH = 512
+
+# Shared, bounded pool used to decrypt batches of entries
+_reveal_executor = ThreadPoolExecutor(max_workers=REVEAL_WORKERS, thread_name_prefix='reveal')
+
+def _encode_cursor(password_entry):
+    """Build an opaque keyset cursor from the (created_at, id) of the last entry on a page"""
+    raw = f"{password_entry.created_at.isoformat()}|{password_entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    """Parse a cursor produced by _encode_cursor, raising ValueError if it is malformed"""
+    try:
+        created_at, password_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), int(password_id)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+def _vault_etag(user_id, vault_version):
+    """ETag for a list response: the user's vault version plus the query parameters"""
+    raw = f"{user_id}:{vault_version}:{request.query_string.decode()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def _build_update_values(data, user_id):
+    """
+    Validate a partial update and translate it into column values
+    
+    Returns:
+        Tuple of (values, error_message, status_code); error_message is None on success
+    """
+    values = {}
+    
+    if 'service_name' in data:
+        if len(data['service_name']) > 120:
+            return None, 'Service name too long', 400
+        values['service_name'] = data['service_name'].strip()
+    
+    if 'username' in data:
+        if len(data['username']) > 120:
+            return None, 'Username too long', 400
+        values['username'] = data['username'].strip()
+    
+    if 'password' in data:
+        try:
+            values.update(secret_fields(encryption, data['password'], user_id))
+        except Exception as e:
+            return None, 'Failed to encrypt password', 500
+    
+    if 'url' in data:
+        if data['url'] and len(data['url']) > 255:
+            return None, 'URL too long', 400
+        values['url'] = data['url'].strip() if data['url'] else None
+    
+    if 'notes' in data:
+        if data['notes'] and len(data['notes']) > 1000:
+            return None, 'Notes too long', 400
+        values['notes'] = data['notes'].strip() if data['notes'] else None
+    
+    return values, None, None
+
+def _parse_fields(raw_fields):
+    """Parse a comma separated ``fields=`` projection, raising ValueError on unknown fields"""
+    if not raw_fields:
+        return None
+    
+    fields = [f.strip() for f in raw_fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in Password.SERIALIZABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    
+    return fields or None
 
 @passwords_bp.route('', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_passwords():
     """Get all passwords for authenticated user"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    # Read the version straight from the database: other workers may have
+    # written to the vault, so a cached value could produce a stale 304.
+    # It lives with the entries (on their shard, or the replica serving them),
+    # keeping the ETag consistent with the content it labels
+    vault_version = VaultVersion.current(user_id)
     
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
+    etag = _vault_etag(user_id, vault_version)
+    if request.if_none_match.contains_weak(etag):
+        return '', 304, {'ETag': f'W/"{etag}"'}
+    
+    @after_this_request
+    def set_etag(response):
+        if response.status_code == 200:
+            response.set_etag(etag, weak=True)
+        return response
+    
+    try:
+        fields = _parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if 'since' in request.args:
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({'error': 'since must be a sync_token from a previous response (0 for a full sync)'}), 400
+        
+        # Rows are stamped with the vault version of the transaction that wrote
+        # them, and that version commits together with the rows in the same
+        # database. Everything up to vault_version (read above) is therefore
+        # already visible; rows of later commits may be returned again next
+        # time, which is harmless.
+        query = Password.query.filter(Password.user_id == user_id, Password.version > since)
+        if fields:
+            query = query.options(load_only(*(getattr(Password, f) for f in set(fields) | {'id'})))
+        
+        deleted = PasswordTombstone.query.with_entities(PasswordTombstone.password_id).filter(
+            PasswordTombstone.user_id == user_id,
+            PasswordTombstone.version > since
+        )
+        
+        return jsonify({
+            'passwords': [p.to_dict(fields) for p in query.order_by(Password.id)],
+            'deleted': sorted({row.password_id for row in deleted}),
+            'sync_token': vault_version
+        }), 200
+    
+    # Newest first; the id tie-breaker keeps keyset pagination stable and is
+    # covered by idx_user_created together with the primary key
+    query = Password.query.filter_by(user_id=user_id).order_by(Password.created_at.desc(), Password.id.desc())
+    
+    if fields:
+        columns = set(fields) | {'id', 'created_at'}
+        query = query.options(load_only(*(getattr(Password, c) for c in columns)))
+    
+    # Without pagination parameters keep returning the plain list for existing clients
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return jsonify([p.to_dict(fields) for p in query.all()]), 200
+    
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = _decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = query.filter(or_(
+            Password.created_at < cursor_created_at,
+            and_(Password.created_at == cursor_created_at, Password.id < cursor_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    passwords = query.limit(limit + 1).all()
+    has_more = len(passwords) > limit
+    passwords = passwords[:limit]
     
-    passwords = Password.query.filter_by(user_id=user_id).order_by(Password.created_at.desc()).all()
-    return jsonify([p.to_dict() for p in passwords]), 200
+    return jsonify({
+        'passwords': [p.to_dict(fields) for p in passwords],
+        'next_cursor': _encode_cursor(passwords[-1]) if has_more else None,
+        'has_more': has_more
+    }), 200
 
 @passwords_bp.route('', methods=['POST'])
 @jwt_required()
 def add_password():
     """Add a new password entry"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
     
-    if not user:
+    if not user_cache.load(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
@@ -35,25 +207,166 @@ def add_password():
     if not is_valid:
         return jsonify({'error': error_msg}), 400
     
+    # Stored credentials that already leaked are refused unless the client opts in
+    if not data.get('allow_breached') and PasswordValidator.is_breached_password(data['password']):
+        return jsonify({'error': 'This password has appeared in a data breach'}), 400
+    
     sanitized_data = PasswordStorage.sanitize_password_entry(data)
-    encrypted_pwd = encryption.encrypt(sanitized_data['password'], user_id)
     
     password_entry = Password(
         user_id=user_id,
         service_name=sanitized_data['service_name'],
         username=sanitized_data['username'],
-        encrypted_password=encrypted_pwd,
         url=sanitized_data['url'],
-        notes=sanitized_data['notes']
+        notes=sanitized_data['notes'],
+        **secret_fields(encryption, sanitized_data['password'], user_id)
     )
     
+    password_entry.version = VaultVersion.bump(user_id)
     db.session.add(password_entry)
     db.session.commit()
     
     return jsonify({'message': 'Password added successfully', 'password': password_entry.to_dict()}), 201
 
+@passwords_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_passwords():
+    """Stream a CSV or NDJSON upload into the vault"""
+    user_id = get_jwt_identity()
+    
+    if not user_cache.load(user_id):
+        return jsonify({'error': 'User not found'}), 404
+    
+    fmt = detect_format(request.args.get('format'), request.mimetype)
+    if not fmt:
+        return jsonify({'error': 'Unsupported import format (use csv or ndjson)'}), 400
+    
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    
+    def record_error(row_number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({'row': row_number, 'error': message})
+    
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        version = VaultVersion.bump(user_id)
+        for row in batch:
+            row['version'] = version
+        # Single executemany per batch instead of one ORM flush per entry
+        db.session.execute(Password.__table__.insert(), batch)
+        db.session.commit()
+        imported += len(batch)
+        batch.clear()
+    
+    try:
+        for row_number, record, parse_error in iter_import_records(request.stream, fmt):
+            if parse_error:
+                record_error(row_number, parse_error)
+                continue
+            
+            is_valid, error_msg = PasswordStorage.validate_password_entry(record)
+            if not is_valid:
+                record_error(row_number, error_msg)
+                continue
+            
+            sanitized_data = PasswordStorage.sanitize_password_entry(record)
+            batch.append({
+                'user_id': user_id,
+                'service_name': sanitized_data['service_name'],
+                'username': sanitized_data['username'],
+                'url': sanitized_data['url'],
+                'notes': sanitized_data['notes'],
+                **secret_fields(encryption, sanitized_data['password'], user_id)
+            })
+            
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        
+        flush()
+    except (UnicodeDecodeError, ImportFormatError) as e:
+        db.session.rollback()
+        return jsonify({
+            'error': str(e) if isinstance(e, ImportFormatError) else 'Upload is not valid UTF-8',
+            'imported': imported,
+            'failed': failed,
+            'errors': errors,
+            'errors_truncated': failed > len(errors)
+        }), 400
+    
+    return jsonify({
+        'message': 'Import finished',
+        'imported': imported,
+        'failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    }), 200
+
+@passwords_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_passwords():
+    """
+    Stream the decrypted vault as CSV or NDJSON
+    
+    An entry that fails to decrypt aborts the transfer instead of being exported
+    with an empty password.
+    """
+    user_id = get_jwt_identity()
+    
+    if not user_cache.load(user_id):
+        return jsonify({'error': 'User not found'}), 404
+    
+    fmt = detect_format(request.args.get('format', 'ndjson'))
+    if not fmt:
+        return jsonify({'error': 'Unsupported export format (use csv or ndjson)'}), 400
+    
+    def iter_entries():
+        # yield_per keeps only one batch of rows hydrated at a time
+        rows = db.session.execute(
+            select(Password)
+            .where(Password.user_id == user_id)
+            .order_by(Password.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        ).scalars()
+        
+        for password_entry in rows:
+            try:
+                password = encryption.decrypt(password_entry.ciphertext, user_id)
+            except ValueError:
+                # The status line has already been sent. Never write an entry
+                # without its secret: end the stream without its final chunk so
+                # clients see a failed download rather than an incomplete vault
+                current_app.logger.error(
+                    'Export for user %s aborted: entry %s cannot be decrypted', user_id, password_entry.id
+                )
+                raise ExportAborted(f'Entry {password_entry.id} cannot be decrypted')
+            
+            yield {
+                'service_name': password_entry.service_name,
+                'username': password_entry.username,
+                'password': password,
+                'url': password_entry.url,
+                'notes': password_entry.notes
+            }
+    
+    return Response(
+        stream_with_context(iter_export_chunks(iter_entries(), fmt)),
+        mimetype=FORMAT_MIMETYPES[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename=vault.{fmt}',
+            'Cache-Control': 'no-store'
+        }
+    )
+
 @passwords_bp.route('/<int:password_id>', methods=['GET'])
 @jwt_required()
+@use_replica
 def get_password(password_id):
     """Get a specific password (decrypted)"""
     user_id = get_jwt_identity()
@@ -67,12 +380,199 @@ def get_password(password_id):
     
     pwd_dict = password_entry.to_dict()
     try:
-        pwd_dict['password'] = encryption.decrypt(password_entry.encrypted_password)
+        pwd_dict['password'] = encryption.decrypt(password_entry.ciphertext, user_id)
     except ValueError as e:
         return jsonify({'error': 'Failed to decrypt password'}), 500
     
     return jsonify(pwd_dict), 200
 
+@passwords_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_passwords():
+    """Ranked prefix search over service name, username, URL and notes"""
+    user_id = get_jwt_identity()
+    
+    try:
+        fields = _parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    
+    ids = search_index.search_ids(db.session, user_id, request.args.get('q', ''), limit)
+    if not ids:
+        return jsonify([]), 200
+    
+    query = Password.query.filter(Password.user_id == user_id, Password.id.in_(ids))
+    if fields:
+        query = query.options(load_only(*(getattr(Password, f) for f in set(fields) | {'id'})))
+    
+    entries_by_id = {entry.id: entry for entry in query}
+    return jsonify([entries_by_id[i].to_dict(fields) for i in ids if i in entries_by_id]), 200
+
+@passwords_bp.route('/audit', methods=['GET'])
+@jwt_required()
+def audit_passwords():
+    """Report reused and weak passwords without decrypting the vault"""
+    user_id = get_jwt_identity()
+    
+    if not user_cache.load(user_id):
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify(audit_vault(db, user_id)), 200
+
+@passwords_bp.route('/reveal', methods=['POST'])
+@jwt_required()
+def reveal_passwords():
+    """Decrypt several password entries in one request"""
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'error': 'ids must be a non-empty list'}), 400
+    
+    if len(ids) > MAX_REVEAL_IDS:
+        return jsonify({'error': f'Too many ids (max {MAX_REVEAL_IDS})'}), 400
+    
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids must be integers'}), 400
+    
+    entries = Password.query.filter(Password.user_id == user_id, Password.id.in_(set(ids))).all()
+    entries_by_id = {entry.id: entry for entry in entries}
+    
+    app = current_app._get_current_object()
+    
+    def decrypt(entry):
+        # Worker threads need an app context to load the user's data key on a cache miss
+        with app.app_context():
+            try:
+                return encryption.decrypt(entry.ciphertext, user_id), None
+            except ValueError:
+                return None, 'Failed to decrypt password'
+    
+    decrypted = dict(zip(entries_by_id, _reveal_executor.map(decrypt, entries_by_id.values())))
+    
+    results = []
+    for password_id in ids:
+        if password_id not in entries_by_id:
+            results.append({'id': password_id, 'error': 'Password entry not found'})
+            continue
+        
+        password, error = decrypted[password_id]
+        if error:
+            results.append({'id': password_id, 'error': error})
+        else:
+            pwd_dict = entries_by_id[password_id].to_dict()
+            pwd_dict['password'] = password
+            results.append(pwd_dict)
+    
+    return jsonify({'results': results}), 200
+
+@passwords_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_passwords():
+    """Apply several update/delete operations in a single transaction"""
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'Too many operations (max {MAX_BATCH_OPERATIONS})'}), 400
+    
+    # All-or-nothing by default; atomic=false applies the valid operations only
+    atomic = data.get('atomic', True)
+    if not isinstance(atomic, bool):
+        return jsonify({'error': 'atomic must be true or false'}), 400
+    
+    def valid_id(value):
+        # bool is an int subclass, but true is not entry 1
+        return isinstance(value, int) and not isinstance(value, bool)
+    
+    ids = [op.get('id') for op in operations if isinstance(op, dict)]
+    owned_ids = {
+        row.id for row in db.session.execute(
+            select(Password.id).where(Password.user_id == user_id, Password.id.in_(
+                [i for i in ids if valid_id(i)]
+            ))
+        )
+    }
+    
+    results = []
+    updates = {}
+    delete_ids = []
+    seen_ids = set()
+    
+    for op in operations:
+        if not isinstance(op, dict):
+            results.append({'id': None, 'op': None, 'status': 'error', 'error': 'Invalid operation'})
+            continue
+        
+        password_id, action = op.get('id'), op.get('op')
+        result = {'id': password_id, 'op': action}
+        results.append(result)
+        
+        if action not in ('update', 'delete'):
+            result.update(status='error', error='op must be update or delete')
+        elif not valid_id(password_id):
+            result.update(status='error', error='id must be an integer')
+        elif password_id in seen_ids:
+            result.update(status='error', error='Duplicate operation for id')
+        elif password_id not in owned_ids:
+            result.update(status='error', error='Password entry not found')
+        elif action == 'delete':
+            delete_ids.append(password_id)
+            result['status'] = 'deleted'
+        elif not isinstance(op.get('data', {}), dict):
+            result.update(status='error', error='data must be an object')
+        else:
+            values, error_msg, _ = _build_update_values(op.get('data') or {}, user_id)
+            if error_msg:
+                result.update(status='error', error=error_msg)
+            elif values:
+                # Group by column set so each group runs as one executemany
+                updates.setdefault(tuple(sorted(values)), []).append(dict(values, b_id=password_id))
+                result['status'] = 'updated'
+            else:
+                result['status'] = 'updated'
+        
+        if valid_id(password_id):
+            seen_ids.add(password_id)
+    
+    failed = sum(1 for r in results if r['status'] == 'error')
+    if atomic and failed:
+        for r in results:
+            if r['status'] != 'error':
+                r['status'] = 'skipped'
+        return jsonify({'error': 'Batch rejected', 'applied': 0, 'failed': failed, 'results': results}), 400
+    
+    applied = len(results) - failed
+    version = VaultVersion.bump(user_id) if applied else None
+    
+    table = Password.__table__
+    for columns, rows in updates.items():
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.user_id == user_id)
+            .values({**{c: bindparam(c) for c in columns}, 'version': version})
+        )
+        db.session.execute(statement, rows)
+    
+    if delete_ids:
+        db.session.execute(delete(table).where(table.c.user_id == user_id, table.c.id.in_(delete_ids)))
+        db.session.execute(
+            PasswordTombstone.__table__.insert(),
+            [{'user_id': user_id, 'password_id': i, 'version': version} for i in delete_ids]
+        )
+    
+    db.session.commit()
+    
+    return jsonify({'applied': applied, 'failed': failed, 'results': results}), 200
+
 @passwords_bp.route('/<int:password_id>', methods=['PUT'])
 @jwt_required()
 def update_password(password_id):
@@ -88,31 +588,13 @@ def update_password(password_id):
     
     data = request.get_json()
     
-    if 'service_name' in data:
-        if len(data['service_name']) > 120:
-            return jsonify({'error': 'Service name too long'}), 400
-        password_entry.service_name = data['service_name'].strip()
-    
-    if 'username' in data:
-        if len(data['username']) > 120:
-            return jsonify({'error': 'Username too long'}), 400
-        password_entry.username = data['username'].strip()
-    
-    if 'password' in data:
-        try:
-            password_entry.encrypted_password = encryption.encrypt(data['password'], user_id)
-        except Exception as e:
-            return jsonify({'error': 'Failed to encrypt password'}), 500
-    
-    if 'url' in data:
-        if data['url'] and len(data['url']) > 255:
-            return jsonify({'error': 'URL too long'}), 400
-        password_entry.url = data['url'].strip() if data['url'] else None
+    values, error_msg, status = _build_update_values(data, user_id)
+    if error_msg:
+        return jsonify({'error': error_msg}), status
     
-    if 'notes' in data:
-        if data['notes'] and len(data['notes']) > 1000:
-            return jsonify({'error': 'Notes too long'}), 400
-        password_entry.notes = data['notes'].strip() if data['notes'] else None
+    password_entry.version = VaultVersion.bump(user_id)
+    for column, value in values.items():
+        setattr(password_entry, column, value)
     
     db.session.commit()
     return jsonify({'message': 'Password updated successfully', 'password': password_entry.to_dict()}), 200
@@ -130,7 +612,9 @@ def delete_password(password_id):
     if password_entry.user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    version = VaultVersion.bump(user_id)
     db.session.delete(password_entry)
+    db.session.add(PasswordTombstone(user_id=user_id, password_id=password_id, version=version))
     db.session.commit()
     
     return jsonify({'message': 'Password deleted successfully'}), 200
@@ -141,23 +625,67 @@ def generate_password():
     """Generate a new password with custom options"""
     data = request.get_json() or {}
     
+    if data.get('mode') == 'passphrase':
+        try:
+            result = PasswordGenerator.generate_passphrase(
+                word_count=data.get('word_count', 6),
+                separator=data.get('separator', '-'),
+                capitalize=data.get('capitalize', False),
+                include_digit=data.get('include_digit', False)
+            )
+            
+            # Scored from the entropy: character-class advice means nothing for words
+            return jsonify({
+                'password': result['passphrase'],
+                'entropy_bits': round(result['entropy_bits'], 1),
+                'strength': PasswordGenerator.passphrase_strength(result['entropy_bits']),
+                'crack_time': PasswordGenerator.estimate_crack_time(result['passphrase'], result['entropy_bits'])
+            }), 200
+        except Exception as e:
+            return jsonify({'error': f'Failed to generate passphrase: {str(e)}'}), 500
+    
+    options = {
+        'length': data.get('length', 16),
+        'use_uppercase': data.get('use_uppercase', True),
+        'use_lowercase': data.get('use_lowercase', True),
+        'use_digits': data.get('use_digits', True),
+        'use_special': data.get('use_special', True),
+        'exclude_ambiguous': data.get('exclude_ambiguous', False)
+    }
+    
     try:
-        password = PasswordGenerator.generate(
-            length=data.get('length', 16),
-            use_uppercase=data.get('use_uppercase', True),
-            use_lowercase=data.get('use_lowercase', True),
-            use_digits=data.get('use_digits', True),
-            use_special=data.get('use_special', True),
-            exclude_ambiguous=data.get('exclude_ambiguous', False)
-        )
+        # Batch mode: many passwords from one option set, strength analysis on request
+        if 'count' in data:
+            count = data['count']
+            # bool is a subclass of int, but true is not a count
+            if isinstance(count, bool) or not isinstance(count, int) \
+                    or not 1 <= count <= PasswordGenerator.MAX_BATCH_SIZE:
+                return jsonify({'error': f'count must be between 1 and {PasswordGenerator.MAX_BATCH_SIZE}'}), 400
+            
+            passwords = PasswordGenerator.generate_batch(count, **options)
+            
+            if not data.get('include_strength', False):
+                return jsonify({'passwords': passwords}), 200
+            
+            results = []
+            for password in passwords:
+                analysis = PasswordAnalyzer.analyze(password)
+                results.append({
+                    'password': password,
+                    'strength': analysis['strength'],
+                    'crack_time': analysis['crack_time']
+                })
+            
+            return jsonify({'passwords': results}), 200
+        
+        password = PasswordGenerator.generate(**options)
         
-        strength = PasswordGenerator.check_strength(password)
-        crack_time = PasswordGenerator.estimate_crack_time(password)
+        analysis = PasswordAnalyzer.analyze(password)
         
         return jsonify({
             'password': password,
-            'strength': strength,
-            'crack_time': crack_time
+            'strength': analysis['strength'],
+            'crack_time': analysis['crack_time']
         }), 200
     except Exception as e:
         return jsonify({'error': f'Failed to generate password: {str(e)}'}), 500
@@ -170,14 +698,14 @@ def check_strength():
     if not data or not data.get('password'):
         return jsonify({'error': 'Password required'}), 400
     
+    if len(data['password']) > MAX_ANALYZE_LENGTH:
+        return jsonify({'error': f'Password must be at most {MAX_ANALYZE_LENGTH} characters'}), 400
+    
     try:
-        strength = PasswordGenerator.check_strength(data['password'])
-        crack_time = PasswordGenerator.estimate_crack_time(data['password'])
+        result = PasswordAnalyzer.analyze(data['password'])
+        result['analysis'] = estimator.estimate(data['password'])
         
-        return jsonify({
-            'strength': strength,
-            'crack_time': crack_time
-        }), 200
+        return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': f'Failed to check strength: {str(e)}'}), 500
 
@@ -189,6 +717,9 @@ def validate_password():
     if not data or not data.get('password'):
         return jsonify({'error': 'Password required'}), 400
     
+    if len(data['password']) > MAX_ANALYZE_LENGTH:
+        return jsonify({'error': f'Password must be at most {MAX_ANALYZE_LENGTH} characters'}), 400
+    
     try:
         validation = PasswordValidator.validate(data['password'])
         return jsonify(validation), 200
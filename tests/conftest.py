@@ -0,0 +1,94 @@
+"""
+Shared fixtures: a fresh application and SQLite database per test
+
+The environment is set before the app is imported, since the encryption,
+hashing and cache singletons read it at import time.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Fixed master key, so tests can build other keyrings around it
+MASTER_KEY = 'yx1eQKv1qX3yZ0mAZyaJ5jFHnqD6xqO5dcJzK4cvbYk='
+os.environ['ENCRYPTION_KEY'] = MASTER_KEY
+os.environ.pop('ENCRYPTION_KEYS', None)
+# Hash inline instead of starting a process pool per test session
+os.environ['HASH_POOL_WORKERS'] = '0'
+# Moves would otherwise wait for the shard cache to expire
+os.environ['SHARD_CACHE_TTL'] = '0'
+
+from app import create_app  # noqa: E402
+from config import TestingConfig  # noqa: E402
+from extensions import db as _db  # noqa: E402
+
+PASSWORD = 'Secret123!'
+
+
+def _make_app(tmp_path, **settings):
+    config = type('Config', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        **settings
+    })
+    app = create_app(config)
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    return app
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Every test starts a new database whose ids restart at 1"""
+    from utils.encryption import encryption
+    from utils.sharding import shard_router
+    from utils.user_cache import user_cache
+
+    for cache in (user_cache, encryption.user_key_cache, shard_router.cache):
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def app(tmp_path):
+    return _make_app(tmp_path)
+
+
+@pytest.fixture
+def sharded_app(tmp_path):
+    return _make_app(tmp_path, VAULT_SHARD_URLS=[
+        f"sqlite:///{tmp_path / 'shard0.db'}",
+        f"sqlite:///{tmp_path / 'shard1.db'}"
+    ])
+
+
+@pytest.fixture
+def db():
+    return _db
+
+
+@pytest.fixture
+def register():
+    """Register a user through the API and return (user id, auth headers)"""
+    def register(client, username):
+        response = client.post('/api/auth/register', json={
+            'username': username, 'email': f'{username}@example.com', 'password': PASSWORD
+        })
+        assert response.status_code == 201, response.get_json()
+        body = response.get_json()
+        return body['user']['id'], {'Authorization': f"Bearer {body['access_token']}"}
+    return register
+
+
+@pytest.fixture
+def add_entry():
+    """Add a vault entry through the API and return its id"""
+    def add_entry(client, headers, service_name, password='Xy!9kq2LmZ#t'):
+        response = client.post('/api/passwords', json={
+            'service_name': service_name, 'username': 'user', 'password': password
+        }, headers=headers)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['password']['id']
+    return add_entry
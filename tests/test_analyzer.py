@@ -0,0 +1,35 @@
+import math
+
+from utils.password_generator import (
+    MAX_REPORTED_SECONDS, CharacterClasses, PasswordAnalyzer, PasswordGenerator, PasswordValidator,
+    classify_characters
+)
+
+
+def test_classifies_characters_in_one_pass():
+    assert classify_characters('aB3!') == CharacterClasses(True, True, True, True)
+    assert classify_characters('abc') == CharacterClasses(False, True, False, False)
+    assert classify_characters('') == CharacterClasses(False, False, False, False)
+
+
+def test_analyze_matches_the_individual_checks():
+    for password in ('Xy!9kq2LmZ#t', 'password', 'aaa111', 'correct-horse-battery-staple'):
+        result = PasswordAnalyzer.analyze(password)
+        assert result['strength'] == PasswordGenerator.check_strength(password)
+        assert result['crack_time'] == PasswordGenerator.estimate_crack_time(password)
+        assert result['validation'] == PasswordValidator.validate(password)
+
+
+def test_crack_times_of_huge_inputs_stay_finite():
+    crack_time = PasswordGenerator.estimate_crack_time('aB3!' * 5000)
+
+    assert crack_time['seconds'] == MAX_REPORTED_SECONDS
+    assert crack_time['unit'] == 'year'
+    assert 'e' in crack_time['time'].split()[0]
+    assert math.isfinite(crack_time['log10_seconds'])
+
+
+def test_formats_crack_times():
+    assert PasswordGenerator.format_crack_time(-3)['time'] == 'Less than a second'
+    assert PasswordGenerator.format_crack_time(math.log10(31536000))['time'] == '1.0 year'
+    assert PasswordGenerator.format_crack_time(math.log10(2 * 3600))['time'] == '2.0 hours'
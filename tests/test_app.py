@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import inspect
+
+from conftest import ROOT
+
+
+def test_create_app_does_not_touch_the_database(tmp_path, db):
+    from app import create_app
+    from config import TestingConfig
+
+    config = type('Config', (TestingConfig,), {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}"})
+    app = create_app(config)
+
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+    assert app.test_client().get('/api/health').status_code == 200
+
+
+def test_workers_boot_without_the_migration_and_crypto_modules():
+    # A fresh interpreter, since the test session itself has imported everything
+    script = (
+        "import sys\n"
+        "from app import create_app\n"
+        "create_app('testing')\n"
+        "print(sorted(m for m in ('alembic', 'flask_migrate', 'cryptography.fernet') if m in sys.modules))\n"
+    )
+    env = {**os.environ, 'FLASK_RUN_FROM_CLI': ''}
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_config_can_be_named():
+    from app import create_app
+
+    assert create_app('testing').config['TESTING']
@@ -0,0 +1,95 @@
+from flask_jwt_extended import decode_token
+
+from conftest import PASSWORD
+
+
+def _login(client, username='alice'):
+    response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_access_tokens_are_short_lived(app, register):
+    client = app.test_client()
+    register(client, 'alice')
+
+    with app.app_context():
+        claims = decode_token(_login(client)['access_token'])
+    assert claims['exp'] - claims['iat'] == 15 * 60
+
+
+def test_logout_revokes_the_access_and_refresh_tokens(app, register):
+    client = app.test_client()
+    register(client, 'alice')
+    tokens = _login(client)
+
+    assert client.get('/api/passwords', headers=_bearer(tokens['access_token'])).status_code == 200
+    assert client.post('/api/auth/logout', headers=_bearer(tokens['access_token'])).status_code == 200
+
+    assert client.get('/api/passwords', headers=_bearer(tokens['access_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+
+
+def test_logout_with_the_refresh_token(app, register):
+    client = app.test_client()
+    register(client, 'alice')
+    tokens = _login(client)
+
+    assert client.post('/api/auth/logout', headers=_bearer(tokens['refresh_token'])).status_code == 200
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+
+
+def test_refresh_rotates_the_refresh_token(app, register):
+    client = app.test_client()
+    register(client, 'alice')
+    tokens = _login(client)
+
+    response = client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 200, response.get_json()
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert client.get('/api/passwords', headers=_bearer(rotated['access_token'])).status_code == 200
+
+    # Refresh tokens are single-use
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=_bearer(rotated['refresh_token'])).status_code == 200
+
+
+def test_password_change_signs_out_other_sessions(app, register):
+    client = app.test_client()
+    register(client, 'alice')
+    other = _login(client)
+    current = _login(client)
+
+    response = client.post('/api/auth/change-password', json={
+        'old_password': PASSWORD, 'new_password': 'Another456!'
+    }, headers=_bearer(current['access_token']))
+    assert response.status_code == 200
+
+    assert client.post('/api/auth/refresh', headers=_bearer(other['refresh_token'])).status_code == 401
+    assert client.post('/api/auth/refresh',
+                       headers=_bearer(response.get_json()['refresh_token'])).status_code == 200
+
+
+def test_prune_drops_only_expired_blocklist_entries(app, register, db):
+    from datetime import datetime, timedelta
+
+    from models import RevokedToken
+
+    client = app.test_client()
+    register(client, 'alice')
+    tokens = _login(client)
+    assert client.post('/api/auth/logout', headers=_bearer(tokens['access_token'])).status_code == 200
+
+    with app.app_context():
+        db.session.add(RevokedToken(jti='expired', expires_at=datetime.utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['prune-revoked-tokens'])
+    assert 'Pruned 1 expired revoked tokens' in result.output
+    # Still within their lifetime, so still blocked
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
@@ -0,0 +1,49 @@
+import hashlib
+
+import pytest
+
+from utils import breach_check
+from utils.breach_check import BreachedPasswordIndex, build_breach_file
+
+BREACHED = [f'password{i}' for i in range(200)]
+
+
+def _sha1(password):
+    return hashlib.sha1(password.encode()).hexdigest()
+
+
+@pytest.fixture
+def dump(tmp_path):
+    lines = [f'{_sha1(p).upper()}:{i + 1}' for i, p in enumerate(BREACHED)]
+    # Lower-case digests, duplicates and junk lines are all tolerated
+    lines += [_sha1(BREACHED[0]), 'not a hash', '']
+    path = tmp_path / 'dump.txt'
+    path.write_text('\n'.join(reversed(lines)))
+    return str(path)
+
+
+@pytest.mark.parametrize('bloom_bits_per_entry', [0, 10])
+def test_lookups(tmp_path, dump, monkeypatch, bloom_bits_per_entry):
+    # Small spill files exercise the external merge
+    monkeypatch.setattr(breach_check, 'SORT_CHUNK', 16)
+    path = str(tmp_path / 'breached.bin')
+
+    assert build_breach_file(dump, path, bloom_bits_per_entry) == len(BREACHED)
+    index = BreachedPasswordIndex(path)
+
+    assert len(index) == len(BREACHED)
+    assert all(index.is_breached(p) for p in BREACHED)
+    assert not any(index.is_breached(f'unlisted{i}') for i in range(500))
+
+
+def test_missing_file_never_matches(tmp_path):
+    assert not BreachedPasswordIndex(None).is_breached('password0')
+    assert not BreachedPasswordIndex(str(tmp_path / 'missing.bin')).is_breached('password0')
+
+
+def test_rejects_files_that_are_not_compiled(tmp_path):
+    path = tmp_path / 'breached.bin'
+    path.write_bytes(b'\0' * 64)
+
+    with pytest.raises(ValueError, match='not a compiled breach file'):
+        BreachedPasswordIndex(str(path)).is_breached('password0')
@@ -0,0 +1,30 @@
+import sqlite3
+
+from conftest import _make_app
+
+
+def test_sqlite_connections_get_the_pragmas(app, db):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == app.config['SQLITE_PRAGMAS']['busy_timeout']
+            # NORMAL
+            assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1
+
+
+def test_read_only_views_use_the_replica(tmp_path, register, add_entry):
+    app = _make_app(tmp_path, DATABASE_REPLICA_URL=f"sqlite:///{tmp_path / 'replica.db'}")
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+
+    # Snapshot the primary into the replica, then write past it
+    with sqlite3.connect(tmp_path / 'primary.db') as primary, sqlite3.connect(tmp_path / 'replica.db') as replica:
+        primary.backup(replica)
+    add_entry(client, headers, 'gitlab')
+
+    listed = client.get('/api/passwords', headers=headers).get_json()
+    assert [entry['service_name'] for entry in listed] == ['github']
+    # Views that are not marked read-only see the primary
+    exported = client.get('/api/passwords/export?format=csv', headers=headers).get_data(as_text=True)
+    assert 'gitlab' in exported
@@ -0,0 +1,102 @@
+import pytest
+
+from conftest import MASTER_KEY
+from utils.encryption import PasswordEncryption, encryption
+
+
+def test_blob_round_trip(app, register):
+    user_id, _ = register(app.test_client(), 'alice')
+
+    with app.app_context():
+        blob = encryption.encrypt_blob('hunter2-correct-horse', user_id)
+
+        assert blob[0] == PasswordEncryption.BLOB_VERSION
+        # version byte, nonce, ciphertext, 16-byte GCM tag
+        assert len(blob) == 1 + PasswordEncryption.BLOB_NONCE_SIZE + len('hunter2-correct-horse') + 16
+        assert encryption.decrypt(blob, user_id) == 'hunter2-correct-horse'
+        assert encryption.encrypt_blob('hunter2-correct-horse', user_id) != blob
+
+
+def test_blob_is_bound_to_its_owner(app, register):
+    client = app.test_client()
+    alice, _ = register(client, 'alice')
+    bob, _ = register(client, 'bob')
+
+    with app.app_context():
+        blob = encryption.encrypt_blob('secret', alice)
+
+        with pytest.raises(ValueError):
+            encryption.decrypt(blob, bob)
+
+        tampered = bytearray(blob)
+        tampered[-1] ^= 1
+        with pytest.raises(ValueError):
+            encryption.decrypt(bytes(tampered), alice)
+
+
+def test_blob_rejects_unknown_version(app, register):
+    user_id, _ = register(app.test_client(), 'alice')
+
+    with app.app_context():
+        blob = encryption.encrypt_blob('secret', user_id)
+        with pytest.raises(ValueError, match='unsupported ciphertext version'):
+            encryption.decrypt(bytes((PasswordEncryption.BLOB_VERSION + 1,)) + blob[1:], user_id)
+
+
+def test_encrypt_fields_falls_back_to_legacy_token_without_data_key(app):
+    with app.app_context():
+        fields = encryption.encrypt_fields('secret', 12345)
+
+        assert fields['encrypted_blob'] is None
+        assert encryption.decrypt(fields['encrypted_password']) == 'secret'
+
+
+def test_rotate_reencrypts_under_primary_key():
+    old = PasswordEncryption([MASTER_KEY])
+    new_key = PasswordEncryption.generate_key()
+    ring = PasswordEncryption([new_key, MASTER_KEY])
+
+    token = old.encrypt('secret')
+    assert not ring.is_current(token)
+
+    rotated = ring.rotate(token)
+    assert ring.is_current(rotated)
+    assert PasswordEncryption([new_key]).decrypt(rotated) == 'secret'
+
+
+def test_key_rotation_rewraps_data_keys(app, db, register, add_entry, tmp_path):
+    from models import Password
+    from utils.key_rotation import KeyRotation
+
+    client = app.test_client()
+    user_id, headers = register(client, 'alice')
+    entry_id = add_entry(client, headers, 'github', password='rotate-me-please')
+
+    new_key = PasswordEncryption.generate_key()
+    with app.app_context():
+        # A legacy row encrypted with the master keyring
+        db.session.add(Password(user_id=user_id, service_name='legacy', username='user',
+                                encrypted_password=encryption.encrypt('legacy-secret')))
+        db.session.commit()
+
+        state = KeyRotation(db, PasswordEncryption([new_key, MASTER_KEY]), str(tmp_path / 'rotation.json')).run()
+        assert not state['failed']
+
+        # Only the new key is needed afterwards
+        rotated = PasswordEncryption([new_key])
+        rows = {row.service_name: row for row in Password.query.filter_by(user_id=user_id)}
+        assert rows['github'].id == entry_id
+        assert rotated.decrypt(rows['github'].encrypted_blob, user_id) == 'rotate-me-please'
+        assert rotated.decrypt(rows['legacy'].encrypted_password, user_id) == 'legacy-secret'
+
+
+def test_user_keys_are_random_and_wrapped_by_the_keyring(monkeypatch):
+    import base64
+
+    # No password KDF runs in the request; hashing stays on the hash pool
+    monkeypatch.setattr(PasswordEncryption, 'derive_key_from_password', None)
+    keyring = PasswordEncryption([MASTER_KEY])
+
+    wrapped = keyring.create_user_key()
+    assert wrapped != keyring.create_user_key()
+    assert len(base64.urlsafe_b64decode(keyring.cipher_suite.decrypt(wrapped.encode()))) == 32
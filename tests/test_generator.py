@@ -0,0 +1,44 @@
+import pytest
+
+from utils.password_generator import PasswordGenerator
+
+
+@pytest.mark.parametrize('count', [True, False, 0, 10001, 2.0, '3', None])
+def test_batch_count_must_be_an_integer_in_range(app, register, count):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    response = client.post('/api/passwords/generate', json={'count': count}, headers=headers)
+    assert response.status_code == 400
+    assert 'count' in response.get_json()['error']
+
+
+def test_batch_generation(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    response = client.post('/api/passwords/generate', json={'count': 5, 'length': 20}, headers=headers)
+    assert response.status_code == 200
+    passwords = response.get_json()['passwords']
+    assert len(passwords) == 5
+    assert all(len(password) == 20 for password in passwords)
+
+    response = client.post('/api/passwords/generate', json={
+        'count': 2, 'include_strength': True
+    }, headers=headers)
+    assert {'password', 'strength', 'crack_time'} == set(response.get_json()['passwords'][0])
+
+
+def test_passphrases_are_scored_without_character_class_advice(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    response = client.post('/api/passwords/generate', json={'mode': 'passphrase', 'word_count': 6}, headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['password'].split('-')) == 6
+    assert body['strength']['feedback'] == []
+    assert body['strength']['score'] == PasswordGenerator.passphrase_strength(body['entropy_bits'])['score']
+
+    short = PasswordGenerator.generate_passphrase(word_count=3)
+    assert PasswordGenerator.passphrase_strength(short['entropy_bits'])['score'] < body['strength']['score']
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import PASSWORD
+from utils.hashing import HashPoolSaturated, PasswordHasher, password_hasher
+
+
+def test_hashes_on_the_pool():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, queue_depth=0)
+    try:
+        password_hash = hasher.hash('secret')
+        assert hasher.verify(password_hash, 'secret')
+        assert not hasher.verify(password_hash, 'other')
+        assert not hasher.needs_rehash(password_hash)
+        assert PasswordHasher(method='pbkdf2:sha256:2000', workers=0).needs_rehash(password_hash)
+    finally:
+        hasher._executor.shutdown()
+
+
+def test_rejects_work_beyond_the_queue():
+    hasher = PasswordHasher(workers=1, queue_depth=0, retry_after=7)
+    # The only slot is taken by a request still in flight
+    hasher._slots.acquire()
+
+    with pytest.raises(HashPoolSaturated) as excinfo:
+        hasher.hash('secret')
+    assert excinfo.value.retry_after == 7
+
+
+def test_saturated_pool_answers_503(app, register, monkeypatch):
+    client = app.test_client()
+    register(client, 'alice')
+
+    def saturated(*args):
+        raise HashPoolSaturated(3)
+    monkeypatch.setattr(password_hasher, 'verify', saturated)
+
+    response = client.post('/api/auth/login', json={'username': 'alice', 'password': PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
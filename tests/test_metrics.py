@@ -0,0 +1,72 @@
+import os
+import threading
+
+import pytest
+
+from conftest import _make_app
+from utils.metrics import MetricsRegistry, metrics
+
+TOKEN = 'scrape-token'
+
+
+@pytest.fixture
+def monitored_app(tmp_path):
+    metrics.clear()
+    return _make_app(tmp_path, METRICS_TOKEN=TOKEN)
+
+
+@pytest.mark.parametrize('path', ['/api/metrics', '/api/cache/stats'])
+def test_monitoring_endpoints_require_the_token(app, monitored_app, path):
+    # Hidden entirely while no token is configured
+    assert app.test_client().get(path).status_code == 404
+
+    client = monitored_app.test_client()
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(path, headers={'Authorization': f'Bearer {TOKEN}'}).status_code == 200
+
+
+def test_requests_and_queries_are_recorded(monitored_app, register):
+    client = monitored_app.test_client()
+    _, headers = register(client, 'alice')
+    client.get('/api/passwords', headers=headers)
+    client.get('/api/passwords/1', headers=headers)
+
+    body = client.get('/api/metrics', headers={'Authorization': f'Bearer {TOKEN}'}).get_data(as_text=True)
+
+    # Labelled by URL rule, not by path
+    assert 'endpoint="/api/passwords/<int:password_id>",method="GET"' in body
+    assert '/api/passwords/1"' not in body
+    assert 'http_request_sql_queries_bucket{pid=' in body
+    assert 'sql_query_duration_seconds_count{pid=' in body
+    assert 'crypto_operation_duration_seconds_count{pid=' in body
+
+
+def test_histograms_are_cumulative_and_merge_threads():
+    registry = MetricsRegistry()
+    registry.histogram('latency', 'Test latency', buckets=(0.1, 1.0))
+    registry.counter('errors', 'Test errors')
+
+    def record():
+        registry.observe('latency', 0.05, endpoint='/a')
+        registry.observe('latency', 0.5, endpoint='/a')
+        registry.inc('errors')
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record()
+
+    lines = registry.render().splitlines()
+    pid = f'pid="{os.getpid()}"'
+    assert f'latency_bucket{{{pid},endpoint="/a",le="0.1"}} 5' in lines
+    assert f'latency_bucket{{{pid},endpoint="/a",le="1.0"}} 10' in lines
+    assert f'latency_bucket{{{pid},endpoint="/a",le="+Inf"}} 10' in lines
+    assert f'latency_count{{{pid},endpoint="/a"}} 10' in lines
+    assert f'errors{{{pid}}} 5' in lines
+
+    # Undeclared names are ignored
+    registry.observe('unknown', 1)
+    assert 'unknown' not in registry.render()
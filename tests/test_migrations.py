@@ -0,0 +1,83 @@
+import pytest
+from flask_migrate import check
+from sqlalchemy import create_engine, inspect
+
+from conftest import _make_app
+
+# The users and passwords tables as first released, created by db.create_all()
+LEGACY_SCHEMA = [
+    '''CREATE TABLE users (
+        id INTEGER NOT NULL PRIMARY KEY,
+        username VARCHAR(80) NOT NULL,
+        email VARCHAR(120) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        created_at DATETIME,
+        updated_at DATETIME
+    )''',
+    'CREATE UNIQUE INDEX ix_users_username ON users (username)',
+    'CREATE UNIQUE INDEX ix_users_email ON users (email)',
+    '''CREATE TABLE passwords (
+        id INTEGER NOT NULL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users (id),
+        service_name VARCHAR(120) NOT NULL,
+        username VARCHAR(120) NOT NULL,
+        encrypted_password TEXT NOT NULL,
+        url VARCHAR(255),
+        notes TEXT,
+        created_at DATETIME,
+        updated_at DATETIME
+    )''',
+    'CREATE INDEX idx_user_created ON passwords (user_id, created_at)',
+    'CREATE INDEX ix_passwords_user_id ON passwords (user_id)',
+    'CREATE INDEX ix_passwords_created_at ON passwords (created_at)',
+    "INSERT INTO users (id, username, email, password_hash) VALUES (1, 'old', 'old@example.com', 'x')",
+    "INSERT INTO passwords (user_id, service_name, username, encrypted_password) VALUES (1, 'github', 'u', 'token')"
+]
+
+
+def _revision(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql('SELECT version_num FROM alembic_version').scalar_one()
+
+
+@pytest.mark.parametrize('fixture', ['app', 'sharded_app'])
+def test_migrations_match_the_models(request, fixture):
+    application = request.getfixturevalue(fixture)
+
+    # Exits with an error if autogenerate would emit any operation
+    with application.app_context():
+        check()
+
+
+def test_sharded_databases_only_hold_their_own_tables(sharded_app, db):
+    from utils.sharding import shard_bind
+
+    with sharded_app.app_context():
+        primary = set(inspect(db.engine).get_table_names())
+        shard = set(inspect(db.engines[shard_bind(0)]).get_table_names())
+
+    assert {'users', 'revoked_tokens'} <= primary
+    assert 'passwords' not in primary
+    assert {'passwords', 'password_tombstones', 'passwords_fts'} <= shard
+    assert 'users' not in shard
+
+
+def test_init_db_adopts_a_pre_migration_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+    app = _make_app(tmp_path)
+
+    with app.app_context():
+        check()
+    with engine.connect() as conn:
+        # Existing rows survive and get the defaults of the new NOT NULL columns
+        assert conn.exec_driver_sql('SELECT token_version FROM users').one() == (0,)
+        assert conn.exec_driver_sql('SELECT service_name, version FROM passwords').one() == ('github', 0)
+    revision = _revision(engine)
+
+    # Re-running is a no-op
+    assert app.test_cli_runner().invoke(args=['init-db']).exit_code == 0
+    assert _revision(engine) == revision
@@ -0,0 +1,47 @@
+def test_keyset_pages_cover_the_vault_newest_first(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    ids = [add_entry(client, headers, f'service{i}') for i in range(7)]
+
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/passwords?limit=3&cursor={cursor}', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        assert len(page['passwords']) <= 3
+        seen += [entry['id'] for entry in page['passwords']]
+        if not page['has_more']:
+            assert page['next_cursor'] is None
+            break
+        cursor = page['next_cursor']
+
+    assert seen == ids[::-1]
+
+
+def test_unpaginated_requests_keep_returning_a_list(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+
+    body = client.get('/api/passwords', headers=headers).get_json()
+    assert isinstance(body, list) and len(body) == 1
+
+
+def test_fields_project_the_response(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+
+    body = client.get('/api/passwords?fields=service_name&limit=10', headers=headers).get_json()
+    assert body['passwords'] == [{'service_name': 'github'}]
+
+    response = client.get('/api/passwords?fields=encrypted_password', headers=headers)
+    assert response.status_code == 400
+
+
+def test_malformed_cursor_is_rejected(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    assert client.get('/api/passwords?cursor=not-a-cursor', headers=headers).status_code == 400
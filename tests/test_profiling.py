@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from conftest import _make_app
+
+SECRET = 'profile-secret'
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    return _make_app(
+        tmp_path,
+        PROFILING_ENABLED=True,
+        PROFILE_DIR=str(tmp_path / 'profiles'),
+        PROFILE_SECRET=SECRET
+    )
+
+
+def _index(app):
+    path = os.path.join(app.config['PROFILE_DIR'], 'index.jsonl')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_profiling_requires_the_secret(profiled_app, register):
+    client = profiled_app.test_client()
+    _, headers = register(client, 'alice')
+
+    assert client.get('/api/passwords', headers={**headers, 'X-Profile': 'wrong'}).status_code == 200
+    assert _index(profiled_app) == []
+
+    assert client.get('/api/passwords', headers={**headers, 'X-Profile': SECRET}).status_code == 200
+    [entry] = _index(profiled_app)
+    assert entry['endpoint'] == '/api/passwords'
+    assert entry['status'] == 200
+    assert entry['streamed'] is False
+    assert os.path.exists(os.path.join(profiled_app.config['PROFILE_DIR'], entry['file']))
+
+
+def test_streamed_responses_are_not_buffered(profiled_app, register, add_entry):
+    client = profiled_app.test_client()
+    _, headers = register(client, 'alice')
+    for i in range(3):
+        add_entry(client, headers, f'service{i}')
+
+    response = client.get('/api/passwords/export?format=ndjson',
+                          headers={**headers, 'X-Profile': SECRET}, buffered=False)
+
+    # The profile ends when the view returns, before any of the body is generated
+    [entry] = _index(profiled_app)
+    assert entry['streamed'] is True
+    assert response.is_streamed
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)['service_name'] for line in lines] == ['service0', 'service1', 'service2']
+
+
+def test_report_aggregates_cprofile_dumps(profiled_app, register, add_entry):
+    client = profiled_app.test_client()
+    _, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+    for _ in range(3):
+        client.get('/api/passwords', headers={**headers, 'X-Profile': SECRET})
+
+    result = profiled_app.test_cli_runner().invoke(args=['profile-report', '--match', 'to_dict'])
+    assert result.exit_code == 0, result.output
+    assert '== GET /api/passwords: 3 requests' in result.output
+    assert 'to_dict' in result.output
+
+    result = profiled_app.test_cli_runner().invoke(args=['profile-report', '--endpoint', 'POST'])
+    assert result.exit_code != 0
+    assert 'No profiles found' in result.output
+
+
+def test_sampling_mode_writes_flamegraph_input(tmp_path, register):
+    app = _make_app(
+        tmp_path,
+        PROFILING_ENABLED=True,
+        PROFILE_DIR=str(tmp_path / 'profiles'),
+        PROFILE_SECRET=SECRET,
+        PROFILE_MODE='sample'
+    )
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    client.get('/api/passwords', headers={**headers, 'X-Profile': SECRET})
+
+    [entry] = _index(app)
+    assert entry['mode'] == 'sample' and entry['file'].endswith('.collapsed')
+
+    result = app.test_cli_runner().invoke(args=['profile-report', '--flamegraph-dir', str(tmp_path / 'fg')])
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(tmp_path / 'fg' / 'GET_api_passwords.collapsed')
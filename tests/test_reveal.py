@@ -0,0 +1,33 @@
+def test_reveal_keeps_the_request_order(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    first = add_entry(client, headers, 'github', password='First!Secret1')
+    second = add_entry(client, headers, 'gitlab', password='Second!Secret2')
+
+    response = client.post('/api/passwords/reveal', json={'ids': [second, 999, first]}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    results = response.get_json()['results']
+
+    assert [r['id'] for r in results] == [second, 999, first]
+    assert results[0]['password'] == 'Second!Secret2'
+    assert results[1] == {'id': 999, 'error': 'Password entry not found'}
+    assert results[2]['password'] == 'First!Secret1'
+
+
+def test_reveal_is_scoped_to_the_user(app, register, add_entry):
+    client = app.test_client()
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob')
+    entry_id = add_entry(client, alice, 'github')
+
+    results = client.post('/api/passwords/reveal', json={'ids': [entry_id]}, headers=bob).get_json()['results']
+    assert results == [{'id': entry_id, 'error': 'Password entry not found'}]
+
+
+def test_reveal_validates_ids(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    for ids in ([], [True], ['1'], list(range(501)), None):
+        response = client.post('/api/passwords/reveal', json={'ids': ids}, headers=headers)
+        assert response.status_code == 400, ids
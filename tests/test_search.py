@@ -0,0 +1,78 @@
+import pytest
+
+from utils.search import search_index
+
+
+@pytest.fixture(params=['fts5', 'like'])
+def search_app(request, app, monkeypatch):
+    # Both the FTS5 index and the portable fallback must give the same answers
+    if request.param == 'like':
+        monkeypatch.setattr(search_index, 'fts_enabled', False)
+    return app
+
+
+def _search(client, headers, q):
+    response = client.get(f'/api/passwords/search?q={q}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [entry['service_name'] for entry in response.get_json()]
+
+
+def _add(client, headers, service_name, username='user', url=None):
+    response = client.post('/api/passwords', json={
+        'service_name': service_name, 'username': username, 'password': 'Xy!9kq2LmZ#t', 'url': url
+    }, headers=headers)
+    assert response.status_code == 201, response.get_json()
+
+
+def test_search_matches_word_prefixes(search_app, register):
+    client = search_app.test_client()
+    _, headers = register(client, 'alice')
+    _add(client, headers, 'GitHub')
+    _add(client, headers, 'Mail', url='https://mail.google.com')
+    _add(client, headers, 'Bank', username='alice.smith')
+
+    assert _search(client, headers, 'git') == ['GitHub']
+    # Inside a word does not match
+    assert _search(client, headers, 'hub') == []
+    assert _search(client, headers, 'goog') == ['Mail']
+    assert _search(client, headers, 'smi') == ['Bank']
+    # Every token must match
+    assert _search(client, headers, 'mail goog') == ['Mail']
+    assert _search(client, headers, 'mail bank') == []
+
+
+def test_search_only_returns_the_users_entries(search_app, register):
+    client = search_app.test_client()
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob')
+    _add(client, alice, 'github')
+    _add(client, bob, 'github-bob')
+    _add(client, bob, 'gitlab')
+
+    assert _search(client, alice, 'git') == ['github']
+    assert sorted(_search(client, bob, 'git')) == ['github-bob', 'gitlab']
+
+
+def test_search_follows_updates_and_deletes(search_app, register, add_entry):
+    client = search_app.test_client()
+    _, headers = register(client, 'alice')
+    renamed = add_entry(client, headers, 'github')
+    deleted = add_entry(client, headers, 'gitlab')
+
+    assert client.put(f'/api/passwords/{renamed}', json={'service_name': 'bitbucket'},
+                      headers=headers).status_code == 200
+    assert client.delete(f'/api/passwords/{deleted}', headers=headers).status_code == 200
+
+    assert _search(client, headers, 'git') == []
+    assert _search(client, headers, 'bit') == ['bitbucket']
+
+
+def test_search_limit_and_empty_query(search_app, register):
+    client = search_app.test_client()
+    _, headers = register(client, 'alice')
+    for i in range(5):
+        _add(client, headers, f'service{i}')
+
+    assert _search(client, headers, '') == []
+    response = client.get('/api/passwords/search?q=serv&limit=2', headers=headers)
+    assert len(response.get_json()) == 2
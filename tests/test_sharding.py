@@ -0,0 +1,199 @@
+import pytest
+from sqlalchemy import select
+
+from utils.sharding import MOVING, VaultMoving, move_vault, resume_moves, shard_bind, shard_router
+
+
+def _users_on_each_shard(app, client, register):
+    """Register users until shard 0 and shard 1 each have one; returns {shard: (id, headers)}"""
+    from models import User
+
+    found = {}
+    for n in range(20):
+        user_id, headers = register(client, f'user{n}')
+        with app.app_context():
+            found.setdefault(User.query.filter_by(id=user_id).first().shard, (user_id, headers))
+        if len(found) == 2:
+            return found
+    raise AssertionError('hash placement never used both shards')
+
+
+def _vault_rows(app, db, shard, user_id):
+    from models import Password, PasswordTombstone
+
+    with app.app_context(), db.engines[shard_bind(shard)].connect() as conn:
+        live = conn.execute(select(Password.__table__.c.id, Password.__table__.c.service_name)
+                            .where(Password.__table__.c.user_id == user_id)).all()
+        deleted = conn.execute(select(PasswordTombstone.__table__.c.password_id)
+                               .where(PasswordTombstone.__table__.c.user_id == user_id)).scalars().all()
+    return dict(live), set(deleted)
+
+
+def _fence(app, db, user_id, source, target, leftover=True):
+    """Leave a user fenced as if move_vault had crashed after copying part of the vault"""
+    from models import User
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.shard, user.move_source, user.move_target = MOVING, source, target
+        db.session.commit()
+        if leftover:
+            with db.engines[shard_bind(target)].begin() as conn:
+                conn.exec_driver_sql(
+                    'INSERT INTO passwords (user_id, service_name, username, encrypted_password, version) '
+                    f"VALUES ({user_id}, 'partial', 'user', 'x', 0)"
+                )
+
+
+def test_move_keeps_ids_and_never_tombstones_live_ids(sharded_app, db, register, add_entry):
+    client = sharded_app.test_client()
+    users = _users_on_each_shard(sharded_app, client, register)
+    (mover, headers), (neighbour, neighbour_headers) = users[0], users[1]
+
+    ids = [add_entry(client, headers, f'svc{i}') for i in range(4)]
+    # The neighbour's entries take ids 1 and 2 on shard 1
+    neighbour_ids = [add_entry(client, neighbour_headers, f'theirs{i}') for i in range(2)]
+    assert client.delete(f'/api/passwords/{ids[3]}', headers=headers).status_code == 200
+    token = client.get('/api/passwords?since=0', headers=headers).get_json()['sync_token']
+
+    with sharded_app.app_context():
+        assert move_vault(db, mover, 1, grace=0) == 3
+
+    live, deleted = _vault_rows(sharded_app, db, 1, mover)
+    assert sorted(live.values()) == ['svc0', 'svc1', 'svc2']
+    assert not set(live) & deleted
+    # Free ids are kept; only the ones taken by the neighbour change
+    assert {live_id for live_id, name in live.items() if name == 'svc2'} == {ids[2]}
+    assert not set(live) & set(neighbour_ids)
+    assert _vault_rows(sharded_app, db, 0, mover) == ({}, set())
+
+    body = client.get(f'/api/passwords?since={token}', headers=headers).get_json()
+    assert body['sync_token'] == token + 1
+    assert sorted(entry['id'] for entry in body['passwords']) == sorted(live)
+    assert not {entry['id'] for entry in body['passwords']} & set(body['deleted'])
+
+    neighbour_live, _ = _vault_rows(sharded_app, db, 1, neighbour)
+    assert sorted(neighbour_live) == neighbour_ids
+
+
+def test_move_routes_requests_to_the_new_shard(sharded_app, db, register, add_entry):
+    from models import User
+
+    client = sharded_app.test_client()
+    mover, headers = _users_on_each_shard(sharded_app, client, register)[0]
+    add_entry(client, headers, 'github')
+    assert client.get('/api/passwords', headers=headers).status_code == 200
+
+    with sharded_app.app_context():
+        move_vault(db, mover, 1, grace=0)
+        assert db.session.get(User, mover).shard == 1
+        assert shard_router.shard_for(mover) == 1
+
+    assert [entry['service_name'] for entry in client.get('/api/passwords', headers=headers).get_json()] == ['github']
+
+
+def test_fenced_user_gets_503(sharded_app, db, register, add_entry):
+    client = sharded_app.test_client()
+    mover, headers = _users_on_each_shard(sharded_app, client, register)[0]
+    _fence(sharded_app, db, mover, 0, 1, leftover=False)
+
+    response = client.get('/api/passwords', headers=headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    with sharded_app.app_context(), pytest.raises(VaultMoving):
+        shard_router.shard_for(mover)
+
+
+def test_shard_is_cached_and_moves_wait_for_the_cache(sharded_app, db, register, monkeypatch):
+    import utils.sharding
+
+    client = sharded_app.test_client()
+    mover, headers = _users_on_each_shard(sharded_app, client, register)[0]
+    monkeypatch.setattr(shard_router.cache, 'ttl', 30.0)
+    shard_router.cache.clear()
+    misses = shard_router.cache.misses
+
+    for _ in range(3):
+        assert client.get('/api/passwords', headers=headers).status_code == 200
+    assert shard_router.cache.misses == misses + 1
+
+    sleeps = []
+    monkeypatch.setattr(utils.sharding.time, 'sleep', sleeps.append)
+    with sharded_app.app_context():
+        move_vault(db, mover, 1, grace=2.0)
+    # Other workers may route to the source until their cached answer expires
+    assert sleeps == [32.0]
+    assert shard_router.cache.get(mover) is None
+
+
+@pytest.mark.parametrize('rollback', [False, True])
+def test_interrupted_move_can_be_resumed_or_rolled_back(sharded_app, db, register, add_entry, rollback):
+    from models import User
+
+    client = sharded_app.test_client()
+    mover, headers = _users_on_each_shard(sharded_app, client, register)[0]
+    ids = [add_entry(client, headers, f'svc{i}') for i in range(3)]
+    _fence(sharded_app, db, mover, 0, 1)
+
+    with sharded_app.app_context():
+        results = resume_moves(db, rollback=rollback)
+        user = db.session.get(User, mover)
+        assert (user.move_source, user.move_target) == (None, None)
+
+    final, empty = (0, 1) if rollback else (1, 0)
+    assert results == [(mover, final, 0 if rollback else 3)]
+    assert user.shard == final
+    live, _ = _vault_rows(sharded_app, db, final, mover)
+    assert sorted(live) == ids and 'partial' not in live.values()
+    assert _vault_rows(sharded_app, db, empty, mover) == ({}, set())
+
+    entries = client.get('/api/passwords', headers=headers).get_json()
+    assert sorted(entry['service_name'] for entry in entries) == ['svc0', 'svc1', 'svc2']
+
+
+def test_rebalance_lists_fenced_users(sharded_app, db, register):
+    client = sharded_app.test_client()
+    mover, _ = _users_on_each_shard(sharded_app, client, register)[0]
+    _fence(sharded_app, db, mover, 0, 1, leftover=False)
+
+    output = sharded_app.test_cli_runner().invoke(args=['rebalance-shards']).output
+    assert 'fenced by an unfinished move: 1 users' in output
+
+    result = sharded_app.test_cli_runner().invoke(args=['rebalance-shards', '--resume'])
+    assert result.exit_code == 0, result.output
+    assert f'user {mover}: 0 entries moved to shard 1' in result.output
+
+
+def test_vaults_from_before_sharding_are_refused_until_moved(tmp_path, db, register, add_entry):
+    from conftest import _make_app
+    from models import User
+
+    unsharded = _make_app(tmp_path)
+    client = unsharded.test_client()
+    user_id, headers = register(client, 'early')
+    ids = [add_entry(client, headers, f'svc{i}') for i in range(3)]
+    token = client.get('/api/passwords?since=0', headers=headers).get_json()['sync_token']
+
+    # Same primary, now with shards; the vault is still on the primary
+    app = _make_app(tmp_path, VAULT_SHARD_URLS=[
+        f"sqlite:///{tmp_path / 'shard0.db'}",
+        f"sqlite:///{tmp_path / 'shard1.db'}"
+    ])
+    client = app.test_client()
+    assert client.get('/api/passwords', headers=headers).status_code == 503
+    assert 'still on the primary: 1 users' in app.test_cli_runner().invoke(args=['rebalance-shards']).output
+
+    result = app.test_cli_runner().invoke(args=['rebalance-shards', '--from-primary'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        shard = db.session.get(User, user_id).shard
+        assert shard == shard_router.place(user_id)
+        with db.engines[None].connect() as conn:
+            assert conn.exec_driver_sql('SELECT COUNT(*) FROM passwords').scalar() == 0
+    live, _ = _vault_rows(app, db, shard, user_id)
+    assert sorted(live) == ids
+
+    body = client.get(f'/api/passwords?since={token}', headers=headers).get_json()
+    assert body['sync_token'] == token + 1
+    assert sorted(entry['id'] for entry in body['passwords']) == ids
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from utils.strength_estimator import StrengthEstimator
+
+
+def test_workers_map_the_automaton_built_ahead_of_time(tmp_path):
+    estimator = StrengthEstimator(cache_dir=str(tmp_path / 'cache'))
+
+    # Workers never compile it themselves
+    with pytest.raises(FileNotFoundError, match='flask init-db'):
+        estimator.estimate('password1')
+
+    path = estimator.build()
+    assert os.path.exists(path)
+    assert estimator.build() == path
+
+    result = estimator.estimate('password1')
+    assert result['score'] <= 1
+    assert estimator.estimate('vT7#qLw!9zRb$e2K')['score'] == 4
+
+
+def test_init_db_builds_the_automaton(app):
+    from utils.strength_estimator import estimator
+
+    with app.app_context():
+        assert os.path.exists(estimator.automaton_file())
+
+
+@pytest.mark.parametrize('password, pattern', [
+    ('p@ssw0rd', 'dictionary:passwords'),
+    ('plokijuh', 'keyboard'),
+    ('abcdefgh1234', 'sequence'),
+    ('aaaaaaaa', 'repeat'),
+    ('summer1987', 'year')
+])
+def test_recognises_patterns(app, password, pattern):
+    from utils.strength_estimator import estimator
+
+    result = estimator.estimate(password)
+    assert pattern in [match['pattern'] for match in result['sequence']]
+    assert result['score'] <= 2
+    assert result['feedback']
+
+
+def test_strength_endpoint_includes_the_analysis(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    response = client.post('/api/passwords/strength', json={'password': 'summer1987'}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['analysis']['score'] <= 1
+
+    response = client.post('/api/passwords/strength', json={'password': 'a' * 513}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,111 @@
+def _sync(client, headers, since):
+    response = client.get(f'/api/passwords?since={since}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_full_sync_returns_every_entry(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    ids = [add_entry(client, headers, name) for name in ('github', 'gitlab')]
+
+    body = _sync(client, headers, 0)
+
+    assert [entry['id'] for entry in body['passwords']] == ids
+    assert body['deleted'] == []
+    assert body['sync_token'] == 2
+
+
+def test_delta_sync_returns_changes_and_tombstones(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    kept, updated, deleted = (add_entry(client, headers, name) for name in ('github', 'gitlab', 'bank'))
+    token = _sync(client, headers, 0)['sync_token']
+
+    assert client.put(f'/api/passwords/{updated}', json={'notes': 'changed'}, headers=headers).status_code == 200
+    assert client.delete(f'/api/passwords/{deleted}', headers=headers).status_code == 200
+
+    body = _sync(client, headers, token)
+    assert [entry['id'] for entry in body['passwords']] == [updated]
+    assert body['passwords'][0]['notes'] == 'changed'
+    assert body['deleted'] == [deleted]
+    assert kept not in body['deleted']
+    assert body['sync_token'] == token + 2
+
+    # Nothing new since the latest token
+    body = _sync(client, headers, body['sync_token'])
+    assert body['passwords'] == [] and body['deleted'] == []
+
+
+def test_batch_writes_share_one_version(app, register, add_entry):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    first, second, third = (add_entry(client, headers, name) for name in ('a', 'b', 'c'))
+    token = _sync(client, headers, 0)['sync_token']
+
+    response = client.post('/api/passwords/batch', json={'operations': [
+        {'op': 'update', 'id': first, 'data': {'notes': 'n'}},
+        {'op': 'delete', 'id': second}
+    ]}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+
+    body = _sync(client, headers, token)
+    assert [entry['id'] for entry in body['passwords']] == [first]
+    assert body['deleted'] == [second]
+    assert body['sync_token'] == token + 1
+    assert third not in body['deleted']
+
+
+def test_sync_is_per_user(app, register, add_entry):
+    client = app.test_client()
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob')
+    bob_entry = add_entry(client, bob, 'bobs')
+    client.delete(f'/api/passwords/{bob_entry}', headers=bob)
+
+    body = _sync(client, alice, 0)
+    assert body['passwords'] == [] and body['deleted'] == []
+
+
+def test_since_must_be_a_sync_token(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    for since in ('-1', 'yesterday', '2024-01-01T00:00:00'):
+        assert client.get(f'/api/passwords?since={since}', headers=headers).status_code == 400
+
+
+def test_sync_token_never_runs_ahead_of_the_rows(sharded_app, db, register, add_entry):
+    from models import VaultVersion
+    from utils.sharding import shard_bind, shard_router
+
+    client = sharded_app.test_client()
+    user_id, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+    token = _sync(client, headers, 0)['sync_token']
+
+    with sharded_app.app_context():
+        shard = shard_router.shard_for(user_id)
+        engine = db.engines[shard_bind(shard)]
+        # The counter commits with the rows, on the shard; the primary has no copy of it
+        assert VaultVersion.__tablename__ not in db.inspect(db.engines[None]).get_table_names()
+
+    # A write that has bumped the counter and stamped its row but not yet committed
+    conn = engine.connect()
+    transaction = conn.begin()
+    conn.exec_driver_sql(f'UPDATE vault_versions SET version = version + 1 WHERE user_id = {user_id}')
+    conn.exec_driver_sql(
+        'INSERT INTO passwords (user_id, service_name, username, encrypted_password, version) '
+        f"VALUES ({user_id}, 'gitlab', 'user', 'x', {token + 1})"
+    )
+    try:
+        body = _sync(client, headers, token)
+        assert body['sync_token'] == token
+        assert body['passwords'] == []
+    finally:
+        transaction.commit()
+        conn.close()
+
+    body = _sync(client, headers, token)
+    assert body['sync_token'] == token + 1
+    assert [entry['service_name'] for entry in body['passwords']] == ['gitlab']
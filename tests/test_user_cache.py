@@ -0,0 +1,38 @@
+from utils.user_cache import UserCache
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted():
+    cache = UserCache(maxsize=2, ttl=60)
+    cache.set(1, {'id': 1})
+    cache.set(2, {'id': 2})
+    assert cache.get(1) == {'id': 1}
+
+    cache.set(3, {'id': 3})
+    assert cache.get(2) is None
+    assert cache.get(1) == {'id': 1}
+    assert cache.stats()['evictions'] == 1
+
+    expired = UserCache(ttl=0)
+    expired.set(1, {'id': 1})
+    assert expired.get(1) is None
+
+
+def test_load_reads_the_database_once(app, register, db):
+    from models import User
+    from utils.user_cache import user_cache
+
+    client = app.test_client()
+    user_id, _ = register(client, 'alice')
+
+    with app.app_context():
+        user_cache.clear()
+        assert user_cache.load(user_id)['username'] == 'alice'
+
+        # A cached payload is served even after the row changes
+        db.session.get(User, user_id).username = 'renamed'
+        db.session.commit()
+        assert user_cache.load(user_id)['username'] == 'alice'
+
+        user_cache.invalidate(user_id)
+        assert user_cache.load(user_id)['username'] == 'renamed'
+        assert user_cache.load(user_id + 1) is None
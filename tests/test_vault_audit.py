@@ -0,0 +1,109 @@
+from conftest import PASSWORD
+from utils.encryption import encryption
+from utils.vault_audit import audit_vault, secret_fields
+
+
+def _reused_groups(app, db, user_id):
+    with app.app_context():
+        return [sorted(entry['id'] for entry in group['entries']) for group in audit_vault(db, user_id)['reused']]
+
+
+def test_fingerprint_is_stable_per_user(app, register):
+    client = app.test_client()
+    alice, _ = register(client, 'alice')
+    bob, _ = register(client, 'bob')
+
+    with app.app_context():
+        assert encryption.fingerprint('same', alice) == encryption.fingerprint('same', alice)
+        assert encryption.fingerprint('same', alice) != encryption.fingerprint('other', alice)
+        # Keyed per user, so vaults cannot be compared with each other
+        assert encryption.fingerprint('same', alice) != encryption.fingerprint('same', bob)
+
+
+def test_audit_reports_reused_passwords(app, db, register, add_entry):
+    client = app.test_client()
+    user_id, headers = register(client, 'alice')
+    first = add_entry(client, headers, 'github', password='Shared!Passw0rd')
+    second = add_entry(client, headers, 'gitlab', password='Shared!Passw0rd')
+    add_entry(client, headers, 'bank', password='Unique!Passw0rd')
+
+    assert _reused_groups(app, db, user_id) == [[first, second]]
+
+
+def test_reuse_survives_data_key_creation_at_login(app, db, add_entry):
+    from models import Password, User
+
+    client = app.test_client()
+    with app.app_context():
+        # An account created before per-user data keys, with fingerprints under the master key
+        user = User(username='legacy', email='legacy@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        legacy_ids = []
+        for service_name in ('github', 'gitlab'):
+            entry = Password(user_id=user_id, service_name=service_name, username='user',
+                             **secret_fields(encryption, 'Shared!Passw0rd', user_id))
+            db.session.add(entry)
+            db.session.commit()
+            legacy_ids.append(entry.id)
+
+    response = client.post('/api/auth/login', json={'username': 'legacy', 'password': PASSWORD})
+    assert response.status_code == 200
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    with app.app_context():
+        assert db.session.get(User, user_id).data_key is not None
+
+    # Written with the new data key, yet still matched with the legacy entries
+    new_id = add_entry(client, headers, 'bitbucket', password='Shared!Passw0rd')
+    assert _reused_groups(app, db, user_id) == [legacy_ids + [new_id]]
+
+
+def _legacy_user_with_entries(app, db, services):
+    from models import Password, User
+
+    with app.app_context():
+        user = User(username='legacy', email='legacy@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        for service_name in services:
+            db.session.add(Password(user_id=user.id, service_name=service_name, username='user',
+                                    **secret_fields(encryption, 'Shared!Passw0rd', user.id)))
+        db.session.commit()
+        return user.id
+
+
+def _stored_fingerprints(app, db, user_id):
+    from models import Password
+
+    with app.app_context():
+        return {p.fingerprint for p in Password.query.filter_by(user_id=user_id)}
+
+
+def test_rotation_keeps_legacy_fingerprints_matching(app, db, monkeypatch, tmp_path):
+    from conftest import MASTER_KEY
+    from utils.encryption import PasswordEncryption
+
+    user_id = _legacy_user_with_entries(app, db, ('github', 'gitlab'))
+    with app.app_context():
+        before = encryption.fingerprint('Shared!Passw0rd', user_id)
+    assert _stored_fingerprints(app, db, user_id) == {before}
+
+    # A new primary key does not change the fingerprint key
+    rotated = PasswordEncryption([PasswordEncryption.generate_key(), MASTER_KEY])
+    assert rotated.master_fingerprint_key == encryption.master_fingerprint_key
+
+    # Switching to a dedicated FINGERPRINT_KEY: rotate-keys re-fingerprints the legacy vault
+    monkeypatch.setattr(encryption, 'fingerprint_secret', 'fixed fingerprint secret')
+    monkeypatch.delitem(encryption.__dict__, 'master_fingerprint_key')
+    result = app.test_cli_runner().invoke(args=['rotate-keys', '--checkpoint', str(tmp_path / 'rotation')])
+    assert result.exit_code == 0, result.output
+    assert 'Re-fingerprinted 2 entries' in result.output
+
+    with app.app_context():
+        after = encryption.fingerprint('Shared!Passw0rd', user_id)
+    assert after != before
+    assert _stored_fingerprints(app, db, user_id) == {after}
@@ -0,0 +1,92 @@
+import pytest
+
+from utils.vault_io import ExportAborted
+
+
+def test_export_aborts_on_an_undecryptable_entry(app, db, register, add_entry):
+    from models import Password
+
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    add_entry(client, headers, 'github')
+    broken = add_entry(client, headers, 'gitlab')
+    with app.app_context():
+        entry = db.session.get(Password, broken)
+        entry.encrypted_blob = entry.encrypted_blob[:-1] + bytes([entry.encrypted_blob[-1] ^ 1])
+        db.session.commit()
+
+    response = client.get('/api/passwords/export?format=ndjson', headers=headers)
+    assert response.status_code == 200
+    # The entry is never written with an empty password; the stream is cut off instead
+    with pytest.raises(ExportAborted, match=f'Entry {broken}'):
+        response.get_data()
+
+
+def _import(client, headers, body, fmt):
+    return client.post(f'/api/passwords/import?format={fmt}', data=body, headers=headers)
+
+
+def test_import_ndjson_reports_bad_rows(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    body = '\n'.join([
+        '{"service_name": "github", "username": "u", "password": "Xy!9kq2LmZ#t"}',
+        'not json',
+        '["a list"]',
+        '{"service_name": "gitlab", "username": 1, "password": "p"}',
+        '',
+        '{"service_name": "bank", "username": "u", "password": "Zq!8rT3mWx#p", "notes": "n"}'
+    ])
+
+    response = _import(client, headers, body, 'ndjson')
+    assert response.status_code == 200, response.get_json()
+    result = response.get_json()
+    assert (result['imported'], result['failed']) == (2, 3)
+    assert [error['row'] for error in result['errors']] == [2, 3, 4]
+
+    services = sorted(entry['service_name'] for entry in client.get('/api/passwords', headers=headers).get_json())
+    assert services == ['bank', 'github']
+
+
+def test_import_csv(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+    body = 'service_name,username,password,url,notes\ngithub,u,Xy!9kq2LmZ#t,https://github.com,"a, b"\n'
+
+    result = _import(client, headers, body, 'csv').get_json()
+    assert result['imported'] == 1
+
+    [entry] = client.get('/api/passwords', headers=headers).get_json()
+    assert (entry['url'], entry['notes']) == ('https://github.com', 'a, b')
+
+
+def test_import_rejects_unknown_formats_and_invalid_utf8(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    assert _import(client, headers, b'', 'xml').status_code == 400
+    assert _import(client, headers, b'service_name\n\xff\xfe\n', 'csv').status_code == 400
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_export_round_trips_through_import(app, register, add_entry, fmt):
+    client = app.test_client()
+    _, alice = register(client, 'alice')
+    _, bob = register(client, 'bob')
+    add_entry(client, alice, 'github', password='Xy!9kq2LmZ#t')
+    add_entry(client, alice, 'bank', password='p,"with\nquotes')
+
+    response = client.get(f'/api/passwords/export?format={fmt}', headers=alice)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    exported = response.get_data()
+
+    assert _import(client, bob, exported, fmt).get_json()['imported'] == 2
+    assert client.get(f'/api/passwords/export?format={fmt}', headers=bob).get_data() == exported
+
+
+def test_export_rejects_unknown_formats(app, register):
+    client = app.test_client()
+    _, headers = register(client, 'alice')
+
+    assert client.get('/api/passwords/export?format=xml', headers=headers).status_code == 400
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from utils.password_generator import PasswordGenerator
+from utils.wordlist import Wordlist, build_wordlist, wordlist
+
+
+def test_build_and_look_up(tmp_path):
+    source = tmp_path / 'words.txt'
+    source.write_text('11111\tZebra\napple\n\nmango\napple\ncafé\n', encoding='utf-8')
+
+    assert build_wordlist(str(source), str(tmp_path / 'words.bin')) == 4
+    words = Wordlist(str(tmp_path / 'words.bin'))
+
+    assert len(words) == 4
+    assert [words[i] for i in range(4)] == ['apple', 'café', 'mango', 'zebra']
+    assert 'café' in words and 'zebra' in words
+    assert 'banana' not in words and 'Zebra' not in words
+    with pytest.raises(IndexError):
+        words[4]
+
+
+def test_rejects_files_that_are_not_compiled_wordlists(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_bytes(b'apple\nmango\n')
+
+    with pytest.raises(ValueError, match='not a compiled wordlist'):
+        len(Wordlist(str(path)))
+
+
+def test_bundled_wordlist_matches_its_source():
+    source = os.path.join(os.path.dirname(wordlist.path), 'wordlist.txt')
+    with open(source, encoding='utf-8') as f:
+        words = sorted({line.strip().lower() for line in f if line.strip()})
+
+    assert len(wordlist) == len(words)
+    assert wordlist[0] == words[0] and wordlist[len(words) - 1] == words[-1]
+
+
+def test_passphrase_options_and_entropy():
+    result = PasswordGenerator.generate_passphrase(word_count=4, separator='.', capitalize=True, include_digit=True)
+    words = result['passphrase'].split('.')
+
+    assert len(words) == 4
+    assert all(word[0].isupper() and word.rstrip('0123456789').lower() in wordlist for word in words)
+    assert sum(word[-1].isdigit() for word in words) == 1
+    assert result['entropy_bits'] == PasswordGenerator.passphrase_entropy(4, include_digit=True)
+
+    # Recognised again when checked later, so its crack time follows word entropy
+    assert PasswordGenerator.detect_passphrase_entropy(result['passphrase']) == pytest.approx(result['entropy_bits'])
+    assert PasswordGenerator.detect_passphrase_entropy('correct horse zzqx') is None
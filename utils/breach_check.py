@@ -0,0 +1,261 @@
+"""
+Offline breached-password lookups over a memory-mapped hash file
+
+The compiled file holds the SHA-1 digests of a breach corpus (e.g. the Have I
+Been Pwned "ordered by hash" download), sorted and fixed-width so a lookup is a
+search over the mapped pages with no parsing or loading step:
+
+    b'PBH1' | uint64 count | uint64 bloom_bits | uint32 bloom_hashes | pad
+            | bloom filter (bloom_bits / 8 bytes, may be empty)
+            | count * 20-byte SHA-1 digests, ascending
+
+The optional Bloom filter answers most negative lookups from a few cache lines
+without touching the much larger digest table. Digests are uniformly
+distributed, so the table is searched by interpolation on their leading bytes.
+
+Convert a text dump (``HASH:count`` or one hash per line, any order) with:
+
+    python -m utils.breach_check pwned-passwords.txt breached.bin [--bloom-bits-per-entry 10]
+"""
+import argparse
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+MAGIC = b'PBH1'
+HEADER = struct.Struct('<4sQQI4x')
+DIGEST_SIZE = 20
+
+# Digests sorted in memory per spill file while converting (20 bytes each)
+SORT_CHUNK = 5_000_000
+
+# Interpolation steps before falling back to plain bisection
+MAX_INTERPOLATION_STEPS = 8
+
+
+def _bloom_positions(digest: bytes, bits: int, hashes: int):
+    # SHA-1 output is already uniform, so derive the k positions by double hashing its halves
+    h1, h2 = struct.unpack_from('<QQ', digest)
+    h2 |= 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+def _parse_line(line: str):
+    text = line.split(':', 1)[0].strip()
+    if len(text) != DIGEST_SIZE * 2:
+        return None
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        return None
+
+
+def _sorted_runs(text_path: str, tmp_dir: str):
+    """Split the dump into sorted spill files, returning their paths and the entry count"""
+    runs = []
+    total = 0
+    chunk = []
+
+    def spill():
+        chunk.sort()
+        path = os.path.join(tmp_dir, f'run{len(runs)}.bin')
+        with open(path, 'wb') as f:
+            f.write(b''.join(chunk))
+        runs.append(path)
+        chunk.clear()
+
+    with open(text_path, encoding='ascii', errors='ignore') as f:
+        for line in f:
+            digest = _parse_line(line)
+            if digest is None:
+                continue
+            chunk.append(digest)
+            total += 1
+            if len(chunk) >= SORT_CHUNK:
+                spill()
+    if chunk:
+        spill()
+
+    return runs, total
+
+
+def _read_run(path: str):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(DIGEST_SIZE * 4096)
+            if not block:
+                return
+            for offset in range(0, len(block), DIGEST_SIZE):
+                yield block[offset:offset + DIGEST_SIZE]
+
+
+def build_breach_file(text_path: str, bin_path: str, bloom_bits_per_entry: int = 10) -> int:
+    """
+    Convert a text hash dump into the compiled format
+
+    Inputs larger than memory are handled with an external merge sort; duplicate
+    hashes are dropped.
+
+    Args:
+        text_path: Dump with one SHA-1 hex digest per line, optionally followed by ``:count``
+        bin_path: Output file
+        bloom_bits_per_entry: Bloom filter size (10 gives ~1% false positives); 0 disables it
+
+    Returns:
+        Number of digests written
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(bin_path))) as tmp_dir:
+        runs, total = _sorted_runs(text_path, tmp_dir)
+
+        # Sized from the pre-dedup count, which only makes the filter slightly roomier
+        bloom_bits = (total * bloom_bits_per_entry + 63) // 64 * 64 if bloom_bits_per_entry else 0
+        bloom_hashes = max(1, round(bloom_bits_per_entry * math.log(2))) if bloom_bits else 0
+        bloom = bytearray(bloom_bits // 8)
+
+        tmp_path = f"{bin_path}.tmp"
+        count = 0
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, bloom_bits, bloom_hashes))
+            f.write(bloom)
+
+            previous = None
+            buffer = []
+            for digest in heapq.merge(*(_read_run(path) for path in runs)):
+                if digest == previous:
+                    continue
+                previous = digest
+                buffer.append(digest)
+                count += 1
+                if bloom_bits:
+                    for position in _bloom_positions(digest, bloom_bits, bloom_hashes):
+                        bloom[position >> 3] |= 1 << (position & 7)
+                if len(buffer) >= 4096:
+                    f.write(b''.join(buffer))
+                    buffer.clear()
+            f.write(b''.join(buffer))
+
+            # Header and filter are only known once every digest has been seen
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, count, bloom_bits, bloom_hashes))
+            f.write(bloom)
+
+        os.replace(tmp_path, bin_path)
+
+    return count
+
+
+class BreachedPasswordIndex:
+    """Lazily memory-mapped lookup over a compiled breach file"""
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: Compiled breach file; lookups always miss when unset or missing
+        """
+        self.path = path
+        self._map = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _load(self) -> bool:
+        if self._map is not None:
+            return True
+        if not self.enabled:
+            return False
+
+        with self._lock:
+            if self._map is not None:
+                return True
+
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, count, bloom_bits, bloom_hashes = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC:
+                mapped.close()
+                raise ValueError(f"{self.path} is not a compiled breach file")
+
+            self._count = count
+            self._bloom_bits = bloom_bits
+            self._bloom_hashes = bloom_hashes
+            self._bloom_start = HEADER.size
+            self._table_start = HEADER.size + bloom_bits // 8
+            self._map = mapped
+        return True
+
+    def __len__(self) -> int:
+        return self._count if self._load() else 0
+
+    def _digest_at(self, index: int) -> bytes:
+        start = self._table_start + index * DIGEST_SIZE
+        return self._map[start:start + DIGEST_SIZE]
+
+    def _bloom_contains(self, digest: bytes) -> bool:
+        for position in _bloom_positions(digest, self._bloom_bits, self._bloom_hashes):
+            if not self._map[self._bloom_start + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def contains_digest(self, digest: bytes) -> bool:
+        """True if the SHA-1 digest is in the corpus"""
+        if not self._load() or not self._count:
+            return False
+
+        if self._bloom_bits and not self._bloom_contains(digest):
+            return False
+
+        target = int.from_bytes(digest[:8], 'big')
+        low, high = 0, self._count - 1
+        low_key = int.from_bytes(self._digest_at(low)[:8], 'big')
+        high_key = int.from_bytes(self._digest_at(high)[:8], 'big')
+
+        steps = 0
+        while low <= high:
+            if steps < MAX_INTERPOLATION_STEPS and high_key > low_key and low_key <= target <= high_key:
+                mid = low + (target - low_key) * (high - low) // (high_key - low_key)
+            else:
+                mid = (low + high) // 2
+            steps += 1
+
+            candidate = self._digest_at(mid)
+            if candidate == digest:
+                return True
+            if candidate < digest:
+                low = mid + 1
+                if low <= high:
+                    low_key = int.from_bytes(self._digest_at(low)[:8], 'big')
+            else:
+                high = mid - 1
+                if low <= high:
+                    high_key = int.from_bytes(self._digest_at(high)[:8], 'big')
+        return False
+
+    def is_breached(self, password: str) -> bool:
+        """True if the password appears in the breach corpus"""
+        return self.contains_digest(hashlib.sha1(password.encode('utf-8')).digest())
+
+
+# Shared index; BREACHED_PASSWORDS_PATH points at a file built with this module
+breach_index = BreachedPasswordIndex(os.getenv('BREACHED_PASSWORDS_PATH'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile a SHA-1 breach dump for offline lookups')
+    parser.add_argument('source', help='Text dump, one hex SHA-1 per line (HASH:count accepted)')
+    parser.add_argument('output', help='Compiled breach file')
+    parser.add_argument('--bloom-bits-per-entry', type=int, default=10,
+                        help='Bloom filter bits per hash; 0 disables the filter (default: 10)')
+    args = parser.parse_args()
+
+    written = build_breach_file(args.source, args.output, args.bloom_bits_per_entry)
+    print(f"Wrote {written} hashes to {args.output}")
@@ -0,0 +1,90 @@
+from sqlalchemy import bindparam, select, update
+import time
+
+
+class CiphertextUpgrade:
+    """Background pass converting legacy text tokens into the binary ciphertext format"""
+
+    def __init__(self, db, encryption, batch_size: int = 500, throttle: float = 0.0):
+        """
+        Args:
+            db: Flask-SQLAlchemy instance
+            encryption: PasswordEncryption used to read old and write new ciphertexts
+            batch_size: Rows converted and committed per batch
+            throttle: Seconds to sleep between batches to limit load
+        """
+        self.db = db
+        self.encryption = encryption
+        self.batch_size = batch_size
+        self.throttle = throttle
+
+    def run(self, progress=None) -> dict:
+        """
+        Convert every legacy row whose owner has a data key
+
+        Converted rows no longer match the legacy filter, so an interrupted
+        run simply picks up the remaining rows when started again.
+
+        Args:
+            progress: Optional callback receiving the counts after each batch
+
+        Returns:
+            Counts of upgraded, skipped (owner has no data key) and failed rows
+        """
+        from models import Password
+
+        table = Password.__table__
+        state = {'upgraded': 0, 'skipped': 0, 'failed': []}
+
+        # Compare-and-swap on the old token so a concurrent user update is never overwritten
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.encrypted_password == bindparam('b_old'))
+            .values(encrypted_blob=bindparam('b_blob'), encrypted_password=None, updated_at=table.c.updated_at)
+        )
+
+        last_id = 0
+        while True:
+            rows = self.db.session.execute(
+                select(table.c.id, table.c.user_id, table.c.encrypted_password)
+                .where(
+                    table.c.id > last_id,
+                    table.c.encrypted_blob.is_(None),
+                    table.c.encrypted_password.isnot(None)
+                )
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).all()
+
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                try:
+                    password = self.encryption.decrypt(row.encrypted_password, row.user_id)
+                except ValueError:
+                    state['failed'].append(row.id)
+                    continue
+
+                blob = self.encryption.encrypt_blob(password, row.user_id)
+                if blob is None:
+                    state['skipped'] += 1
+                    continue
+
+                params.append({'b_id': row.id, 'b_old': row.encrypted_password, 'b_blob': blob})
+
+            if params:
+                self.db.session.execute(statement, params)
+            self.db.session.commit()
+
+            state['upgraded'] += len(params)
+            last_id = rows[-1].id
+
+            if progress:
+                progress(state)
+
+            if self.throttle:
+                time.sleep(self.throttle)
+
+        return state
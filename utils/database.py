@@ -0,0 +1,93 @@
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from functools import wraps
+from sqlalchemy import event, inspect
+from sqlalchemy.sql.util import find_tables
+from utils.sharding import VAULT_TABLES, shard_bind, shard_router
+
+# Bind key of the optional read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+
+def _statement_tables(mapper, clause) -> set:
+    if mapper is not None:
+        return {inspect(mapper).local_table.name}
+    if clause is not None:
+        return {table.name for table in find_tables(clause, include_crud=True)}
+    return set()
+
+
+class RoutingSession(Session):
+    """
+    Session routing vault tables to the user's shard, and reads inside views
+    marked with use_replica to the read replica
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and shard_router.enabled:
+            tables = _statement_tables(mapper, clause)
+            # Raw SQL (no tables) follows the current shard too, e.g. full-text search
+            if tables & VAULT_TABLES or not tables:
+                shard = shard_router.current_shard()
+                if shard is not None:
+                    return self._db.engines[shard_bind(shard)]
+                if tables:
+                    raise RuntimeError('No vault shard selected; wrap the job in shard_router.scope()')
+
+        # Flushes always go to the primary, even if a replica view writes by mistake
+        if (bind is None and not self._flushing and has_app_context() and g.get('use_replica')
+                and REPLICA_BIND in self._db.engines):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica(view):
+    """
+    Route a read-only view's queries to the read replica, if one is configured
+
+    Replicas may lag the primary slightly, so only use this on views that can
+    serve a moment-old snapshot.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.use_replica = False
+    return wrapper
+
+
+def configure_binds(app):
+    """Register the replica bind from DATABASE_REPLICA_URL, sharing the primary's pool options"""
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {
+            'url': replica_url,
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+
+
+def install_connect_hooks(app, db):
+    """
+    Apply SQLITE_PRAGMAS to every new SQLite connection
+
+    WAL lets readers proceed while a writer commits, and the busy timeout makes
+    concurrent workers wait for the write lock instead of failing with
+    "database is locked".
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if engine.dialect.name != 'sqlite' or not pragmas:
+            continue
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
@@ -1,30 +1,147 @@
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2
+from collections import namedtuple
+from functools import cached_property
+from utils.metrics import metrics
+from utils.user_cache import UserCache
 import os
 import base64
+import hashlib
+import hmac
 import secrets
+import warnings
+
+# cryptography is imported inside the methods that need it: it is the slowest
+# import in the app, and most processes (CLI commands, workers before their
+# first vault request) never touch it
+
+# Unwrapped per-user data key: Fernet for text tokens, AES-GCM for binary blobs,
+# plus an HMAC key derived from it for password fingerprints
+UserKey = namedtuple('UserKey', ['fernet', 'aead', 'fingerprint_key'])
+
+
+def _derive_fingerprint_key(key_material: bytes) -> bytes:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'vault-fingerprint').derive(key_material)
 
 class PasswordEncryption:
     """Handles encryption and decryption of stored passwords with enhanced security"""
     
-    def __init__(self):
-        # Master encryption key from environment
-        master_key = os.getenv('ENCRYPTION_KEY')
-        if not master_key:
+    # Marks tokens encrypted with a per-user data key rather than the master keyring
+    USER_KEY_PREFIX = 'u:'
+    
+    # Binary format: 1-byte version | 12-byte nonce | AES-256-GCM ciphertext and tag
+    BLOB_VERSION = 1
+    BLOB_NONCE_SIZE = 12
+    
+    # Bytes of the HMAC-SHA256 kept as a fingerprint (hex encoded on the row)
+    FINGERPRINT_SIZE = 16
+    
+    def __init__(self, keys: list = None, fingerprint_key: str = None):
+        """
+        Args:
+            keys: Keyring, newest (primary) key first. Defaults to the comma
+                separated ENCRYPTION_KEYS, or the single ENCRYPTION_KEY.
+            fingerprint_key: Secret for the fingerprints of users without a data
+                key. Defaults to FINGERPRINT_KEY, then the oldest key in the ring.
+        """
+        if keys is None:
+            keys = [k.strip() for k in os.getenv('ENCRYPTION_KEYS', '').split(',') if k.strip()]
+        if not keys and os.getenv('ENCRYPTION_KEY'):
+            keys = [os.getenv('ENCRYPTION_KEY')]
+        if not keys:
             # Generate a key if not provided (for development only)
-            master_key = Fernet.generate_key().decode()
+            warnings.warn('No ENCRYPTION_KEY configured; stored passwords will be unreadable after restart')
+            keys = [self.generate_key()]
+        
+        self.keys = [k.encode() if isinstance(k, str) else k for k in keys]
+        self.master_key = self.keys[0]
+        # Kept apart from the keyring so adding a key does not change fingerprints
+        self.fingerprint_secret = fingerprint_key or os.getenv('FINGERPRINT_KEY')
+        # Unwrapped per-user ciphers, so unwrapping happens once per cache lifetime
+        self.user_key_cache = UserCache(
+            maxsize=int(os.getenv('USER_KEY_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('USER_KEY_CACHE_TTL', 900))
+        )
+    
+    @cached_property
+    def primary_cipher(self):
+        from cryptography.fernet import Fernet
+        
+        return Fernet(self.master_key)
+    
+    @cached_property
+    def cipher_suite(self):
+        """Encrypts with the primary key, decrypts with any key in the ring"""
+        from cryptography.fernet import Fernet, MultiFernet
         
-        self.master_key = master_key.encode() if isinstance(master_key, str) else master_key
-        self.cipher_suite = Fernet(self.master_key)
+        return MultiFernet([Fernet(k) for k in self.keys])
+    
+    @cached_property
+    def master_fingerprint_key(self) -> bytes:
+        """
+        Fingerprint key for users without a data key
+        
+        Derived from FINGERPRINT_KEY, which never rotates, or else from the oldest
+        key in the ring. ``flask rotate-keys`` re-fingerprints these users' entries,
+        so run it again after retiring the oldest key if FINGERPRINT_KEY is unset.
+        """
+        if self.fingerprint_secret:
+            return _derive_fingerprint_key(self.fingerprint_secret.encode())
+        return _derive_fingerprint_key(base64.urlsafe_b64decode(self.keys[-1]))
     
+    def create_user_key(self) -> str:
+        """
+        Generate a new random per-user data key and wrap it with the master key
+        
+        The key is not derived from the account password, so creating one costs
+        no KDF work in the request (password hashing stays on the hash pool) and
+        password changes never re-encrypt the vault.
+        
+        Returns:
+            Wrapped key to store on ``User.data_key``
+        """
+        return self.cipher_suite.encrypt(self.generate_key().encode()).decode()
+    
+    def user_cipher(self, user_id: int):
+        """
+        Get the unwrapped data key ciphers for a user
+        
+        Args:
+            user_id: Owner of the key
+        
+        Returns:
+            UserKey, or None if the user has no data key yet
+        """
+        if user_id is None:
+            return None
+        
+        cipher = self.user_key_cache.get(user_id)
+        if cipher is not None:
+            return cipher
+        
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from models import User
+        
+        wrapped_key = User.query.with_entities(User.data_key).filter_by(id=user_id).scalar()
+        if not wrapped_key:
+            return None
+        
+        data_key = self.cipher_suite.decrypt(wrapped_key.encode())
+        raw_key = base64.urlsafe_b64decode(data_key)
+        cipher = UserKey(Fernet(data_key), AESGCM(raw_key), _derive_fingerprint_key(raw_key))
+        self.user_key_cache.set(user_id, cipher)
+        return cipher
+    
+    @metrics.timed('crypto_operation_duration_seconds', operation='encrypt')
     def encrypt(self, password: str, user_id: int = None) -> str:
         """
-        Encrypt a password with optional user-specific salt
+        Encrypt a password, with the user's data key when they have one
         
         Args:
             password: Plain text password to encrypt
-            user_id: Optional user ID for additional security layer
+            user_id: Optional user ID selecting the per-user data key
         
         Returns:
             Encrypted password string (base64 encoded)
@@ -33,31 +150,146 @@ class PasswordEncryption:
         nonce = secrets.token_hex(8)
         data_to_encrypt = f"{nonce}:{password}"
         
+        cipher = self.user_cipher(user_id)
+        if cipher is not None:
+            return self.USER_KEY_PREFIX + cipher.fernet.encrypt(data_to_encrypt.encode()).decode()
+        
         encrypted = self.cipher_suite.encrypt(data_to_encrypt.encode())
         return encrypted.decode()
     
-    def decrypt(self, encrypted_password: str) -> str:
+    @metrics.timed('crypto_operation_duration_seconds', operation='encrypt')
+    def encrypt_blob(self, password: str, user_id: int):
+        """
+        Encrypt a password into the compact binary format
+        
+        Args:
+            password: Plain text password to encrypt
+            user_id: Owner of the entry; bound to the ciphertext as associated data
+        
+        Returns:
+            Versioned ciphertext bytes, or None if the user has no data key
+        """
+        cipher = self.user_cipher(user_id)
+        if cipher is None:
+            return None
+        
+        nonce = os.urandom(self.BLOB_NONCE_SIZE)
+        sealed = cipher.aead.encrypt(nonce, password.encode(), str(user_id).encode())
+        return bytes((self.BLOB_VERSION,)) + nonce + sealed
+    
+    def encrypt_fields(self, password: str, user_id: int) -> dict:
+        """
+        Encrypt a password into ``Password`` column values
+        
+        Uses the binary format when the user has a data key and the legacy
+        text token otherwise; the unused column is cleared.
+        
+        Returns:
+            Dict with ``encrypted_blob`` and ``encrypted_password`` values
+        """
+        blob = self.encrypt_blob(password, user_id)
+        if blob is not None:
+            return {'encrypted_blob': blob, 'encrypted_password': None}
+        return {'encrypted_blob': None, 'encrypted_password': self.encrypt(password, user_id)}
+    
+    @metrics.timed('crypto_operation_duration_seconds', operation='fingerprint')
+    def fingerprint(self, password: str, user_id: int) -> str:
+        """
+        Keyed fingerprint of a password for reuse detection
+        
+        Equal passwords in one vault share a fingerprint, but the key never leaves
+        the server and differs per user, so fingerprints cannot be brute-forced
+        offline or compared across vaults.
+        
+        Args:
+            password: Plain text password
+            user_id: Owner of the entry
+        
+        Returns:
+            Hex encoded truncated HMAC-SHA256
+        """
+        cipher = self.user_cipher(user_id)
+        key = cipher.fingerprint_key if cipher is not None else self.master_fingerprint_key
+        message = f"{user_id}:{password}".encode()
+        return hmac.new(key, message, hashlib.sha256).digest()[:self.FINGERPRINT_SIZE].hex()
+    
+    def _decrypt_blob(self, blob: bytes, user_id: int) -> str:
+        if not blob or blob[0] != self.BLOB_VERSION:
+            raise ValueError(f"unsupported ciphertext version {blob[0] if blob else None}")
+        
+        cipher = self.user_cipher(user_id)
+        if cipher is None:
+            raise ValueError('no data key for user')
+        
+        blob = memoryview(blob)
+        nonce = blob[1:1 + self.BLOB_NONCE_SIZE]
+        return cipher.aead.decrypt(nonce, blob[1 + self.BLOB_NONCE_SIZE:], str(user_id).encode()).decode()
+    
+    @metrics.timed('crypto_operation_duration_seconds', operation='decrypt')
+    def decrypt(self, encrypted_password, user_id: int = None) -> str:
         """
         Decrypt a password
         
         Args:
-            encrypted_password: Encrypted password string
+            encrypted_password: Binary blob or legacy text token
+            user_id: Owner of the entry, required for per-user keys
         
         Returns:
             Decrypted plain text password
         """
         try:
-            decrypted = self.cipher_suite.decrypt(encrypted_password.encode())
+            if isinstance(encrypted_password, (bytes, bytearray, memoryview)):
+                return self._decrypt_blob(encrypted_password, user_id)
+            
+            if encrypted_password.startswith(self.USER_KEY_PREFIX):
+                cipher = self.user_cipher(user_id)
+                if cipher is None:
+                    raise ValueError('no data key for user')
+                decrypted = cipher.fernet.decrypt(encrypted_password[len(self.USER_KEY_PREFIX):].encode())
+            else:
+                decrypted = self.cipher_suite.decrypt(encrypted_password.encode())
             # Extract password from nonce:password format
             parts = decrypted.decode().split(':', 1)
             return parts[1] if len(parts) > 1 else decrypted.decode()
         except Exception as e:
             raise ValueError(f"Failed to decrypt password: {str(e)}")
     
+    def is_current(self, encrypted_password: str) -> bool:
+        """Check whether a token is already encrypted with the primary key"""
+        from cryptography.fernet import InvalidToken
+        
+        # Per-user tokens never use the master keyring; their wrapped key is rotated instead
+        if encrypted_password.startswith(self.USER_KEY_PREFIX):
+            return True
+        
+        try:
+            self.primary_cipher.decrypt(encrypted_password.encode())
+            return True
+        except InvalidToken:
+            return False
+    
+    def rotate(self, encrypted_password: str) -> str:
+        """
+        Re-encrypt a token under the primary key
+        
+        Args:
+            encrypted_password: Token encrypted with any key in the ring
+        
+        Returns:
+            Token encrypted with the primary key
+        """
+        from cryptography.fernet import InvalidToken
+        
+        try:
+            return self.cipher_suite.rotate(encrypted_password.encode()).decode()
+        except InvalidToken as e:
+            raise ValueError(f"Failed to rotate password: {str(e)}")
+    
     @staticmethod
     def generate_key() -> str:
         """Generate a new encryption key"""
-        return Fernet.generate_key().decode()
+        # Same format as Fernet.generate_key(), without importing cryptography
+        return base64.urlsafe_b64encode(os.urandom(32)).decode()
     
     @staticmethod
     def derive_key_from_password(password: str, salt: bytes = None) -> bytes:
@@ -71,10 +303,13 @@ class PasswordEncryption:
         Returns:
             Tuple of (derived_key, salt)
         """
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        
         if salt is None:
             salt = os.urandom(16)
         
-        kdf = PBKDF2(
+        kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
             salt=salt,
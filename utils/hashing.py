@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils.metrics import metrics
+import os
+import threading
+
+
+class HashPoolSaturated(Exception):
+    """Raised when the hashing pool has no free worker or queue slot"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Password hashing capacity exhausted')
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs account password hashing and verification on a bounded process pool"""
+
+    def __init__(self, method: str = 'pbkdf2', workers: int = 2, queue_depth: int = 16, retry_after: int = 1):
+        """
+        Args:
+            method: Werkzeug hash method, e.g. ``pbkdf2:sha256:600000`` or ``scrypt``
+            workers: Worker processes; 0 hashes inline in the calling thread
+            queue_depth: Requests allowed to wait for a worker before rejecting
+            retry_after: Seconds advertised to clients when saturated
+        """
+        self.method = method
+        self.workers = workers
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(workers + queue_depth) if workers else None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._method_prefix = None
+
+    def _get_executor(self):
+        # Created lazily so each forked server worker starts its own pool
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolSaturated(self.retry_after)
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    @metrics.timed('crypto_operation_duration_seconds', operation='hash')
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    @metrics.timed('crypto_operation_duration_seconds', operation='verify')
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True if the stored hash was produced with different parameters than configured"""
+        if self._method_prefix is None:
+            # Werkzeug expands defaults (e.g. pbkdf2 -> pbkdf2:sha256:600000); learn them once
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+
+# Initialize password hasher
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2'),
+    workers=int(os.getenv('HASH_POOL_WORKERS', 2)),
+    queue_depth=int(os.getenv('HASH_POOL_QUEUE_DEPTH', 16)),
+    retry_after=int(os.getenv('HASH_POOL_RETRY_AFTER', 1))
+)
@@ -0,0 +1,138 @@
+from sqlalchemy import bindparam, select, update
+import json
+import os
+import time
+
+
+class KeyRotation:
+    """Re-encrypts stored passwords under the primary key in resumable batches"""
+
+    def __init__(self, db, encryption, checkpoint_path: str, batch_size: int = 500, throttle: float = 0.0):
+        """
+        Args:
+            db: Flask-SQLAlchemy instance
+            encryption: PasswordEncryption holding the full keyring
+            checkpoint_path: File recording the last processed id
+            batch_size: Rows re-encrypted and committed per batch
+            throttle: Seconds to sleep between batches to limit load
+        """
+        self.db = db
+        self.encryption = encryption
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.throttle = throttle
+
+    def load_checkpoint(self) -> dict:
+        if not os.path.exists(self.checkpoint_path):
+            return {'user_keys_done': False, 'last_id': 0, 'rotated': 0, 'skipped': 0, 'failed': []}
+
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, state: dict):
+        # Write then rename so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def rotate_user_keys(self):
+        """Re-wrap every per-user data key under the primary key (the data keys themselves are unchanged)"""
+        from models import User
+
+        table = User.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.data_key == bindparam('b_old'))
+            .values(data_key=bindparam('b_new'), updated_at=table.c.updated_at)
+        )
+
+        last_id = 0
+        while True:
+            rows = self.db.session.execute(
+                select(table.c.id, table.c.data_key)
+                .where(table.c.id > last_id, table.c.data_key.isnot(None))
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).all()
+
+            if not rows:
+                break
+
+            params = [
+                {'b_id': row.id, 'b_old': row.data_key, 'b_new': self.encryption.rotate(row.data_key)}
+                for row in rows if not self.encryption.is_current(row.data_key)
+            ]
+            if params:
+                self.db.session.execute(statement, params)
+            self.db.session.commit()
+            last_id = rows[-1].id
+
+    def run(self, progress=None) -> dict:
+        """
+        Rotate every row, resuming from the checkpoint if one exists
+
+        Args:
+            progress: Optional callback receiving the state after each batch
+
+        Returns:
+            Final state with counts of rotated, skipped and failed rows
+        """
+        from models import Password
+
+        table = Password.__table__
+        state = self.load_checkpoint()
+
+        if not state.get('user_keys_done'):
+            self.rotate_user_keys()
+            state['user_keys_done'] = True
+            self.save_checkpoint(state)
+
+        # Compare-and-swap on the old token so a concurrent user update is never
+        # overwritten; updated_at is kept because rotation is not a user-visible change
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.encrypted_password == bindparam('b_old'))
+            .values(encrypted_password=bindparam('b_new'), updated_at=table.c.updated_at)
+        )
+
+        while True:
+            rows = self.db.session.execute(
+                select(table.c.id, table.c.encrypted_password)
+                .where(table.c.id > state['last_id'], table.c.encrypted_password.isnot(None))
+                .order_by(table.c.id)
+                .limit(self.batch_size)
+            ).all()
+
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                if self.encryption.is_current(row.encrypted_password):
+                    state['skipped'] += 1
+                    continue
+
+                try:
+                    rotated = self.encryption.rotate(row.encrypted_password)
+                except ValueError:
+                    state['failed'].append(row.id)
+                    continue
+
+                params.append({'b_id': row.id, 'b_old': row.encrypted_password, 'b_new': rotated})
+
+            if params:
+                self.db.session.execute(statement, params)
+            self.db.session.commit()
+
+            state['rotated'] += len(params)
+            state['last_id'] = rows[-1].id
+            self.save_checkpoint(state)
+
+            if progress:
+                progress(state)
+
+            if self.throttle:
+                time.sleep(self.throttle)
+
+        return state
@@ -0,0 +1,273 @@
+"""
+Per-process request, SQL and crypto metrics in Prometheus text format
+
+Each thread records into its own dictionaries, so observing a value never takes
+a lock; the per-thread stores are only merged when ``/api/metrics`` is scraped.
+Stores of finished threads are folded into a shared total so thread-per-request
+servers do not accumulate them.
+
+Every worker process keeps its own counters: with several workers, each scrape
+reports the worker that served it, identified by the ``pid`` label.
+"""
+from bisect import bisect_left
+from functools import wraps
+import hmac
+import os
+import threading
+import time
+
+# Upper bounds in seconds, spanning SQLite lookups up to slow password hashing
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds for the number of SQL statements issued by one request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Lock-free histograms and counters, aggregated per thread"""
+
+    def __init__(self):
+        self._definitions = {}
+        self._local = threading.local()
+        self._stores = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+
+    def histogram(self, name: str, documentation: str, buckets=LATENCY_BUCKETS):
+        """Declare a histogram; observations of undeclared names are ignored"""
+        self._definitions[name] = ('histogram', documentation, tuple(buckets))
+
+    def counter(self, name: str, documentation: str):
+        """Declare a monotonically increasing counter"""
+        self._definitions[name] = ('counter', documentation, None)
+
+    def _store(self) -> dict:
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = {}
+            with self._lock:
+                self._retire_finished()
+                self._stores.append((threading.current_thread(), store))
+        return store
+
+    def _retire_finished(self):
+        # Called with the lock held
+        alive = []
+        for thread, store in self._stores:
+            if thread.is_alive():
+                alive.append((thread, store))
+            else:
+                self._merge(self._retired, store)
+        self._stores = alive
+
+    @staticmethod
+    def _merge(target: dict, source: dict):
+        # dict.copy() is atomic, so a store can be read while its thread keeps writing
+        for key, values in source.copy().items():
+            merged = target.get(key)
+            if merged is None:
+                target[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    merged[i] += value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        definition = self._definitions.get(name)
+        if not self.enabled or definition is None:
+            return
+
+        buckets = definition[2]
+        store = self._store()
+        key = (name, tuple(sorted(labels.items())))
+        entry = store.get(key)
+        if entry is None:
+            # One slot per bucket plus +Inf, then sum and count
+            entry = store[key] = [0] * (len(buckets) + 3)
+        entry[bisect_left(buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter"""
+        if not self.enabled or name not in self._definitions:
+            return
+
+        store = self._store()
+        key = (name, tuple(sorted(labels.items())))
+        entry = store.get(key)
+        if entry is None:
+            entry = store[key] = [0]
+        entry[0] += amount
+
+    def timed(self, name: str, **labels):
+        """Decorator observing the wall time of each call in a histogram"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict:
+        """Totals across all threads, keyed by (name, labels)"""
+        with self._lock:
+            self._retire_finished()
+            totals = {key: list(values) for key, values in self._retired.items()}
+            for _, store in self._stores:
+                self._merge(totals, store)
+        return totals
+
+    def render(self) -> str:
+        """Prometheus text exposition (format 0.0.4) of every recorded series"""
+        totals = self.snapshot()
+        pid = str(os.getpid())
+        lines = []
+
+        for name, (kind, documentation, buckets) in sorted(self._definitions.items()):
+            series = sorted((labels, values) for (metric, labels), values in totals.items() if metric == name)
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+
+            for labels, values in series:
+                labels = (('pid', pid),) + labels
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(values[0])}')
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), values):
+                    cumulative += count
+                    bucket_labels = labels + (('le', _format_value(float(bound))),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(float(values[-2]))}')
+                lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """Drop every recorded value (declarations are kept)"""
+        with self._lock:
+            self._retired.clear()
+            for _, store in self._stores:
+                store.clear()
+
+
+# Shared registry; METRICS_ENABLED=false turns every observation into a no-op
+metrics = MetricsRegistry()
+metrics.enabled = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+
+metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint, method and status')
+metrics.histogram('http_request_sql_queries', 'SQL statements issued per request', QUERY_COUNT_BUCKETS)
+metrics.histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request')
+metrics.histogram('sql_query_duration_seconds', 'Latency of individual SQL statements by database bind')
+metrics.histogram('crypto_operation_duration_seconds', 'Encryption, decryption and password hashing latency')
+metrics.counter('http_request_errors_total', 'Requests answered with a 5xx status')
+
+
+def monitoring_token_required(view):
+    """
+    Restrict an operational endpoint to callers presenting METRICS_TOKEN
+
+    The token is sent as ``Authorization: Bearer <token>``, which Prometheus
+    supports natively. Without a configured token the endpoint answers 404.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import current_app, jsonify, request
+
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            return jsonify({'error': 'Endpoint not found'}), 404
+
+        scheme, _, presented = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(presented.strip().encode(), token.encode()):
+            return jsonify({'error': 'Invalid monitoring token'}), 401, {'WWW-Authenticate': 'Bearer'}
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def install_request_hooks(app):
+    """Time every request and record its SQL query count and time"""
+    from flask import g, request
+
+    if not metrics.enabled:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+
+        # The URL rule, not the path, keeps label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = response.status_code
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method, status=status)
+        metrics.observe('http_request_sql_queries', g.get('sql_queries', 0), endpoint=endpoint)
+        metrics.observe('http_request_sql_duration_seconds', g.get('sql_seconds', 0.0), endpoint=endpoint)
+        if status >= 500:
+            metrics.inc('http_request_errors_total', endpoint=endpoint)
+        return response
+
+
+def install_query_hooks(app, db):
+    """Time every SQL statement on each engine, attributing it to the current request"""
+    from flask import g, has_request_context
+    from sqlalchemy import event
+
+    if not metrics.enabled:
+        return
+
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for bind, engine in engines.items():
+        bind_label = bind or 'primary'
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def record_query(conn, cursor, statement, parameters, context, executemany, bind_label=bind_label):
+            elapsed = time.perf_counter() - conn.info['query_start'].pop()
+            metrics.observe('sql_query_duration_seconds', elapsed, bind=bind_label)
+            if has_request_context() and 'sql_queries' in g:
+                g.sql_queries += 1
+                g.sql_seconds += elapsed
+
+        @event.listens_for(engine, 'handle_error')
+        def discard_query_timer(context):
+            # after_cursor_execute does not run for failed statements
+            starts = context.connection.info.get('query_start') if context.connection is not None else None
+            if starts:
+                starts.pop()
@@ -1,10 +1,171 @@
 import string
-import secrets
+import math
+import os
 import re
+from collections import namedtuple
+from functools import lru_cache
+from utils.breach_check import breach_index
+from utils.wordlist import wordlist
+
+SPECIAL_CHARACTERS = "!@#$%^&*-_=+[]{}|;:,.<>?"
+PUNCTUATION = frozenset(string.punctuation)
+
+# Compiled once; the strength checks run on every request
+REPEAT_PATTERN = re.compile(r'(.)\1{2,}')
+KEYBOARD_PATTERN = re.compile(r'qwerty|asdfgh|zxcvbn|123456|abcdef', re.IGNORECASE)
+PASSPHRASE_SEPARATOR = re.compile(r'[^A-Za-z0-9]+')
+
+# Assume 1 billion guesses per second (modern GPU); crack times are kept as log10
+# seconds so arbitrarily long inputs never build huge integers or overflow floats
+LOG10_GUESSES_PER_SECOND = 9
+# Largest value reported in the numeric 'seconds' field (JSON has no infinity)
+MAX_REPORTED_SECONDS = 1e300
+
+CharacterClasses = namedtuple('CharacterClasses', ['upper', 'lower', 'digit', 'special'])
+
+# Strength levels by score
+STRENGTH_LEVELS = {
+    0: "Very Weak",
+    1: "Weak",
+    2: "Fair",
+    3: "Good",
+    4: "Strong",
+    5: "Very Strong",
+    6: "Excellent",
+    7: "Perfect"
+}
+MAX_STRENGTH_SCORE = 7
+
+# Color coding for UI
+STRENGTH_COLORS = {
+    "Very Weak": "red",
+    "Weak": "orange",
+    "Fair": "yellow",
+    "Good": "lime",
+    "Strong": "green",
+    "Very Strong": "green",
+    "Excellent": "green",
+    "Perfect": "green"
+}
+
+# Entropy a generated passphrase needs per strength point (about one word)
+PASSPHRASE_BITS_PER_SCORE = 12
+
+
+def classify_characters(password: str) -> CharacterClasses:
+    """Find which character classes a password uses in a single pass"""
+    upper = lower = digit = special = False
+    for c in password:
+        if c.islower():
+            lower = True
+        elif c.isupper():
+            upper = True
+        elif c.isdigit():
+            digit = True
+        elif c in PUNCTUATION:
+            special = True
+    return CharacterClasses(upper, lower, digit, special)
+
+
+def _strength_result(score: int, feedback: list) -> dict:
+    """Shape a strength score the way the API reports it"""
+    strength = STRENGTH_LEVELS.get(score, "Unknown")
+    return {
+        'score': score,
+        'max_score': MAX_STRENGTH_SCORE,
+        'strength': strength,
+        'color': STRENGTH_COLORS.get(strength, 'gray'),
+        'feedback': feedback,
+        'percentage': int((score / MAX_STRENGTH_SCORE) * 100)
+    }
+
+
+@lru_cache(maxsize=64)
+def _build_alphabets(use_uppercase: bool, use_lowercase: bool, use_digits: bool,
+                     use_special: bool, exclude_ambiguous: bool) -> tuple:
+    """
+    Build the character groups for one option set (cached per option set)
+    
+    Returns:
+        Tuple of (required_groups, full_alphabet)
+    """
+    groups = []
+    
+    if use_uppercase:
+        chars = string.ascii_uppercase
+        if exclude_ambiguous:
+            chars = chars.replace('I', '').replace('O', '')
+        groups.append(chars)
+    
+    if use_lowercase:
+        chars = string.ascii_lowercase
+        if exclude_ambiguous:
+            chars = chars.replace('i', '').replace('l', '').replace('o', '')
+        groups.append(chars)
+    
+    if use_digits:
+        chars = string.digits
+        if exclude_ambiguous:
+            chars = chars.replace('0', '').replace('1', '')
+        groups.append(chars)
+    
+    if use_special:
+        # Use a safe set of special characters
+        groups.append(SPECIAL_CHARACTERS)
+    
+    characters = ''.join(groups) or string.ascii_letters + string.digits
+    return tuple(groups), characters
+
+
+class _RandomStream:
+    """Serves unbiased random draws from large os.urandom reads"""
+    
+    def __init__(self, chunk_size: int = 4096):
+        self.chunk_size = chunk_size
+        self._buffer = b''
+        self._pos = 0
+    
+    def _next_byte(self) -> int:
+        if self._pos >= len(self._buffer):
+            self._buffer = os.urandom(self.chunk_size)
+            self._pos = 0
+        byte = self._buffer[self._pos]
+        self._pos += 1
+        return byte
+    
+    def randbelow(self, n: int) -> int:
+        """Uniform integer in [0, n), via rejection sampling"""
+        if n <= 256:
+            limit = 256 - (256 % n)
+            while True:
+                byte = self._next_byte()
+                if byte < limit:
+                    return byte % n
+        
+        # Wider ranges (e.g. wordlist indices) use as many bytes as needed
+        size = (n.bit_length() + 7) // 8
+        span = 1 << (8 * size)
+        limit = span - (span % n)
+        while True:
+            value = int.from_bytes(bytes(self._next_byte() for _ in range(size)), 'big')
+            if value < limit:
+                return value % n
+    
+    def choice(self, alphabet: str) -> str:
+        return alphabet[self.randbelow(len(alphabet))]
+    
+    def shuffle(self, items: list):
+        """Fisher-Yates shuffle in place"""
+        for i in range(len(items) - 1, 0, -1):
+            j = self.randbelow(i + 1)
+            items[i], items[j] = items[j], items[i]
+
 
 class PasswordGenerator:
     """Generates secure random passwords with customizable options"""
     
+    MAX_BATCH_SIZE = 10000
+    
     @staticmethod
     def generate(length: int = 16, 
                  use_uppercase: bool = True,
@@ -32,79 +193,149 @@ class PasswordGenerator:
         if length > 128:
             length = 128
         
-        characters = ""
+        return PasswordGenerator._generate(
+            _RandomStream(chunk_size=2 * length + 16), length,
+            use_uppercase, use_lowercase, use_digits, use_special, exclude_ambiguous
+        )
+    
+    @staticmethod
+    def _generate(stream, length, use_uppercase, use_lowercase, use_digits, use_special, exclude_ambiguous):
+        groups, characters = _build_alphabets(
+            bool(use_uppercase), bool(use_lowercase), bool(use_digits), bool(use_special), bool(exclude_ambiguous)
+        )
         
-        if use_uppercase:
-            chars = string.ascii_uppercase
-            if exclude_ambiguous:
-                chars = chars.replace('I', '').replace('O', '')
-            characters += chars
+        # Generate password ensuring at least one character from each selected type
+        password_chars = [stream.choice(chars) for chars in groups]
         
-        if use_lowercase:
-            chars = string.ascii_lowercase
-            if exclude_ambiguous:
-                chars = chars.replace('i', '').replace('l', '').replace('o', '')
-            characters += chars
+        # Fill remaining length with random characters
+        for _ in range(length - len(password_chars)):
+            password_chars.append(stream.choice(characters))
         
-        if use_digits:
-            chars = string.digits
-            if exclude_ambiguous:
-                chars = chars.replace('0', '').replace('1', '')
-            characters += chars
+        # Shuffle so the guaranteed characters do not sit at predictable positions
+        stream.shuffle(password_chars)
         
-        if use_special:
-            # Use a safe set of special characters
-            chars = "!@#$%^&*-_=+[]{}|;:,.<>?"
-            characters += chars
+        return ''.join(password_chars)
+    
+    @staticmethod
+    def generate_batch(count: int,
+                       length: int = 16,
+                       use_uppercase: bool = True,
+                       use_lowercase: bool = True,
+                       use_digits: bool = True,
+                       use_special: bool = True,
+                       exclude_ambiguous: bool = False) -> list:
+        """
+        Generate many passwords sharing one option set
         
-        if not characters:
-            characters = string.ascii_letters + string.digits
+        Args:
+            count: Number of passwords (1 to MAX_BATCH_SIZE)
+            Remaining arguments as for generate()
         
-        # Generate password ensuring at least one character from each selected type
-        password_chars = []
-        
-        if use_uppercase:
-            chars = string.ascii_uppercase
-            if exclude_ambiguous:
-                chars = chars.replace('I', '').replace('O', '')
-            password_chars.append(secrets.choice(chars))
-        
-        if use_lowercase:
-            chars = string.ascii_lowercase
-            if exclude_ambiguous:
-                chars = chars.replace('i', '').replace('l', '').replace('o', '')
-            password_chars.append(secrets.choice(chars))
-        
-        if use_digits:
-            chars = string.digits
-            if exclude_ambiguous:
-                chars = chars.replace('0', '').replace('1', '')
-            password_chars.append(secrets.choice(chars))
-        
-        if use_special:
-            chars = "!@#$%^&*-_=+[]{}|;:,.<>?"
-            password_chars.append(secrets.choice(chars))
+        Returns:
+            List of generated password strings
+        """
+        count = max(1, min(count, PasswordGenerator.MAX_BATCH_SIZE))
+        length = max(8, min(length, 128))
+        
+        # One shared stream so randomness is read from the OS in large blocks
+        stream = _RandomStream(chunk_size=65536)
+        return [
+            PasswordGenerator._generate(
+                stream, length, use_uppercase, use_lowercase, use_digits, use_special, exclude_ambiguous
+            )
+            for _ in range(count)
+        ]
+    
+    @staticmethod
+    def generate_passphrase(word_count: int = 6,
+                            separator: str = '-',
+                            capitalize: bool = False,
+                            include_digit: bool = False) -> dict:
+        """
+        Generate a diceware-style passphrase from the bundled wordlist
         
-        # Fill remaining length with random characters
-        for _ in range(length - len(password_chars)):
-            password_chars.append(secrets.choice(characters))
+        Args:
+            word_count: Number of words (minimum 3, maximum 20)
+            separator: String placed between words (at most 5 characters)
+            capitalize: Capitalize the first letter of every word
+            include_digit: Append a random digit to one random word
+        
+        Returns:
+            Dictionary with the passphrase and its entropy in bits
+        """
+        word_count = max(3, min(word_count, 20))
+        separator = separator[:5]
         
-        # Shuffle to avoid predictable patterns
-        secrets.SystemRandom().shuffle(password_chars)
+        stream = _RandomStream(chunk_size=64)
+        words = [wordlist[stream.randbelow(len(wordlist))] for _ in range(word_count)]
         
-        return ''.join(password_chars)
+        if capitalize:
+            words = [w.capitalize() for w in words]
+        
+        if include_digit:
+            position = stream.randbelow(word_count)
+            words[position] += str(stream.randbelow(10))
+        
+        return {
+            'passphrase': separator.join(words),
+            'entropy_bits': PasswordGenerator.passphrase_entropy(word_count, include_digit)
+        }
+    
+    @staticmethod
+    def passphrase_entropy(word_count: int, include_digit: bool = False) -> float:
+        """Entropy of a generated passphrase: uniformly chosen words plus the optional digit and its position"""
+        bits = word_count * math.log2(len(wordlist))
+        if include_digit:
+            bits += math.log2(10) + math.log2(word_count)
+        return bits
+    
+    @staticmethod
+    def passphrase_strength(entropy_bits: float) -> dict:
+        """
+        Score a generated passphrase from its entropy
+        
+        The character-class checks do not apply: a passphrase is guessed word by
+        word, so its strength depends only on how many words were drawn.
+        """
+        score = min(MAX_STRENGTH_SCORE, int(entropy_bits // PASSPHRASE_BITS_PER_SCORE))
+        return _strength_result(score, [])
     
     @staticmethod
-    def check_strength(password: str) -> dict:
+    def detect_passphrase_entropy(password: str):
+        """
+        Recognise passphrases built from the wordlist
+        
+        Returns:
+            Entropy in bits, or None if the password is not such a passphrase
+        """
+        tokens = [t for t in PASSPHRASE_SEPARATOR.split(password) if t]
+        if len(tokens) < 3:
+            return None
+        
+        has_digit = False
+        for token in tokens:
+            word = token.rstrip(string.digits)
+            has_digit = has_digit or word != token
+            if word.lower() not in wordlist:
+                return None
+        
+        return PasswordGenerator.passphrase_entropy(len(tokens), has_digit)
+    
+    @staticmethod
+    def check_strength(password: str, classes: CharacterClasses = None) -> dict:
         """
         Analyze password strength and provide detailed feedback
         
         Args:
             password: Password to analyze
+            classes: Result of classify_characters, if already computed
         
         Returns:
             Dictionary with strength score, level, and detailed feedback
         """
+        if classes is None:
+            classes = classify_characters(password)
+        
         score = 0
         feedback = []
         
@@ -121,110 +352,99 @@ class PasswordGenerator:
             score += 1
         
         # Character type checks
-        has_upper = any(c.isupper() for c in password)
+        has_upper = classes.upper
         if has_upper:
             score += 1
         else:
             feedback.append("Add uppercase letters (A-Z)")
         
-        has_lower = any(c.islower() for c in password)
+        has_lower = classes.lower
         if has_lower:
             score += 1
         else:
             feedback.append("Add lowercase letters (a-z)")
         
-        has_digit = any(c.isdigit() for c in password)
+        has_digit = classes.digit
         if has_digit:
             score += 1
         else:
             feedback.append("Add numbers (0-9)")
         
-        has_special = any(c in string.punctuation for c in password)
+        has_special = classes.special
         if has_special:
             score += 1
         else:
             feedback.append("Add special characters (!@#$%^&*)")
         
         # Pattern checks
-        has_sequential = bool(re.search(r'(.)\1{2,}', password))
+        has_sequential = bool(REPEAT_PATTERN.search(password))
         if has_sequential:
             feedback.append("Avoid repeating characters")
             score = max(0, score - 1)
         
-        has_keyboard_pattern = bool(re.search(r'(qwerty|asdfgh|zxcvbn|123456|abcdef)', password.lower()))
+        has_keyboard_pattern = bool(KEYBOARD_PATTERN.search(password))
         if has_keyboard_pattern:
             feedback.append("Avoid keyboard patterns")
             score = max(0, score - 1)
         
-        # Strength levels
-        strength_levels = {
-            0: "Very Weak",
-            1: "Weak",
-            2: "Fair",
-            3: "Good",
-            4: "Strong",
-            5: "Very Strong",
-            6: "Excellent",
-            7: "Perfect"
-        }
-        
-        # Color coding for UI
-        color_map = {
-            "Very Weak": "red",
-            "Weak": "orange",
-            "Fair": "yellow",
-            "Good": "lime",
-            "Strong": "green",
-            "Very Strong": "green",
-            "Excellent": "green",
-            "Perfect": "green"
-        }
-        
-        strength = strength_levels.get(score, "Unknown")
-        
-        return {
-            'score': score,
-            'max_score': 7,
-            'strength': strength,
-            'color': color_map.get(strength, 'gray'),
-            'feedback': feedback,
-            'percentage': int((score / 7) * 100)
-        }
+        return _strength_result(score, feedback)
     
     @staticmethod
-    def estimate_crack_time(password: str) -> dict:
+    def estimate_crack_time(password: str, entropy_bits: float = None, classes: CharacterClasses = None) -> dict:
         """
         Estimate how long it would take to crack the password
         
         Args:
             password: Password to analyze
+            entropy_bits: Known entropy (e.g. of a generated passphrase); detected
+                for wordlist passphrases when omitted
+            classes: Result of classify_characters, if already computed
         
         Returns:
             Dictionary with estimated crack time
         """
-        # Calculate character space
-        char_space = 0
-        if any(c.isupper() for c in password):
-            char_space += 26
-        if any(c.islower() for c in password):
-            char_space += 26
-        if any(c.isdigit() for c in password):
-            char_space += 10
-        if any(c in string.punctuation for c in password):
-            char_space += 32
-        
-        if char_space == 0:
-            char_space = 94  # Default ASCII printable
-        
-        # Total possible combinations
-        total_combinations = char_space ** len(password)
-        
-        # Assume 1 billion guesses per second (modern GPU)
-        guesses_per_second = 1_000_000_000
+        if entropy_bits is None:
+            entropy_bits = PasswordGenerator.detect_passphrase_entropy(password)
+        
+        if entropy_bits is not None:
+            # Passphrases are guessed word by word, not character by character
+            log10_combinations = entropy_bits * math.log10(2)
+        else:
+            if classes is None:
+                classes = classify_characters(password)
+            
+            # Calculate character space
+            char_space = 0
+            if classes.upper:
+                char_space += 26
+            if classes.lower:
+                char_space += 26
+            if classes.digit:
+                char_space += 10
+            if classes.special:
+                char_space += 32
+            
+            if char_space == 0:
+                char_space = 94  # Default ASCII printable
+            
+            log10_combinations = len(password) * math.log10(char_space)
         
         # Average time to crack (half of total time)
-        seconds_to_crack = (total_combinations / 2) / guesses_per_second
+        log10_seconds = log10_combinations - math.log10(2) - LOG10_GUESSES_PER_SECOND
         
+        return PasswordGenerator.format_crack_time(log10_seconds)
+    
+    @staticmethod
+    def format_crack_time(log10_seconds: float) -> dict:
+        """
+        Describe a crack time given as log10 seconds
+        
+        Args:
+            log10_seconds: Base-10 logarithm of the expected seconds to crack
+        
+        Returns:
+            Dictionary with a human-readable time, seconds (capped), log10 seconds and unit
+        """
         # Convert to human-readable format
         time_units = [
             ('year', 31536000),
@@ -236,18 +456,30 @@ class PasswordGenerator:
             ('second', 1)
         ]
         
+        seconds_to_crack = min(10.0 ** min(log10_seconds, 300), MAX_REPORTED_SECONDS)
+        
         for unit, seconds in time_units:
-            if seconds_to_crack >= seconds:
-                value = seconds_to_crack / seconds
+            log10_value = log10_seconds - math.log10(seconds)
+            if log10_value >= 0:
+                if log10_value < 6:
+                    value = 10 ** log10_value
+                    amount = f"{value:.1f}"
+                else:
+                    # Scientific notation from the log directly; the value may not fit a float
+                    exponent = math.floor(log10_value)
+                    value = 10 ** (log10_value - exponent)
+                    amount = f"{value:.1f}e{exponent}"
                 return {
-                    'time': f"{value:.1f} {unit}{'s' if value > 1 else ''}",
+                    'time': f"{amount} {unit}{'s' if log10_value > 0 else ''}",
                     'seconds': seconds_to_crack,
+                    'log10_seconds': round(log10_seconds, 2),
                     'unit': unit
                 }
         
         return {
             'time': 'Less than a second',
             'seconds': seconds_to_crack,
+            'log10_seconds': round(log10_seconds, 2),
             'unit': 'second'
         }
 
@@ -269,16 +501,25 @@ class PasswordValidator:
         return password.lower() in PasswordValidator.COMMON_PASSWORDS
     
     @staticmethod
-    def validate(password: str) -> dict:
+    def is_breached_password(password: str) -> bool:
+        """Check if password appears in the offline breach corpus (if one is configured)"""
+        return breach_index.is_breached(password)
+    
+    @staticmethod
+    def validate(password: str, classes: CharacterClasses = None) -> dict:
         """
         Comprehensive password validation
         
         Args:
             password: Password to validate
+            classes: Result of classify_characters, if already computed
         
         Returns:
             Dictionary with validation results
         """
+        if classes is None:
+            classes = classify_characters(password)
+        
         issues = []
         
         if len(password) < 8:
@@ -286,20 +527,46 @@ class PasswordValidator:
         
         if PasswordValidator.is_common_password(password):
             issues.append("This password is too common")
+        elif PasswordValidator.is_breached_password(password):
+            issues.append("This password has appeared in a data breach")
         
-        if not any(c.isupper() for c in password):
+        if not classes.upper:
             issues.append("Password must contain uppercase letters")
         
-        if not any(c.islower() for c in password):
+        if not classes.lower:
             issues.append("Password must contain lowercase letters")
         
-        if not any(c.isdigit() for c in password):
+        if not classes.digit:
             issues.append("Password must contain numbers")
         
-        if not any(c in string.punctuation for c in password):
+        if not classes.special:
             issues.append("Password must contain special characters")
         
         return {
             'is_valid': len(issues) == 0,
             'issues': issues
         }
+
+
+class PasswordAnalyzer:
+    """Runs the strength, crack-time and validation checks from one classification pass"""
+    
+    @staticmethod
+    def analyze(password: str, entropy_bits: float = None) -> dict:
+        """
+        Analyze a password in one call
+        
+        Args:
+            password: Password to analyze
+            entropy_bits: Known entropy, forwarded to estimate_crack_time
+        
+        Returns:
+            Dictionary with strength, crack_time and validation results
+        """
+        classes = classify_characters(password)
+        
+        return {
+            'strength': PasswordGenerator.check_strength(password, classes),
+            'crack_time': PasswordGenerator.estimate_crack_time(password, entropy_bits, classes),
+            'validation': PasswordValidator.validate(password, classes)
+        }
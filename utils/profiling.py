@@ -0,0 +1,268 @@
+"""
+Opt-in per-request profiling
+
+With PROFILING_ENABLED set, a request is profiled when it carries the
+PROFILE_HEADER with PROFILE_SECRET as its value (the header is ignored while no
+secret is configured) or when it falls in the PROFILE_SAMPLE_RATE fraction of
+sampled requests. Each
+profiled request writes one file to PROFILE_DIR and appends a line describing
+it to ``index.jsonl`` there. Buffered bodies are generated inside the profile;
+streamed ones (such as the vault export) are passed through untouched, so only
+the view up to returning the response is profiled:
+
+- ``cprofile`` mode writes a pstats dump (``.prof``), readable with pstats,
+  snakeviz and similar viewers.
+- ``sample`` mode polls the request thread's stack every
+  PROFILE_SAMPLE_INTERVAL_MS and writes collapsed stacks (``.collapsed``), the
+  input format of flamegraph.pl and speedscope. Its overhead is lower and does
+  not grow with the number of function calls.
+
+``flask profile-report`` aggregates the files per endpoint.
+"""
+from collections import Counter, defaultdict
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import warnings
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+# Environ keys the request hooks fill in for the middleware
+ENDPOINT_KEY = 'profiling.endpoint'
+STREAMED_KEY = 'profiling.streamed'
+
+INDEX_FILE = 'index.jsonl'
+
+
+def write_collapsed(stacks: Counter, path: str):
+    """Write stack counts in collapsed-stack format (``frame;frame;frame count``)"""
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Background thread recording the stacks of one thread at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            # A sample taken while stop() was running shows the sampler, not the request
+            if self._stop.is_set():
+                break
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        write_collapsed(self.stacks, path)
+
+
+class ProfilingMiddleware:
+    """WSGI middleware profiling selected requests, from routing to the serialized response"""
+
+    def __init__(self, wsgi_app, directory: str, mode: str = 'cprofile', sample_rate: float = 0.0,
+                 header: str = 'X-Profile', secret: str = None, sample_interval: float = 0.001):
+        """
+        Args:
+            wsgi_app: Application to wrap
+            directory: Where profile files and the index are written
+            mode: 'cprofile' for deterministic pstats dumps, 'sample' for collapsed stacks
+            sample_rate: Fraction of requests profiled without the header (0 to 1)
+            header: Request header asking for a profile
+            secret: Value the header must carry; without one the header is ignored
+            sample_interval: Seconds between stack samples in 'sample' mode
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"PROFILE_MODE must be one of {', '.join(PROFILE_MODES)}")
+
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.environ_header = 'HTTP_' + header.upper().replace('-', '_')
+        self.secret = secret
+        self.sample_interval = sample_interval
+        self._cprofile_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _wanted(self, environ) -> bool:
+        requested = environ.get(self.environ_header)
+        # Profiling is costly and leaks timings, so it is never left to anonymous clients
+        if requested is not None and self.secret and hmac.compare_digest(requested.encode(), self.secret.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _consume(self, environ, start_response):
+        iterable = self.wsgi_app(environ, start_response)
+        # Buffering a streamed body would hold all of it in memory and delay the
+        # first byte until the last, so it is returned as is
+        if environ.get(STREAMED_KEY):
+            return iterable
+        try:
+            return list(iterable)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ):
+            return self.wsgi_app(environ, start_response)
+
+        # Only one cProfile profiler can be active per process; concurrent requests go unprofiled
+        if self.mode == 'cprofile' and not self._cprofile_lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        status_holder = []
+
+        def capture_status(status, headers, exc_info=None):
+            status_holder.append(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        start = time.perf_counter()
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                # Consume buffered bodies inside the profile so lazily generated responses count too
+                body = profiler.runcall(self._consume, environ, capture_status)
+            finally:
+                self._cprofile_lock.release()
+                self._save(environ, status_holder, time.perf_counter() - start, 'prof', profiler.dump_stats)
+        else:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+            try:
+                body = self._consume(environ, capture_status)
+            finally:
+                sampler.stop()
+                self._save(environ, status_holder, time.perf_counter() - start, 'collapsed', sampler.write)
+        return body
+
+    def _save(self, environ, status_holder, elapsed: float, extension: str, write):
+        endpoint = environ.get(ENDPOINT_KEY, 'unmatched')
+        method = environ.get('REQUEST_METHOD', '')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{os.urandom(4).hex()}-{method}-{slug}.{extension}"
+
+        write(os.path.join(self.directory, name))
+
+        entry = {
+            'file': name,
+            'endpoint': endpoint,
+            'method': method,
+            'status': int(status_holder[0]) if status_holder else None,
+            'duration_ms': round(elapsed * 1000, 3),
+            'mode': self.mode,
+            # Streamed responses are only profiled until the view returns
+            'streamed': bool(environ.get(STREAMED_KEY))
+        }
+        # One short O_APPEND write per line, so concurrent workers do not interleave entries
+        with open(os.path.join(self.directory, INDEX_FILE), 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+def install_profiling(app):
+    """Wrap the app in ProfilingMiddleware when PROFILING_ENABLED is set"""
+    from flask import request
+
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    if not app.config.get('PROFILE_SECRET'):
+        warnings.warn('No PROFILE_SECRET configured; the profiling header is ignored and only sampling applies')
+
+    @app.before_request
+    def record_profile_endpoint():
+        # The URL rule groups profiles of e.g. /api/passwords/1 and /api/passwords/2 together
+        if request.url_rule is not None:
+            request.environ[ENDPOINT_KEY] = request.url_rule.rule
+
+    @app.after_request
+    def record_streamed_response(response):
+        if response.is_streamed or response.direct_passthrough:
+            request.environ[STREAMED_KEY] = True
+        return response
+
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        directory=os.path.abspath(app.config['PROFILE_DIR']),
+        mode=app.config['PROFILE_MODE'],
+        sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+        header=app.config['PROFILE_HEADER'],
+        secret=app.config.get('PROFILE_SECRET'),
+        sample_interval=app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000
+    )
+
+
+def load_index(directory: str) -> list:
+    """Entries of the profile index whose files still exist"""
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+
+    entries = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if os.path.exists(os.path.join(directory, entry['file'])):
+                entries.append(entry)
+    return entries
+
+
+def group_by_endpoint(entries: list) -> dict:
+    """Index entries grouped by ``METHOD endpoint``"""
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[f"{entry['method']} {entry['endpoint']}"].append(entry)
+    return dict(groups)
+
+
+def merge_collapsed(paths: list) -> Counter:
+    """Sum collapsed-stack files into one set of stack counts"""
+    stacks = Counter()
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def self_time(stacks: Counter) -> Counter:
+    """Samples per leaf frame, the sampling equivalent of pstats' tottime"""
+    leaves = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += count
+    return leaves
@@ -0,0 +1,170 @@
+from sqlalchemy import case, or_, text
+from sqlalchemy.exc import OperationalError
+import re
+
+# Indexed columns of the passwords table and their bm25 weights
+SEARCH_COLUMNS = ('service_name', 'username', 'url', 'notes')
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Characters that start a new word in the metadata, for the LIKE fallback
+WORD_SEPARATORS = ' .@/-_:'
+
+
+class PasswordSearchIndex:
+    """Full-text search over vault metadata, backed by SQLite FTS5 when available"""
+
+    TABLE = 'passwords_fts'
+
+    def __init__(self):
+        # None until init_app runs or the first search checks for the index
+        self.fts_enabled = None
+
+    def init_app(self, db, engine=None):
+        """
+        Create the FTS5 index and its sync triggers if the engine supports them
+
+        Run as part of schema setup (``flask init-db``), not on every start-up.
+
+        The triggers keep the index in step with every write to ``passwords``
+        (single-row routes as well as bulk import and batch statements).
+        Other engines fall back to LIKE matching on the base table.
+
+        Args:
+            db: Flask-SQLAlchemy instance, used inside an app context
+            engine: Database holding the passwords table (a vault shard);
+                defaults to the primary
+        """
+        engine = engine if engine is not None else db.engine
+        if engine.dialect.name != 'sqlite':
+            self.fts_enabled = False
+            return
+
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': self.TABLE}
+                ).first()
+
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} USING fts5("
+                    f"{columns}, content='passwords', content_rowid='id', tokenize='unicode61')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.TABLE}_ai AFTER INSERT ON passwords BEGIN "
+                    f"INSERT INTO {self.TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.TABLE}_ad AFTER DELETE ON passwords BEGIN "
+                    f"INSERT INTO {self.TABLE}({self.TABLE}, rowid, {columns}) "
+                    f"VALUES ('delete', old.id, {old_values}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {self.TABLE}_au AFTER UPDATE OF {columns} ON passwords BEGIN "
+                    f"INSERT INTO {self.TABLE}({self.TABLE}, rowid, {columns}) "
+                    f"VALUES ('delete', old.id, {old_values}); "
+                    f"INSERT INTO {self.TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+                ))
+
+                # Index rows that existed before the search table was created
+                if not exists:
+                    conn.execute(text(f"INSERT INTO {self.TABLE}({self.TABLE}) VALUES ('rebuild')"))
+
+            self.fts_enabled = True
+        except OperationalError:
+            # SQLite built without FTS5
+            self.fts_enabled = False
+
+    def _detect_index(self, session) -> bool:
+        """Check once per process whether init_app has created the FTS5 table"""
+        if session.get_bind().dialect.name != 'sqlite':
+            return False
+
+        exists = session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.TABLE}
+        ).first()
+        return exists is not None
+
+    @staticmethod
+    def tokenize(query: str) -> list:
+        """Split a free-text query into search tokens"""
+        return _TOKEN_RE.findall(query or '')
+
+    def search_ids(self, session, user_id: int, query: str, limit: int) -> list:
+        """
+        Find the best matching password ids for a user
+
+        Every token is matched as a prefix, so partial input works for type-ahead.
+
+        Args:
+            session: SQLAlchemy session
+            user_id: Owner of the entries
+            query: Free-text query
+            limit: Maximum number of ids to return
+
+        Returns:
+            List of password ids, best match first
+        """
+        tokens = self.tokenize(query)
+        if not tokens:
+            return []
+
+        if self.fts_enabled is None:
+            self.fts_enabled = self._detect_index(session)
+
+        if self.fts_enabled:
+            match = ' '.join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+            weights = ', '.join(str(w) for w in SEARCH_WEIGHTS)
+            # CROSS JOIN pins the join order: the user's rows come from the
+            # user_id index and each is checked against the index by rowid, so
+            # the cost follows the size of this vault rather than of the table
+            rows = session.execute(text(
+                f"SELECT p.id FROM passwords p CROSS JOIN {self.TABLE} ON {self.TABLE}.rowid = p.id "
+                f"WHERE p.user_id = :user_id AND {self.TABLE} MATCH :match "
+                f"ORDER BY bm25({self.TABLE}, {weights}) LIMIT :limit"
+            ), {'match': match, 'user_id': user_id, 'limit': limit})
+            return [row[0] for row in rows]
+
+        return self._fallback_search_ids(session, user_id, tokens, limit)
+
+    @staticmethod
+    def _fallback_search_ids(session, user_id, tokens, limit):
+        """
+        Portable LIKE-based search used when FTS5 is unavailable
+
+        Like the FTS5 query, each token must match the start of a word: the start
+        of a column or the text after a separator.
+        """
+        from models import Password
+
+        def escape(value):
+            return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+        columns = [getattr(Password, c) for c in SEARCH_COLUMNS]
+        query = session.query(Password.id).filter(Password.user_id == user_id)
+
+        for token in tokens:
+            patterns = [f"{escape(token)}%"] + [f"%{escape(sep)}{escape(token)}%" for sep in WORD_SEPARATORS]
+            query = query.filter(or_(*(c.ilike(p, escape='\\') for c in columns for p in patterns)))
+
+        # Rank service name prefix matches first, then username prefix matches
+        prefix = f"{escape(tokens[0])}%"
+        rank = case(
+            (Password.service_name.ilike(prefix, escape='\\'), 0),
+            (Password.username.ilike(prefix, escape='\\'), 1),
+            else_=2
+        )
+
+        rows = query.order_by(rank, Password.service_name, Password.id).limit(limit)
+        return [row[0] for row in rows]
+
+
+# Initialize search index
+search_index = PasswordSearchIndex()
@@ -0,0 +1,366 @@
+"""
+Hash-partitioned vault sharding
+
+With VAULT_SHARD_URLS (or VAULT_SHARD_COUNT for local SQLite files) set, each
+user's vault tables live in one of N shard databases, while the directory
+tables (users, revoked tokens) stay in the primary database. A user is placed
+on a shard by hashing their id at registration and pinned there through
+``User.shard``, so changing the shard count never strands existing vaults;
+``move_vault`` relocates a user explicitly.
+
+Users registered before sharding was enabled have no shard and their vaults
+are still in the primary database. Their requests are refused (503) until
+``move_from_primary`` (``flask rebalance-shards --from-primary``) has copied
+them to their hash shard, rather than being routed to an empty shard.
+
+Queries are routed by RoutingSession (utils/database.py): statements on vault
+tables go to the shard of the user in the current JWT, or to the shard chosen
+with ``shard_router.scope()`` in CLI jobs.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, has_request_context
+from sqlalchemy import delete, insert, select, update
+from utils.user_cache import UserCache
+import os
+import time
+import zlib
+
+# Tables stored per shard; everything else stays in the primary database
+VAULT_TABLES = frozenset({'passwords', 'password_tombstones', 'passwords_fts', 'vault_versions'})
+
+# User.shard value while a vault is being moved; requests are refused until it is set again
+MOVING = -1
+
+
+class VaultMoving(Exception):
+    """Raised when a request touches a vault that is being moved between shards"""
+
+    def __init__(self, retry_after: int = 5):
+        super().__init__('Vault is being moved, retry shortly')
+        self.retry_after = retry_after
+
+
+def shard_bind(index: int) -> str:
+    """SQLALCHEMY_BINDS key of a shard"""
+    return f'shard{index}'
+
+
+class ShardRouter:
+    """Maps users to shard databases"""
+
+    def __init__(self):
+        self.count = 0
+        # Per-process cache of User.shard, so routing does not cost a primary round trip per request
+        self.cache = UserCache(
+            maxsize=int(os.getenv('SHARD_CACHE_SIZE', 4096)),
+            ttl=float(os.getenv('SHARD_CACHE_TTL', 30))
+        )
+
+    def init_app(self, app):
+        """Register one bind per shard from VAULT_SHARD_URLS / VAULT_SHARD_COUNT"""
+        urls = list(app.config.get('VAULT_SHARD_URLS') or [])
+        if not urls and app.config.get('VAULT_SHARD_COUNT'):
+            # Local mode: SQLite files next to the primary database (relative to the instance folder)
+            urls = [f'sqlite:///vault_shard{i}.db' for i in range(app.config['VAULT_SHARD_COUNT'])]
+
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        for index, url in enumerate(urls):
+            binds[shard_bind(index)] = {'url': url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+        self.count = len(urls)
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 0
+
+    def place(self, user_id: int):
+        """Shard for a new user, or None when sharding is off"""
+        if not self.enabled:
+            return None
+        return zlib.crc32(str(user_id).encode()) % self.count
+
+    def shard_for(self, user_id: int) -> int:
+        """
+        Look up the shard a user's vault lives on
+
+        Answers are cached for SHARD_CACHE_TTL seconds; ``move_vault`` waits that
+        long after fencing, so no process still routes to the old shard when the
+        copy starts.
+        """
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached['shard']
+
+        from extensions import db
+        from models import User
+
+        # Read on a separate connection: this runs while the session is choosing a bind
+        with db.engines[None].connect() as conn:
+            row = conn.execute(select(User.__table__.c.shard).where(User.__table__.c.id == user_id)).first()
+
+        # Not cached, so the end of a move is seen right away. A user without a
+        # shard predates sharding and their vault is still on the primary
+        if row is not None and (row.shard == MOVING or (row.shard is None and self.enabled)):
+            raise VaultMoving()
+        shard = row.shard if row is not None else self.place(user_id)
+        self.cache.set(user_id, {'shard': shard})
+        return shard
+
+    def current_shard(self):
+        """
+        Shard for the current context
+
+        Returns:
+            The shard selected with scope(), else the shard of the user in the
+            request's JWT, else None
+        """
+        if 'vault_shard' in g:
+            return g.vault_shard
+
+        if not has_request_context():
+            return None
+
+        from flask_jwt_extended import get_jwt_identity
+
+        try:
+            user_id = get_jwt_identity()
+        except RuntimeError:
+            # No verified JWT in this request (e.g. registration, login)
+            return None
+        if user_id is None:
+            return None
+
+        g.vault_shard = self.shard_for(user_id)
+        return g.vault_shard
+
+    @contextmanager
+    def scope(self, index):
+        """Route vault queries to one shard, for jobs running outside a user request"""
+        previous = g.pop('vault_shard', None)
+        g.vault_shard = index
+        try:
+            yield
+        finally:
+            g.pop('vault_shard', None)
+            if previous is not None:
+                g.vault_shard = previous
+
+    def shards(self) -> list:
+        """Shard indexes to iterate in maintenance jobs ([None] when sharding is off)"""
+        return list(range(self.count)) if self.enabled else [None]
+
+
+def move_vault(db, user_id: int, target: int, grace: float = 2.0) -> int:
+    """
+    Move a user's vault to another shard
+
+    The user is fenced (requests get 503 VaultMoving) while rows are copied.
+    Entries keep their ids unless the id is taken on the target (ids are only
+    unique per shard), in which case they get a new one. The copies are stamped
+    with a new vault version and the ids that no longer exist are tombstoned, so
+    delta-sync clients end up with the same vault; no id is ever both live and
+    tombstoned.
+
+    The fence records the source and target shards, so a move interrupted by a
+    crash can be finished or rolled back with ``resume_moves``.
+
+    Args:
+        db: Flask-SQLAlchemy instance
+        user_id: Owner of the vault
+        target: Destination shard index
+        grace: Seconds to wait after fencing so in-flight requests can finish,
+            on top of the shard cache TTL
+
+    Returns:
+        Number of entries moved
+    """
+    from models import User
+
+    users = User.__table__
+
+    source = shard_router.shard_for(user_id)
+    if source is None or source == target:
+        return 0
+
+    with db.engines[None].begin() as conn:
+        conn.execute(update(users).where(users.c.id == user_id).values(
+            shard=MOVING, move_source=source, move_target=target, updated_at=users.c.updated_at
+        ))
+
+    shard_router.cache.invalidate(user_id)
+    # Other processes keep routing to the source until their cached shard expires
+    wait = grace + shard_router.cache.ttl
+    if wait:
+        time.sleep(wait)
+
+    return _copy_vault(db, user_id, source, target)
+
+
+def move_from_primary(db, limit: int = None) -> list:
+    """
+    Move the vaults of users registered before sharding was enabled to their hash shard
+
+    These users have no shard and are refused until moved, so nothing routes to
+    their vault and no grace period is needed. Each user is fenced like in
+    ``move_vault`` (with no source shard), so an interrupted run is finished or
+    rolled back by ``resume_moves``. The copies stay on the primary until each
+    move completes.
+
+    Args:
+        db: Flask-SQLAlchemy instance
+        limit: Move at most this many users (None for all)
+
+    Returns:
+        (user id, shard, entries moved) per user
+    """
+    from models import User
+
+    users = User.__table__
+    primary = db.engines[None]
+
+    query = select(users.c.id).where(users.c.shard.is_(None)).order_by(users.c.id)
+    with primary.connect() as conn:
+        user_ids = conn.execute(query.limit(limit) if limit else query).scalars().all()
+
+    results = []
+    for user_id in user_ids:
+        target = shard_router.place(user_id)
+        with primary.begin() as conn:
+            fenced = conn.execute(update(users).where(users.c.id == user_id, users.c.shard.is_(None)).values(
+                shard=MOVING, move_source=None, move_target=target, updated_at=users.c.updated_at
+            )).rowcount
+        if fenced:
+            results.append((user_id, target, _copy_vault(db, user_id, None, target)))
+    return results
+
+
+def resume_moves(db, rollback: bool = False) -> list:
+    """
+    Finish the moves of users left fenced by an interrupted ``move_vault``
+
+    The source shard keeps the whole vault until the move completes, so a move
+    can always be redone from the start. Moves off the primary (no source shard)
+    are rolled back to the primary.
+
+    Args:
+        db: Flask-SQLAlchemy instance
+        rollback: Unfence users on their source shard instead of finishing the move
+
+    Returns:
+        (user id, shard the vault is now on, entries moved) per fenced user
+    """
+    from models import User, Password, PasswordTombstone, VaultVersion
+
+    users = User.__table__
+    primary = db.engines[None]
+
+    with primary.connect() as conn:
+        fenced = conn.execute(
+            select(users.c.id, users.c.move_source, users.c.move_target).where(users.c.shard == MOVING)
+        ).all()
+
+    results = []
+    for user_id, source, target in fenced:
+        if not rollback:
+            results.append((user_id, target, _copy_vault(db, user_id, source, target)))
+            continue
+
+        with primary.begin() as conn:
+            _unfence(conn, users, user_id, source)
+        # Drop whatever part of the copy reached the target
+        with db.engines[shard_bind(target)].begin() as conn:
+            conn.execute(delete(Password.__table__).where(Password.__table__.c.user_id == user_id))
+            conn.execute(delete(PasswordTombstone.__table__).where(PasswordTombstone.__table__.c.user_id == user_id))
+            conn.execute(delete(VaultVersion.__table__).where(VaultVersion.__table__.c.user_id == user_id))
+        results.append((user_id, source, 0))
+    return results
+
+
+def _unfence(conn, users, user_id: int, shard: int, **values):
+    conn.execute(update(users).where(users.c.id == user_id).values(
+        shard=shard, move_source=None, move_target=None, updated_at=users.c.updated_at, **values
+    ))
+    shard_router.cache.invalidate(user_id)
+
+
+def _vault_engine(db, shard):
+    # None is the primary, which held every vault before sharding was enabled
+    return db.engines[None] if shard is None else db.engines[shard_bind(shard)]
+
+
+def _copy_vault(db, user_id: int, source, target: int) -> int:
+    # Copies a fenced user's vault from source (None for the primary) to target,
+    # then points the user at target
+    from models import User, Password, PasswordTombstone, VaultVersion
+
+    users = User.__table__
+    passwords = Password.__table__
+    tombstones = PasswordTombstone.__table__
+    versions = VaultVersion.__table__
+    primary = db.engines[None]
+    source_engine = _vault_engine(db, source)
+    target_engine = db.engines[shard_bind(target)]
+
+    try:
+        now = datetime.utcnow()
+        with source_engine.connect() as conn:
+            # No writes happen while fenced, so the version the move commits is known now
+            current = conn.execute(select(versions.c.version).where(versions.c.user_id == user_id)).scalar()
+            version = (current or 0) + 1
+            rows = conn.execute(select(passwords).where(passwords.c.user_id == user_id)).mappings().all()
+            old_tombstones = conn.execute(
+                select(tombstones).where(tombstones.c.user_id == user_id)
+            ).mappings().all()
+
+        with target_engine.begin() as conn:
+            # Leftovers of an interrupted move, or of a move away that crashed before cleaning up
+            conn.execute(delete(passwords).where(passwords.c.user_id == user_id))
+            conn.execute(delete(tombstones).where(tombstones.c.user_id == user_id))
+            conn.execute(delete(versions).where(versions.c.user_id == user_id))
+            conn.execute(insert(versions).values(user_id=user_id, version=version))
+
+            old_ids = [row['id'] for row in rows]
+            taken = set(conn.execute(select(passwords.c.id).where(passwords.c.id.in_(old_ids))).scalars()) \
+                if old_ids else set()
+
+            copies = [{**row, 'updated_at': now, 'version': version} for row in rows]
+            kept = [copy for copy in copies if copy['id'] not in taken]
+            if kept:
+                conn.execute(insert(passwords), kept)
+            live_ids = {copy['id'] for copy in kept}
+            for copy in copies:
+                if copy['id'] in taken:
+                    result = conn.execute(insert(passwords).values({k: v for k, v in copy.items() if k != 'id'}))
+                    live_ids.add(result.inserted_primary_key[0])
+
+            # Renumbered entries may land on an id the client knows as deleted or as
+            # another entry; that id is delivered as live, so it must not be tombstoned
+            moved_tombstones = [
+                {k: v for k, v in row.items() if k != 'id'}
+                for row in old_tombstones if row['password_id'] not in live_ids
+            ]
+            moved_tombstones += [
+                {'user_id': user_id, 'password_id': password_id, 'deleted_at': now, 'version': version}
+                for password_id in old_ids if password_id not in live_ids
+            ]
+            if moved_tombstones:
+                conn.execute(insert(tombstones), moved_tombstones)
+    except Exception:
+        # Nothing was committed on the target, so the vault simply stays where it was
+        with primary.begin() as conn:
+            _unfence(conn, users, user_id, source)
+        raise
+
+    with primary.begin() as conn:
+        _unfence(conn, users, user_id, target)
+
+    with source_engine.begin() as conn:
+        conn.execute(delete(passwords).where(passwords.c.user_id == user_id))
+        conn.execute(delete(tombstones).where(tombstones.c.user_id == user_id))
+        conn.execute(delete(versions).where(versions.c.user_id == user_id))
+
+    return len(rows)
+
+
+# Initialize shard router
+shard_router = ShardRouter()
@@ -0,0 +1,558 @@
+"""
+Pattern-matching password strength estimator (zxcvbn style)
+
+Dictionary matches come from an Aho-Corasick automaton over the bundled
+dictionaries, every list in utils/data/dictionaries, and the files or
+directories in STRENGTH_DICTIONARIES. The bundled lists are small; fetch 100k+
+entry frequency lists (common passwords, English words) with:
+
+    python -m utils.strength_estimator --fetch
+
+The automaton is compiled once into a flat binary file (a dense
+transition table plus per-state match data) which every worker memory-maps, so
+the pages are shared and no worker rebuilds it. The password is then split
+into the cheapest sequence of dictionary, keyboard, sequence, repeat, year and
+brute-force segments, and the total guess count drives the score.
+
+``flask init-db`` compiles the automaton into a private cache directory (the
+app's instance folder, STRENGTH_CACHE_DIR, or ~/.cache/password-manager),
+keyed by the dictionary contents; workers only map it. To ship it precompiled
+instead, build it at deploy time and point STRENGTH_AUTOMATON_PATH at the file:
+
+    python -m utils.strength_estimator strength.aca
+"""
+from array import array
+import argparse
+import glob
+import hashlib
+import math
+import mmap
+import os
+import re
+import stat
+import struct
+import sys
+import threading
+from collections import deque
+from utils.password_generator import PasswordGenerator
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Bundled dictionaries: name, file, and whether the file lists the most common entries first
+BUNDLED_DICTIONARIES = (
+    ('passwords', os.path.join(DATA_DIR, 'common_passwords.txt'), True),
+    ('english', os.path.join(DATA_DIR, 'wordlist.txt'), False),
+)
+
+# Extra frequency-ordered lists (<name>.txt, one entry per line; anything after
+# the first whitespace, such as a count, is ignored). Names starting with
+# "passwords" are reported as common passwords, the rest as dictionary words.
+DICTIONARY_DIR = os.path.join(DATA_DIR, 'dictionaries')
+
+# Public frequency lists fetched with --fetch: file name -> URL
+DOWNLOADS = {
+    'passwords-top100k.txt': 'https://raw.githubusercontent.com/danielmiessler/SecLists/master/'
+                             'Passwords/Common-Credentials/10-million-password-list-top-100000.txt',
+    'english-50k.txt': 'https://raw.githubusercontent.com/hermitdave/FrequencyWords/master/'
+                       'content/2018/en/en_50k.txt',
+}
+
+
+def dictionary_sources(extra: list = None) -> list:
+    """
+    Dictionaries compiled into the automaton
+
+    Args:
+        extra: Additional files or directories of ``.txt`` lists; defaults to
+            the os.pathsep separated STRENGTH_DICTIONARIES
+
+    Returns:
+        List of (name, path, ranked) triples: the bundled lists, then every list
+        in DICTIONARY_DIR, then the extra ones
+    """
+    if extra is None:
+        extra = [p for p in os.getenv('STRENGTH_DICTIONARIES', '').split(os.pathsep) if p]
+
+    sources = list(BUNDLED_DICTIONARIES)
+    for entry in (DICTIONARY_DIR, *extra):
+        if os.path.isdir(entry):
+            paths = sorted(glob.glob(os.path.join(entry, '*.txt')))
+        elif os.path.exists(entry):
+            paths = [entry]
+        else:
+            paths = []
+        for path in paths:
+            sources.append((os.path.splitext(os.path.basename(path))[0], path, True))
+    return sources
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+CHAR_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+MIN_MATCH_LENGTH = 3
+
+# Only the first MAX_ANALYZED characters are pattern-matched; the rest is brute force
+MAX_ANALYZED = 100
+
+L33T_TABLE = str.maketrans({
+    '4': 'a', '@': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g', '9': 'g', '1': 'i', '!': 'i',
+    '|': 'l', '0': 'o', '$': 's', '5': 's', '7': 't', '+': 't', '2': 'z',
+})
+
+KEYBOARD_ROWS = ('`1234567890-=', 'qwertyuiop[]\\', "asdfghjkl;'", 'zxcvbnm,./')
+
+GUESSES_PER_SECOND = 1_000_000_000
+
+MAGIC = b'ACA2'
+HEADER = struct.Struct('<4sIII')
+
+
+def _keyboard_graph() -> dict:
+    """Adjacent keys on a QWERTY layout (same row, and the two keys above and below)"""
+    positions = {}
+    for row, keys in enumerate(KEYBOARD_ROWS):
+        for col, key in enumerate(keys):
+            positions[key] = (row, col)
+
+    graph = {}
+    for key, (row, col) in positions.items():
+        neighbours = set()
+        for d_row, d_cols in ((0, (-1, 1)), (-1, (0, 1)), (1, (-1, 0))):
+            r = row + d_row
+            if 0 <= r < len(KEYBOARD_ROWS):
+                for d_col in d_cols:
+                    c = col + d_col
+                    if 0 <= c < len(KEYBOARD_ROWS[r]):
+                        neighbours.add(KEYBOARD_ROWS[r][c])
+        graph[key] = neighbours
+    return graph
+
+
+KEYBOARD_GRAPH = _keyboard_graph()
+KEYBOARD_AVG_DEGREE = sum(len(n) for n in KEYBOARD_GRAPH.values()) / len(KEYBOARD_GRAPH)
+
+
+def _load_dictionaries(sources: list):
+    """Read dictionaries as (name, words, ranked) triples"""
+    dictionaries = []
+    for name, path, ranked in sources:
+        words = []
+        seen = set()
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                word = fields[0].lower()
+                if len(word) >= MIN_MATCH_LENGTH and word not in seen and all(c in CHAR_INDEX for c in word):
+                    seen.add(word)
+                    words.append(word)
+        dictionaries.append((name, words, ranked))
+    return dictionaries
+
+
+def compile_automaton(path: str, sources: list = None):
+    """
+    Compile the dictionaries into the flat automaton file
+
+    Layout after the header (magic, state count, alphabet size, names size),
+    all little-endian int32:
+        delta[states * alphabet]  full DFA transitions (failure links folded in)
+        dict_link[states]         next terminal state along the failure chain, or -1
+        match_len[states]         length of the word ending here, 0 if not terminal
+        match_rank[states]        rank of that word within its dictionary
+        match_dict[states]        index into the dictionary names
+    followed by the newline separated dictionary names (UTF-8).
+
+    Args:
+        path: Output file
+        sources: (name, path, ranked) triples; defaults to dictionary_sources()
+    """
+    sources = dictionary_sources() if sources is None else sources
+    alphabet_size = len(ALPHABET)
+    goto = [{}]
+    match_len = [0]
+    match_rank = [0]
+    match_dict = [0]
+
+    for dict_index, (_, words, ranked) in enumerate(_load_dictionaries(sources)):
+        # Unranked lists are scored as if every word sat in the middle
+        uniform_rank = max(1, len(words) // 2)
+        for rank, word in enumerate(words, start=1):
+            state = 0
+            for char in word:
+                c = CHAR_INDEX[char]
+                if c not in goto[state]:
+                    goto.append({})
+                    match_len.append(0)
+                    match_rank.append(0)
+                    match_dict.append(0)
+                    goto[state][c] = len(goto) - 1
+                state = goto[state][c]
+
+            word_rank = rank if ranked else uniform_rank
+            # Keep the most common occurrence when dictionaries overlap
+            if not match_len[state] or word_rank < match_rank[state]:
+                match_len[state] = len(word)
+                match_rank[state] = word_rank
+                match_dict[state] = dict_index
+
+    states = len(goto)
+    delta = array('i', [0]) * (states * alphabet_size)
+    fail = [0] * states
+    dict_link = array('i', [-1]) * states
+
+    queue = deque()
+    for c in range(alphabet_size):
+        child = goto[0].get(c)
+        if child is not None:
+            delta[c] = child
+            queue.append(child)
+
+    while queue:
+        state = queue.popleft()
+        link = fail[state]
+        dict_link[state] = link if match_len[link] else dict_link[link]
+        base = state * alphabet_size
+        link_base = link * alphabet_size
+        for c in range(alphabet_size):
+            child = goto[state].get(c)
+            if child is None:
+                delta[base + c] = delta[link_base + c]
+            else:
+                delta[base + c] = child
+                fail[child] = delta[link_base + c]
+                queue.append(child)
+
+    names = '\n'.join(name for name, _, _ in sources).encode('utf-8')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, states, alphabet_size, len(names)))
+        delta.tofile(f)
+        dict_link.tofile(f)
+        for values in (match_len, match_rank, match_dict):
+            array('i', values).tofile(f)
+        f.write(names)
+    # Atomic so concurrent workers never map a half-written file
+    os.replace(tmp_path, path)
+
+
+def _private_directory(path: str) -> str:
+    """
+    Create a directory only the current user can access, or tighten an existing one
+
+    The cached automaton is memory-mapped and trusted, so it must not live where
+    another local user could plant or replace it.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or (hasattr(os, 'getuid') and info.st_uid != os.getuid()):
+        raise PermissionError(f"{path} must be a directory owned by the current user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def _default_automaton_path(cache_dir: str, sources: list) -> str:
+    digest = hashlib.sha1(MAGIC)
+    for name, path, ranked in sources:
+        digest.update(f"{name}:{ranked}:".encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return os.path.join(_private_directory(cache_dir), f'strength-{digest.hexdigest()[:16]}.aca')
+
+
+class StrengthEstimator:
+    """Estimates guesses needed for a password from its cheapest pattern decomposition"""
+
+    def __init__(self, automaton_path: str = None, cache_dir: str = None):
+        """
+        Args:
+            automaton_path: Precompiled automaton; when unset, ``build`` compiles one into cache_dir
+            cache_dir: Private directory for the compiled automaton
+        """
+        self.automaton_path = automaton_path
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser('~'), '.cache', 'password-manager')
+        self._map = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Cache the compiled automaton under STRENGTH_CACHE_DIR or the app's instance folder"""
+        self.cache_dir = app.config.get('STRENGTH_CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+
+    def automaton_file(self) -> str:
+        """Path of the compiled automaton for the current dictionaries (which may not exist yet)"""
+        if self.automaton_path:
+            return self.automaton_path
+        return _default_automaton_path(self.cache_dir, dictionary_sources())
+
+    def build(self) -> str:
+        """
+        Compile the automaton unless an up-to-date one exists
+
+        Run once per deploy (``flask init-db``), so workers never compile it.
+
+        Returns:
+            Path of the automaton
+        """
+        path = self.automaton_file()
+        if not os.path.exists(path):
+            compile_automaton(path)
+        return path
+
+    def _load(self):
+        if self._map is not None:
+            return
+
+        with self._lock:
+            if self._map is not None:
+                return
+
+            path = self.automaton_file()
+            if not os.path.exists(path):
+                # Compiling takes seconds and a lot of memory; doing it in every
+                # worker on its first request is what the shared file avoids
+                raise FileNotFoundError(
+                    f"Strength automaton {path} is missing; run `flask init-db` "
+                    "or set STRENGTH_AUTOMATON_PATH to a precompiled one"
+                )
+
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, states, alphabet_size, names_size = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or alphabet_size != len(ALPHABET):
+                mapped.close()
+                raise ValueError(f"{path} is not a compatible strength automaton")
+
+            view = memoryview(mapped)
+            offset = HEADER.size
+
+            def take(count):
+                nonlocal offset
+                section = view[offset:offset + 4 * count].cast('i')
+                offset += 4 * count
+                return section
+
+            self._delta = take(states * alphabet_size)
+            self._dict_link = take(states)
+            self._match_len = take(states)
+            self._match_rank = take(states)
+            self._match_dict = take(states)
+            self._names = [
+                f'dictionary:{name}' for name in bytes(view[offset:offset + names_size]).decode('utf-8').split('\n')
+            ]
+            self._map = mapped
+
+    def _dictionary_matches(self, text: str, l33t: bool) -> list:
+        """Run the automaton over text, returning (start, end, log10_guesses, pattern) tuples"""
+        delta, dict_link = self._delta, self._dict_link
+        match_len, match_rank, match_dict = self._match_len, self._match_rank, self._match_dict
+        alphabet_size = len(ALPHABET)
+
+        matches = []
+        state = 0
+        for end, char in enumerate(text):
+            c = CHAR_INDEX.get(char)
+            if c is None:
+                state = 0
+                continue
+
+            state = delta[state * alphabet_size + c]
+            found = state if match_len[state] else dict_link[state]
+            while found != -1:
+                length = match_len[found]
+                guesses = math.log10(match_rank[found])
+                if l33t:
+                    guesses += math.log10(2)
+                matches.append((end - length + 1, end, guesses, self._names[match_dict[found]]))
+                found = dict_link[found]
+        return matches
+
+    @staticmethod
+    def _pattern_matches(password: str) -> list:
+        """Keyboard walks, character sequences, repeats and years"""
+        matches = []
+        lower = password.lower()
+        n = len(lower)
+
+        # Keyboard walks: runs of adjacent keys
+        start = 0
+        for i in range(1, n + 1):
+            if i < n and lower[i] in KEYBOARD_GRAPH.get(lower[i - 1], ()):
+                continue
+            length = i - start
+            if length >= MIN_MATCH_LENGTH:
+                guesses = math.log10(len(KEYBOARD_GRAPH)) + (length - 1) * math.log10(KEYBOARD_AVG_DEGREE)
+                matches.append((start, i - 1, guesses, 'keyboard'))
+            start = i
+
+        # Sequences (abc, 987) and repeats (aaa): runs with a constant step of -1, 0 or 1
+        i = 0
+        while i < n - 1:
+            step = ord(lower[i + 1]) - ord(lower[i])
+            if step not in (-1, 0, 1):
+                i += 1
+                continue
+
+            j = i + 1
+            while j + 1 < n and ord(lower[j + 1]) - ord(lower[j]) == step:
+                j += 1
+
+            length = j - i + 1
+            if length >= MIN_MATCH_LENGTH:
+                if step == 0:
+                    guesses = math.log10(_cardinality(lower[i])) + math.log10(length)
+                    matches.append((i, j, guesses, 'repeat'))
+                else:
+                    base = 4 if lower[i] in 'a1z9' else (10 if lower[i].isdigit() else 26)
+                    guesses = math.log10(base * length * (2 if step < 0 else 1))
+                    matches.append((i, j, guesses, 'sequence'))
+            i = j
+
+        for match in re.finditer(r'(?:19|20)\d\d', lower):
+            matches.append((match.start(), match.end() - 1, math.log10(120), 'year'))
+
+        return matches
+
+    def estimate(self, password: str) -> dict:
+        """
+        Estimate the strength of a password
+
+        Args:
+            password: Password to analyze
+
+        Returns:
+            Dictionary with score (0-4), log10 guesses, crack time and the matched patterns
+        """
+        self._load()
+        analyzed = password[:MAX_ANALYZED]
+        lower = analyzed.lower()
+
+        matches = self._dictionary_matches(lower, l33t=False)
+        substituted = lower.translate(L33T_TABLE)
+        if substituted != lower:
+            matches += [m for m in self._dictionary_matches(substituted, l33t=True)
+                        if substituted[m[0]:m[1] + 1] != lower[m[0]:m[1] + 1]]
+        matches += self._pattern_matches(analyzed)
+
+        # Capitalisation inside a match adds a little on top of its base guesses
+        by_end = {}
+        for start, end, guesses, pattern in matches:
+            token = analyzed[start:end + 1]
+            if token != token.lower():
+                guesses += math.log10(2) if token[0].isupper() and token[1:] == token[1:].lower() else 1
+            by_end.setdefault(end, []).append((start, guesses, pattern))
+
+        # Minimum-guesses decomposition: cost[i] covers password[:i]
+        n = len(analyzed)
+        cost = [0.0] + [math.inf] * n
+        back = [None] * (n + 1)
+        for end in range(n):
+            brute = cost[end] + math.log10(_cardinality(analyzed[end]))
+            cost[end + 1], back[end + 1] = brute, (end, 'bruteforce')
+            for start, guesses, pattern in by_end.get(end, ()):
+                # Small per-segment penalty so a pile of tiny matches is not free
+                candidate = cost[start] + guesses + 0.3
+                if candidate < cost[end + 1]:
+                    cost[end + 1], back[end + 1] = candidate, (start, pattern)
+
+        sequence = []
+        i = n
+        while i > 0:
+            start, pattern = back[i]
+            if pattern != 'bruteforce' or not sequence or sequence[-1]['pattern'] != 'bruteforce':
+                sequence.append({'pattern': pattern, 'token': analyzed[start:i]})
+            else:
+                sequence[-1]['token'] = analyzed[start:i] + sequence[-1]['token']
+            i = start
+        sequence.reverse()
+
+        guesses_log10 = cost[n] + sum(math.log10(_cardinality(c)) for c in password[MAX_ANALYZED:])
+        seconds_log10 = guesses_log10 - math.log10(2 * GUESSES_PER_SECOND)
+
+        return {
+            'score': _score(guesses_log10),
+            'guesses_log10': round(guesses_log10, 2),
+            'crack_time_seconds_log10': round(seconds_log10, 2),
+            'crack_time': PasswordGenerator.format_crack_time(seconds_log10),
+            'sequence': sequence,
+            'feedback': _feedback(sequence)
+        }
+
+
+def _cardinality(char: str) -> int:
+    if char.isascii() and char.isalpha():
+        return 26
+    if char.isdigit():
+        return 10
+    return 33
+
+
+def _score(guesses_log10: float) -> int:
+    for score, threshold in enumerate((3, 6, 8, 10)):
+        if guesses_log10 < threshold:
+            return score
+    return 4
+
+
+def _feedback(sequence: list) -> list:
+    patterns = {s['pattern'] for s in sequence}
+    dictionaries = {p.split(':', 1)[1] for p in patterns if p.startswith('dictionary:')}
+    feedback = []
+    if any(name.startswith('passwords') for name in dictionaries):
+        feedback.append('Contains a commonly used password')
+    if any(not name.startswith('passwords') for name in dictionaries):
+        feedback.append('Contains dictionary words; add unrelated words or symbols')
+    if 'keyboard' in patterns:
+        feedback.append('Avoid keyboard patterns')
+    if 'sequence' in patterns:
+        feedback.append('Avoid sequences like abc or 123')
+    if 'repeat' in patterns:
+        feedback.append('Avoid repeating characters')
+    if 'year' in patterns:
+        feedback.append('Avoid years and dates')
+    return feedback
+
+
+# Shared estimator; STRENGTH_AUTOMATON_PATH may point at a precompiled automaton
+estimator = StrengthEstimator(os.getenv('STRENGTH_AUTOMATON_PATH'), os.getenv('STRENGTH_CACHE_DIR'))
+
+
+def fetch_dictionaries(directory: str = DICTIONARY_DIR) -> list:
+    """
+    Download the public frequency lists in DOWNLOADS into the dictionary directory
+
+    Returns:
+        Paths written
+    """
+    import urllib.request
+
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for name, url in DOWNLOADS.items():
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.tmp"
+        with urllib.request.urlopen(url, timeout=60) as response, open(tmp_path, 'wb') as f:
+            for block in iter(lambda: response.read(1 << 16), b''):
+                f.write(block)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile the strength automaton from the dictionaries')
+    parser.add_argument('output', nargs='?', help='Automaton file to write')
+    parser.add_argument('--fetch', action='store_true',
+                        help=f'First download the public frequency lists into {DICTIONARY_DIR}')
+    args = parser.parse_args()
+    if not args.output and not args.fetch:
+        parser.error('nothing to do: give an output file and/or --fetch')
+
+    if args.fetch:
+        for path in fetch_dictionaries():
+            print(f"Downloaded {path}")
+    if args.output:
+        sources = dictionary_sources()
+        compile_automaton(args.output, sources)
+        print(f"Wrote strength automaton for {', '.join(name for name, _, _ in sources)} to {args.output}")
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+
+class UserCache:
+    """Bounded per-process TTL/LRU cache of verified user payloads"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """Return the cached ``User.to_dict()`` payload, or None on a miss or expiry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id, payload: dict):
+        """Cache a user payload, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop a user from the cache (password change, deletion)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Drop every cached user"""
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, user_id):
+        """
+        Get a user's payload, querying the database only on a cache miss
+
+        Args:
+            user_id: JWT identity of the user
+
+        Returns:
+            ``User.to_dict()`` payload, or None if the user does not exist
+        """
+        payload = self.get(user_id)
+        if payload is not None:
+            return payload
+
+        from extensions import db
+        from models import User
+
+        user = db.session.get(User, user_id)
+        if not user:
+            return None
+
+        payload = user.to_dict()
+        self.set(user_id, payload)
+        return payload
+
+    def stats(self) -> dict:
+        """Counters suitable for scraping"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+# Initialize user cache
+user_cache = UserCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 60))
+)
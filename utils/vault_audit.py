@@ -0,0 +1,223 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import bindparam, func, select, update
+from utils.strength_estimator import estimator
+import time
+
+# Entries scoring below this (on the estimator's 0-4 scale) are reported as weak
+WEAK_SCORE_THRESHOLD = 3
+
+
+def secret_fields(encryption, password: str, user_id: int) -> dict:
+    """
+    Column values derived from a password on write
+
+    Args:
+        encryption: PasswordEncryption instance
+        password: Plain text password
+        user_id: Owner of the entry
+
+    Returns:
+        Dict with the ciphertext columns plus ``fingerprint`` and ``strength_score``
+    """
+    return {
+        **encryption.encrypt_fields(password, user_id),
+        'fingerprint': encryption.fingerprint(password, user_id),
+        'strength_score': estimator.estimate(password)['score']
+    }
+
+
+def audit_vault(db, user_id: int) -> dict:
+    """
+    Report reused and weak passwords from the stored fingerprints and scores
+
+    Nothing is decrypted: reuse is a GROUP BY over the (user_id, fingerprint) index.
+
+    Returns:
+        Dictionary with reused groups, weak entries and a summary
+    """
+    from models import Password
+
+    table = Password.__table__
+    entry_columns = (table.c.id, table.c.service_name, table.c.username)
+
+    reused_fingerprints = (
+        select(table.c.fingerprint)
+        .where(table.c.user_id == user_id, table.c.fingerprint.isnot(None))
+        .group_by(table.c.fingerprint)
+        .having(func.count() > 1)
+    )
+    rows = db.session.execute(
+        select(table.c.fingerprint, *entry_columns)
+        .where(table.c.user_id == user_id, table.c.fingerprint.in_(reused_fingerprints))
+        .order_by(table.c.fingerprint, table.c.id)
+    ).all()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.fingerprint, []).append(
+            {'id': row.id, 'service_name': row.service_name, 'username': row.username}
+        )
+    reused = [{'count': len(entries), 'entries': entries} for entries in groups.values()]
+
+    weak = [
+        {'id': row.id, 'service_name': row.service_name, 'username': row.username, 'score': row.strength_score}
+        for row in db.session.execute(
+            select(*entry_columns, table.c.strength_score)
+            .where(table.c.user_id == user_id, table.c.strength_score < WEAK_SCORE_THRESHOLD)
+            .order_by(table.c.strength_score, table.c.id)
+        )
+    ]
+
+    total, unaudited = db.session.execute(
+        select(func.count(), func.count().filter(table.c.fingerprint.is_(None)))
+        .where(table.c.user_id == user_id)
+    ).one()
+
+    return {
+        'reused': reused,
+        'weak': weak,
+        'summary': {
+            'total': total,
+            'reused_entries': sum(group['count'] for group in reused),
+            'weak_entries': len(weak),
+            # Rows written before auditing existed, until the backfill has run
+            'unaudited_entries': unaudited
+        }
+    }
+
+
+def refingerprint_vault(db, encryption, user_id: int) -> int:
+    """
+    Recompute a user's stored fingerprints under their current key
+
+    Called in the transaction that gives a legacy user a data key: rows
+    fingerprinted with the master key would otherwise never match the ones
+    written afterwards, hiding reuse. Rows that fail to decrypt are cleared so
+    the audit backfill reports them.
+
+    Returns:
+        Number of rows updated
+    """
+    from models import Password
+
+    table = Password.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.encrypted_password, table.c.encrypted_blob)
+        .where(table.c.user_id == user_id, table.c.fingerprint.isnot(None))
+    ).all()
+
+    params = []
+    for row in rows:
+        try:
+            password = encryption.decrypt(
+                row.encrypted_blob if row.encrypted_blob is not None else row.encrypted_password, user_id
+            )
+            fingerprint = encryption.fingerprint(password, user_id)
+        except ValueError:
+            fingerprint = None
+        params.append({'b_id': row.id, 'b_fingerprint': fingerprint})
+
+    if params:
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(fingerprint=bindparam('b_fingerprint'), updated_at=table.c.updated_at),
+            params
+        )
+    return len(params)
+
+
+class AuditBackfill:
+    """One-time pass computing fingerprints and strength scores for existing rows"""
+
+    def __init__(self, db, encryption, batch_size: int = 500, workers: int = 4, throttle: float = 0.0):
+        """
+        Args:
+            db: Flask-SQLAlchemy instance
+            encryption: PasswordEncryption used to decrypt rows and fingerprint them
+            batch_size: Rows processed and committed per batch
+            workers: Threads decrypting and scoring each batch
+            throttle: Seconds to sleep between batches to limit load
+        """
+        self.db = db
+        self.encryption = encryption
+        self.batch_size = batch_size
+        self.workers = workers
+        self.throttle = throttle
+
+    def _audit_row(self, app, row):
+        with app.app_context():
+            try:
+                password = self.encryption.decrypt(
+                    row.encrypted_blob if row.encrypted_blob is not None else row.encrypted_password, row.user_id
+                )
+            except ValueError:
+                return None
+            return {
+                'b_id': row.id,
+                'b_fingerprint': self.encryption.fingerprint(password, row.user_id),
+                'b_score': estimator.estimate(password)['score']
+            }
+
+    def run(self, progress=None) -> dict:
+        """
+        Fill in every row without a fingerprint
+
+        Processed rows no longer match the filter, so an interrupted run simply
+        continues with the remaining rows when started again.
+
+        Args:
+            progress: Optional callback receiving the counts after each batch
+
+        Returns:
+            Counts of audited and failed rows
+        """
+        from models import Password
+
+        table = Password.__table__
+        app = current_app._get_current_object()
+        state = {'audited': 0, 'failed': []}
+
+        # Only fill rows still unaudited, so a concurrent write's fresh values are kept
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.fingerprint.is_(None))
+            .values(fingerprint=bindparam('b_fingerprint'), strength_score=bindparam('b_score'),
+                    updated_at=table.c.updated_at)
+        )
+
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='audit') as executor:
+            while True:
+                rows = self.db.session.execute(
+                    select(table.c.id, table.c.user_id, table.c.encrypted_password, table.c.encrypted_blob)
+                    .where(table.c.id > last_id, table.c.fingerprint.is_(None))
+                    .order_by(table.c.id)
+                    .limit(self.batch_size)
+                ).all()
+
+                if not rows:
+                    break
+
+                params = []
+                for row, values in zip(rows, executor.map(lambda r: self._audit_row(app, r), rows)):
+                    if values is None:
+                        state['failed'].append(row.id)
+                    else:
+                        params.append(values)
+
+                if params:
+                    self.db.session.execute(statement, params)
+                self.db.session.commit()
+
+                state['audited'] += len(params)
+                last_id = rows[-1].id
+
+                if progress:
+                    progress(state)
+
+                if self.throttle:
+                    time.sleep(self.throttle)
+
+        return state
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+
+# Columns understood by import and written by export, in CSV order
+VAULT_FIELDS = ['service_name', 'username', 'password', 'url', 'notes']
+
+SUPPORTED_FORMATS = ('csv', 'ndjson')
+
+FORMAT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload is malformed past the point where rows can be told apart"""
+
+
+class ExportAborted(RuntimeError):
+    """Raised mid-stream when an entry cannot be exported; the response is cut off"""
+
+
+def detect_format(requested: str = None, content_type: str = None) -> str:
+    """
+    Work out the vault file format from an explicit value or a content type
+
+    Args:
+        requested: Format requested by the client (``csv`` or ``ndjson``)
+        content_type: Request mimetype used when no format is requested
+
+    Returns:
+        Normalized format name, or None if it cannot be determined
+    """
+    if requested:
+        requested = requested.lower()
+        return requested if requested in SUPPORTED_FORMATS else None
+
+    for fmt, mimetype in FORMAT_MIMETYPES.items():
+        if content_type == mimetype:
+            return fmt
+
+    if content_type in ('application/jsonl', 'application/json-lines'):
+        return 'ndjson'
+
+    return None
+
+
+def iter_import_records(stream, fmt: str):
+    """
+    Lazily parse vault entries from a binary stream
+
+    Rows are read one at a time so memory use does not grow with the upload.
+
+    Args:
+        stream: Binary file-like object (e.g. ``request.stream``)
+        fmt: ``csv`` or ``ndjson``
+
+    Yields:
+        Tuples of (row_number, entry_dict, error_message); entry_dict is None
+        when the row could not be parsed
+
+    Raises:
+        ImportFormatError: If the CSV parser fails (e.g. a NUL byte or a field
+            over the size limit); the rows yielded before stay valid
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='' if fmt == 'csv' else None)
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for row_number, row in enumerate(reader, start=1):
+                yield row_number, {k: v for k, v in row.items() if k in VAULT_FIELDS}, None
+        except csv.Error as e:
+            # The reader cannot resynchronize reliably (e.g. inside an unterminated quote)
+            raise ImportFormatError(f"Malformed CSV on line {reader.reader.line_num}: {e}") from e
+        return
+
+    row_number = 0
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Invalid JSON: {e.msg}"
+            continue
+
+        if not isinstance(record, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+
+        if any(not isinstance(record.get(f), (str, type(None))) for f in VAULT_FIELDS):
+            yield row_number, None, "Field values must be strings"
+            continue
+
+        yield row_number, {k: v for k, v in record.items() if k in VAULT_FIELDS}, None
+
+
+def iter_export_chunks(entries, fmt: str):
+    """
+    Serialize vault entries one at a time for a streaming response
+
+    Args:
+        entries: Iterable of dicts keyed by VAULT_FIELDS
+        fmt: ``csv`` or ``ndjson``
+
+    Yields:
+        Text chunks ready to be written to the response
+    """
+    if fmt == 'ndjson':
+        for entry in entries:
+            yield json.dumps({f: entry.get(f) for f in VAULT_FIELDS}) + '\n'
+        return
+
+    # Reuse one small buffer so each row is encoded without accumulating output
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=VAULT_FIELDS, extrasaction='ignore')
+
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for entry in entries:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(entry)
+        yield buffer.getvalue()
@@ -0,0 +1,122 @@
+"""
+Memory-mapped wordlist for passphrase generation
+
+The binary format is laid out so lookups need no parsing at load time:
+
+    b'PWL1' | uint32 count | uint32 offsets[count + 1] | UTF-8 words
+
+Offsets are little-endian byte positions of each word relative to the start of
+the word data. Words are sorted, which allows membership tests by binary search.
+Because the file is memory-mapped, forked server workers share its pages.
+
+Convert a plain one-word-per-line list with:
+
+    python -m utils.wordlist words.txt words.bin
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+
+MAGIC = b'PWL1'
+HEADER = struct.Struct('<4sI')
+OFFSET = struct.Struct('<I')
+
+DEFAULT_WORDLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wordlist.bin')
+
+
+def build_wordlist(text_path: str, bin_path: str) -> int:
+    """
+    Convert a text wordlist (one word per line) into the binary format
+
+    Words are lower-cased, de-duplicated and sorted. Lines in the EFF/diceware
+    style ``11111<TAB>word`` are accepted; the dice prefix is dropped.
+
+    Returns:
+        Number of words written
+    """
+    with open(text_path, encoding='utf-8') as f:
+        words = sorted({line.split()[-1].lower() for line in f if line.strip()})
+
+    encoded = [w.encode('utf-8') for w in words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+
+    tmp_path = f"{bin_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(b''.join(encoded))
+    os.replace(tmp_path, bin_path)
+
+    return len(encoded)
+
+
+class Wordlist:
+    """Lazily memory-mapped, index-addressed wordlist"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map = None
+        self._count = 0
+        self._data_start = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Mapped on first use so importing the module costs nothing
+        if self._map is not None:
+            return
+
+        with self._lock:
+            if self._map is not None:
+                return
+
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, count = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC:
+                mapped.close()
+                raise ValueError(f"{self.path} is not a compiled wordlist")
+
+            self._count = count
+            self._data_start = HEADER.size + OFFSET.size * (count + 1)
+            self._map = mapped
+
+    def __len__(self) -> int:
+        self._load()
+        return self._count
+
+    def __getitem__(self, index: int) -> str:
+        self._load()
+        if not 0 <= index < self._count:
+            raise IndexError('wordlist index out of range')
+
+        start, end = struct.unpack_from('<2I', self._map, HEADER.size + OFFSET.size * index)
+        return self._map[self._data_start + start:self._data_start + end].decode('utf-8')
+
+    def __contains__(self, word: str) -> bool:
+        self._load()
+        low, high = 0, self._count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = self[mid]
+            if candidate == word:
+                return True
+            if candidate < word:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return False
+
+
+# Shared wordlist; PASSPHRASE_WORDLIST may point at a larger compiled list
+wordlist = Wordlist(os.getenv('PASSPHRASE_WORDLIST', DEFAULT_WORDLIST))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m utils.wordlist <words.txt> <words.bin>')
+    print(f"Wrote {build_wordlist(sys.argv[1], sys.argv[2])} words to {sys.argv[2]}")